@@ -0,0 +1,133 @@
+from typing import Optional
+import asyncio
+import hashlib
+import logging
+import time
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.redis_client import RedisClient
+from app.auth.security import CurrentUser, TokenData
+
+logger = logging.getLogger(__name__)
+
+# revocation listener reconnect delay: doubles after each failure up to the max
+LISTEN_RETRY_MIN = 1.0
+LISTEN_RETRY_MAX = 60.0
+
+
+def token_fingerprint(token: str) -> str:
+    """Stable hash of a JWT so raw tokens are never used as keys or published"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class AuthCache:
+    """
+    Short-lived in-process cache for the auth hot path.
+
+    - tokens: fingerprint -> decoded TokenData for tokens already checked
+      against the Redis blacklist (capped at the token's own expiry)
+    - users: user_id -> CurrentUser (plain copy of the row, never an ORM
+      instance bound to another request's session)
+    - revoked: fingerprints known to be revoked
+
+    Logouts are broadcast on a Redis pub/sub channel so every worker drops
+    the token immediately; if a message is missed, a revoked token stays
+    valid for at most AUTH_CACHE_TTL_SECONDS. Without Redis the listener
+    retries with exponential backoff and the local cache keeps working.
+    """
+
+    def __init__(self):
+        self.enabled = settings.AUTH_CACHE_ENABLED
+        self.channel = settings.AUTH_REVOCATION_CHANNEL
+        ttl = settings.AUTH_CACHE_TTL_SECONDS
+        max_entries = settings.AUTH_CACHE_MAX_ENTRIES
+
+        self.tokens = TTLCache(max_entries, ttl)
+        self.users = TTLCache(max_entries, ttl)
+        # revocations are remembered for as long as a token can live
+        self.revoked = TTLCache(max_entries, 86400)
+        self._listener: Optional[asyncio.Task] = None
+
+    def get_token(self, token: str) -> Optional[TokenData]:
+        if not self.enabled:
+            return None
+        return self.tokens.get(token_fingerprint(token))
+
+    def put_token(self, token: str, token_data: TokenData):
+        if not self.enabled:
+            return
+        ttl = None
+        if token_data.exp is not None:
+            ttl = token_data.exp - time.time()
+        self.tokens.set(token_fingerprint(token), token_data, ttl=ttl)
+
+    def is_revoked(self, token: str) -> bool:
+        return self.enabled and token_fingerprint(token) in self.revoked
+
+    def get_user(self, user_id: int) -> Optional[CurrentUser]:
+        if not self.enabled:
+            return None
+        return self.users.get(user_id)
+
+    def put_user(self, user: CurrentUser):
+        if self.enabled:
+            self.users.set(user.id, user)
+
+    def invalidate_user(self, user_id: int):
+        self.users.pop(user_id)
+
+    def _revoke_fingerprint(self, fingerprint: str):
+        self.tokens.pop(fingerprint)
+        self.revoked.set(fingerprint, True)
+
+    async def revoke(self, token: str):
+        """Revoke a token locally and notify other workers"""
+        fingerprint = token_fingerprint(token)
+        self._revoke_fingerprint(fingerprint)
+        if self.enabled:
+            await RedisClient.publish(self.channel, fingerprint)
+
+    async def _listen(self):
+        delay = LISTEN_RETRY_MIN
+        while True:
+            pubsub = None
+            try:
+                pubsub = RedisClient.get_client().pubsub()
+                await pubsub.subscribe(self.channel)
+                delay = LISTEN_RETRY_MIN
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._revoke_fingerprint(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    f"Revocation listener cannot reach Redis ({e}), retrying in {delay:.0f}s; "
+                    f"logouts on other workers apply after AUTH_CACHE_TTL_SECONDS"
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LISTEN_RETRY_MAX)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    def start(self):
+        """Start the revocation listener (called on app startup)"""
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+auth_cache = AuthCache()
@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+import os
+import secrets
+import uuid
+
+from jose import jwk
+from jose.backends.base import Key
+
+from app.core.config import settings
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512"}
+
+
+@dataclass
+class JWTKey:
+    kid: str
+    algorithm: str
+    key: Key
+
+    @property
+    def symmetric(self) -> bool:
+        return self.algorithm in SYMMETRIC_ALGORITHMS
+
+
+def load_or_create_secret(path: Path) -> str:
+    """
+    Read the shared HS256 secret from `path`, creating it on first use.
+
+    The file is written under a temporary name and hard-linked into place,
+    so when several workers start at once exactly one secret wins and every
+    worker reads that one.
+    """
+    try:
+        secret = path.read_text(encoding="utf-8").strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(secrets.token_urlsafe(64))
+    try:
+        os.link(tmp, path)
+        print(f"Generated JWT secret in {path}; set JWT_SECRET_KEY to share it across hosts")
+    except FileExistsError:
+        pass
+    finally:
+        tmp.unlink()
+    return path.read_text(encoding="utf-8").strip()
+
+
+def _read_pem(path: Path) -> str:
+    return Path(path).read_text(encoding="utf-8")
+
+
+def _parse_previous_keys(value: str) -> List[JWTKey]:
+    """
+    Parse JWT_PREVIOUS_KEYS: comma-separated `kid:ALGORITHM:material`, where
+    material is the secret for HS* and a public key PEM file path otherwise.
+    """
+    keys = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        kid, algorithm, material = entry.split(":", 2)
+        algorithm = algorithm.upper()
+        if algorithm in ASYMMETRIC_ALGORITHMS:
+            material = _read_pem(Path(material))
+        elif algorithm not in SYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Unsupported JWT algorithm for key {kid}: {algorithm}")
+        keys.append(JWTKey(kid, algorithm, jwk.construct(material, algorithm)))
+    return keys
+
+
+class KeyRing:
+    """
+    JWT keys shared by every worker.
+
+    - signing: the current key; new tokens carry its `kid` in the header
+    - verification: every accepted key by `kid` (current + JWT_PREVIOUS_KEYS),
+      so a key can be rotated without logging everyone out
+
+    With RS256/ES256 a process configured with only JWT_PUBLIC_KEY_PATH can
+    verify tokens but not issue them.
+    """
+
+    def __init__(self, signing: Optional[JWTKey], verification: Dict[str, JWTKey]):
+        self.signing = signing
+        self.verification = verification
+
+    @classmethod
+    def from_settings(cls) -> "KeyRing":
+        algorithm = settings.JWT_ALGORITHM.upper()
+        kid = settings.JWT_KEY_ID
+        signing = None
+
+        if algorithm in SYMMETRIC_ALGORITHMS:
+            secret = settings.JWT_SECRET_KEY or load_or_create_secret(settings.JWT_SECRET_FILE)
+            signing = JWTKey(kid, algorithm, jwk.construct(secret, algorithm))
+            current = signing
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            if settings.JWT_PRIVATE_KEY_PATH:
+                signing = JWTKey(kid, algorithm, jwk.construct(_read_pem(settings.JWT_PRIVATE_KEY_PATH), algorithm))
+            if settings.JWT_PUBLIC_KEY_PATH:
+                public = jwk.construct(_read_pem(settings.JWT_PUBLIC_KEY_PATH), algorithm)
+            elif signing is not None:
+                public = signing.key.public_key()
+            else:
+                raise ValueError(f"{algorithm} needs JWT_PRIVATE_KEY_PATH or JWT_PUBLIC_KEY_PATH")
+            current = JWTKey(kid, algorithm, public)
+        else:
+            raise ValueError(f"Unsupported JWT_ALGORITHM: {settings.JWT_ALGORITHM}")
+
+        verification = {key.kid: key for key in _parse_previous_keys(settings.JWT_PREVIOUS_KEYS)}
+        verification[kid] = current
+        return cls(signing, verification)
+
+    def verification_key(self, kid: Optional[str]) -> Optional[JWTKey]:
+        if kid is None:
+            # tokens issued before key ids were introduced
+            kid = settings.JWT_KEY_ID
+        return self.verification.get(kid)
+
+    def jwks(self) -> Dict:
+        """Public verification keys as a JWK Set (secrets are never exposed)"""
+        keys = []
+        for key in self.verification.values():
+            if key.symmetric:
+                continue
+            entry = key.key.public_key().to_dict()
+            entry.update({"kid": key.kid, "use": "sig"})
+            keys.append(entry)
+        return {"keys": keys}
+
+
+key_ring = KeyRing.from_settings()
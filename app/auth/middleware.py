@@ -1,20 +1,56 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from starlette.requests import HTTPConnection
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.db.database import get_db
+from app.db.database import get_read_db
 from app.db.models import User
 from app.db.redis_client import RedisClient
-from app.auth.security import decode_token
+from app.auth.security import CurrentUser, decode_token, TokenData
+from app.auth.cache import auth_cache
+from app.core.rate_limit import rate_limiter, RateLimitResult
 
 security = HTTPBearer()
 
 
+async def is_token_revoked(token: str) -> bool:
+    """Check revocation against the local cache first, then the Redis blacklist"""
+    if auth_cache.get_token(token) is not None:
+        return False
+    if auth_cache.is_revoked(token):
+        return True
+    return await RedisClient.is_blacklisted(token)
+
+
+def decode_token_cached(token: str) -> Optional[TokenData]:
+    """Decode a JWT, reusing the cached result for hot tokens"""
+    token_data = auth_cache.get_token(token)
+    if token_data is None:
+        token_data = decode_token(token)
+        if token_data is not None:
+            auth_cache.put_token(token, token_data)
+    return token_data
+
+
+async def load_user_cached(user_id: int, db: AsyncSession) -> Optional[CurrentUser]:
+    """Load a user, reusing the cached copy for a short window"""
+    user = auth_cache.get_user(user_id)
+    if user is None:
+        result = await db.execute(select(User).where(User.id == user_id))
+        row = result.scalar_one_or_none()
+        if row is None:
+            return None
+        user = CurrentUser.from_row(row)
+        auth_cache.put_user(user)
+    return user
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_read_db)
+) -> CurrentUser:
     """Middleware to get current authenticated user from JWT token"""
     
     credentials_exception = HTTPException(
@@ -26,7 +62,7 @@ async def get_current_user(
     token = credentials.credentials
     
     # Check if token is blacklisted
-    if RedisClient.is_blacklisted(token):
+    if await is_token_revoked(token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has been revoked",
@@ -34,46 +70,49 @@ async def get_current_user(
         )
     
     # Decode token
-    token_data = decode_token(token)
+    token_data = decode_token_cached(token)
     if token_data is None:
         raise credentials_exception
     
     # Get user from database
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    user = await load_user_cached(token_data.user_id, db)
     if user is None:
         raise credentials_exception
     
     return user
 
 
-async def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
-    """Optional authentication - returns None if no valid token"""
-    
-    if credentials is None:
-        return None
-    
-    token = credentials.credentials
+async def get_user_from_token(token: str, db: AsyncSession) -> Optional[CurrentUser]:
+    """Resolve a raw JWT to its user, or None if revoked, invalid or unknown"""
     
     # Check if token is blacklisted
-    if RedisClient.is_blacklisted(token):
+    if await is_token_revoked(token):
         return None
     
     # Decode token
-    token_data = decode_token(token)
+    token_data = decode_token_cached(token)
     if token_data is None:
         return None
     
     # Get user from database
-    user = db.query(User).filter(User.id == token_data.user_id).first()
-    return user
+    return await load_user_cached(token_data.user_id, db)
+
+
+async def get_current_user_optional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    db: AsyncSession = Depends(get_read_db)
+) -> Optional[CurrentUser]:
+    """Optional authentication - returns None if no valid token"""
+    
+    if credentials is None:
+        return None
+    
+    return await get_user_from_token(credentials.credentials, db)
 
 
 def require_permission(permission: str):
     """Decorator factory for permission checking (extensible)"""
-    async def permission_checker(current_user: User = Depends(get_current_user)):
+    async def permission_checker(current_user: CurrentUser = Depends(get_current_user)):
         # Add permission logic here if needed
         # For now, just check if user exists
         if not current_user:
@@ -83,3 +122,42 @@ def require_permission(permission: str):
             )
         return current_user
     return permission_checker
+
+
+def client_ip(connection: HTTPConnection) -> str:
+    """Client address of a request or WebSocket (uvicorn applies X-Forwarded-For from trusted proxies)"""
+    return connection.client.host if connection.client else "unknown"
+
+
+def rate_limited_exception(result: RateLimitResult) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests, please slow down",
+        headers=result.headers(),
+    )
+
+
+def rate_limit(scope: str, per_user: bool = True):
+    """
+    Dependency factory throttling a route with the RATE_LIMIT_<SCOPE> rule.
+
+    Authenticated callers are limited per user id (so users behind one NAT
+    do not share a budget); anonymous callers, or every caller when
+    per_user is False, are limited per client IP.
+    """
+    async def check_ip(request: Request):
+        result = await rate_limiter.hit(scope, f"ip:{client_ip(request)}")
+        if not result.allowed:
+            raise rate_limited_exception(result)
+
+    async def check_user(
+        request: Request,
+        user: Optional[CurrentUser] = Depends(get_current_user_optional)
+    ):
+        if user is None:
+            return await check_ip(request)
+        result = await rate_limiter.hit(scope, f"user:{user.id}")
+        if not result.allowed:
+            raise rate_limited_exception(result)
+
+    return check_user if per_user else check_ip
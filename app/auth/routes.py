@@ -1,26 +1,49 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from datetime import timedelta
 from typing import Optional
 
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.db.models import User
 from app.db.redis_client import RedisClient
 from app.auth.security import (
-    verify_password, 
-    hash_password, 
+    verify_password_async,
+    hash_password_async,
+    PasswordHasherOverloaded,
     create_access_token, 
     decode_token,
     Token,
+    CurrentUser,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from app.auth.middleware import get_current_user
+from app.auth.middleware import (
+    get_current_user,
+    is_token_revoked,
+    decode_token_cached,
+    load_user_cached,
+    rate_limit
+)
+from app.auth.cache import auth_cache
+from app.auth.keys import key_ring
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer()
 
+overloaded_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server is busy, please try again shortly",
+    headers={"Retry-After": "1"},
+)
+
+email_taken_exception = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Email already registered"
+)
+
 
 # Request/Response Models
 class LoginRequest(BaseModel):
@@ -52,28 +75,41 @@ class MessageResponse(BaseModel):
     success: bool
 
 
-@router.post("/register", response_model=Token)
-async def register(request: RegisterRequest, db: Session = Depends(get_db)):
+@router.post("/register", response_model=Token, dependencies=[Depends(rate_limit("register", per_user=False))])
+async def register(
+    request: RegisterRequest,
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
+):
     """Register a new user"""
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == request.email).first()
+    result = await read_db.execute(select(User).where(User.email == request.email))
+    existing_user = result.scalar_one_or_none()
+    # Release the connection before hashing; with SQLite the writer is a
+    # single connection and must not sit idle while bcrypt runs
+    await read_db.close()
     if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+        raise email_taken_exception
     
     # Create new user
-    hashed_password = hash_password(request.password)
+    try:
+        hashed_password = await hash_password_async(request.password)
+    except PasswordHasherOverloaded:
+        raise overloaded_exception
     new_user = User(
         email=request.email,
         password_hash=hashed_password
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Registered concurrently between the check and the insert
+        await db.rollback()
+        raise email_taken_exception
+    await db.refresh(new_user)
     
     # Create access token
     access_token = create_access_token(
@@ -84,12 +120,14 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
     return Token(access_token=access_token)
 
 
-@router.post("/login", response_model=Token)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login", per_user=False))])
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_read_db)):
     """تسجيل دخول - Login user and return JWT token"""
     
     # Find user by email
-    user = db.query(User).filter(User.email == request.email).first()
+    result = await db.execute(select(User).where(User.email == request.email))
+    user = result.scalar_one_or_none()
+    await db.close()
     
     if not user:
         raise HTTPException(
@@ -98,7 +136,12 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         )
     
     # Verify password
-    if not verify_password(request.password, user.password_hash):
+    try:
+        password_valid = await verify_password_async(request.password, user.password_hash)
+    except PasswordHasherOverloaded:
+        raise overloaded_exception
+    
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -111,7 +154,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
     )
     
     # Store session in Redis
-    RedisClient.set_session(access_token[:32], user.id)
+    await RedisClient.set_session(access_token[:32], user.id)
     
     return Token(access_token=access_token)
 
@@ -119,23 +162,23 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
 @router.get("/verify", response_model=VerifyResponse)
 async def verify_token(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """التحقق من Token - Verify if JWT token is valid"""
     
     token = credentials.credentials
     
     # Check if token is blacklisted
-    if RedisClient.is_blacklisted(token):
+    if await is_token_revoked(token):
         return VerifyResponse(valid=False)
     
     # Decode token
-    token_data = decode_token(token)
+    token_data = decode_token_cached(token)
     if token_data is None:
         return VerifyResponse(valid=False)
     
     # Get user from database
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    user = await load_user_cached(token_data.user_id, db)
     if user is None:
         return VerifyResponse(valid=False)
     
@@ -152,17 +195,18 @@ async def verify_token(
 @router.post("/logout", response_model=MessageResponse)
 async def logout(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """تسجيل خروج - Logout user and invalidate token"""
     
     token = credentials.credentials
     
-    # Add token to blacklist
-    RedisClient.add_to_blacklist(token)
+    # Add token to blacklist and drop it from every worker's auth cache
+    await RedisClient.add_to_blacklist(token)
+    await auth_cache.revoke(token)
     
     # Delete session from Redis
-    RedisClient.delete_session(token[:32])
+    await RedisClient.delete_session(token[:32])
     
     return MessageResponse(
         message="Successfully logged out",
@@ -170,8 +214,17 @@ async def logout(
     )
 
 
+@router.get("/jwks")
+async def jwks():
+    """
+    Public JWT verification keys (RS256/ES256) as a JWK Set, so other
+    services can verify tokens without the signing key. Empty for HS256.
+    """
+    return key_ring.jwks()
+
+
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: CurrentUser = Depends(get_current_user)):
     """Get current authenticated user info"""
     return UserResponse(
         id=current_user.id,
@@ -1,14 +1,19 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
 import bcrypt
 from pydantic import BaseModel
-import secrets
+import asyncio
 
-# JWT Configuration
-SECRET_KEY = secrets.token_urlsafe(32)
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_SECONDS, PASSWORD_JOBS
+from app.auth.keys import key_ring
+
+# JWT Configuration (keys are shared by all workers, see app/auth/keys.py)
+ALGORITHM = settings.JWT_ALGORITHM.upper()
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 
 class Token(BaseModel):
@@ -19,25 +24,91 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     user_id: Optional[int] = None
     email: Optional[str] = None
+    exp: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    The authenticated user as seen by routes.
+
+    A plain immutable copy of the row, not an ORM instance: it is cached
+    and shared across requests, so it must not be tied to the session
+    that loaded it.
+    """
+    id: int
+    email: str
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_row(cls, user) -> "CurrentUser":
+        return cls(id=user.id, email=user.email, created_at=user.created_at)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'), 
-        hashed_password.encode('utf-8')
-    )
+    with PASSWORD_HASH_SECONDS.labels("verify").time():
+        return bcrypt.checkpw(
+            plain_password.encode('utf-8'), 
+            hashed_password.encode('utf-8')
+        )
 
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    with PASSWORD_HASH_SECONDS.labels("hash").time():
+        salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+class PasswordHasherOverloaded(Exception):
+    """Raised when too many password hash/verify jobs are already waiting"""
+
+
+# bcrypt releases the GIL, so a thread pool gives real parallelism
+# while keeping the event loop free during login/register bursts
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.BCRYPT_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+_password_jobs = 0
+
+
+async def _run_password_job(func, *args):
+    global _password_jobs
+    if _password_jobs >= settings.BCRYPT_WORKERS + settings.BCRYPT_MAX_QUEUE:
+        raise PasswordHasherOverloaded()
+    # counted before submission so a burst waiting for a thread is included
+    _password_jobs += 1
+    PASSWORD_JOBS.inc()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs -= 1
+        PASSWORD_JOBS.dec()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt worker pool"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt worker pool"""
+    return await _run_password_job(hash_password, password)
+
+
+def shutdown_password_executor():
+    _password_executor.shutdown(wait=False, cancel_futures=True)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
+    # RFC 7519 requires "sub" to be a string
+    if "sub" in to_encode:
+        to_encode["sub"] = str(to_encode["sub"])
     
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -45,22 +116,35 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire, "iat": datetime.utcnow()})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    signing = key_ring.signing
+    if signing is None:
+        raise RuntimeError("No JWT signing key configured (verification-only)")
+    encoded_jwt = jwt.encode(
+        to_encode,
+        signing.key,
+        algorithm=signing.algorithm,
+        headers={"kid": signing.kid}
+    )
     return encoded_jwt
 
 
 def decode_token(token: str) -> Optional[TokenData]:
     """Decode and validate JWT token"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
+        key = key_ring.verification_key(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            return None
+        # each key only accepts its own algorithm (no alg confusion)
+        payload = jwt.decode(token, key.key, algorithms=[key.algorithm])
+        sub = payload.get("sub")
         email: str = payload.get("email")
         
-        if user_id is None:
+        if sub is None:
             return None
+        user_id = int(sub)
             
-        return TokenData(user_id=user_id, email=email)
-    except JWTError:
+        return TokenData(user_id=user_id, email=email, exp=payload.get("exp"))
+    except (JWTError, ValueError):
         return None
 
 
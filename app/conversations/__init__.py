@@ -0,0 +1 @@
+# Conversation history module
@@ -0,0 +1,217 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel
+from typing import List, Optional
+
+from app.db.database import get_read_db
+from app.db.models import Conversation, Message
+from app.auth.security import CurrentUser
+from app.auth.middleware import get_current_user
+from app.conversations.pagination import (
+    encode_cursor,
+    decode_cursor,
+    encode_score_cursor,
+    decode_score_cursor
+)
+from app.conversations.search import SEARCH_AVAILABLE, is_support_staff, search_messages
+
+router = APIRouter(prefix="/api/conversations", tags=["Conversations"])
+
+
+# Response Models
+class ConversationResponse(BaseModel):
+    id: int
+    session_id: str
+    title: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+
+class ConversationPage(BaseModel):
+    items: List[ConversationResponse]
+    next_cursor: Optional[str] = None
+
+
+class MessageResponse(BaseModel):
+    id: int
+    role: str
+    content: str
+    created_at: str
+
+
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None
+
+
+class SearchResult(BaseModel):
+    message_id: int
+    conversation_id: int
+    session_id: str
+    title: Optional[str] = None
+    user_id: int
+    role: str
+    content: str
+    created_at: str
+    score: float
+
+
+class SearchPage(BaseModel):
+    items: List[SearchResult]
+    next_cursor: Optional[str] = None
+
+
+def parse_cursor(cursor: Optional[str], decode=decode_cursor):
+    if cursor is None:
+        return None
+    try:
+        return decode(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+@router.get("", response_model=ConversationPage)
+async def list_conversations(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """قائمة المحادثات - most recently updated first, keyset paginated"""
+
+    position = parse_cursor(cursor)
+    query = select(Conversation).where(Conversation.user_id == current_user.id)
+    if position is not None:
+        query = query.where(tuple_(Conversation.updated_at, Conversation.id) < tuple_(*position))
+    query = query.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).scalars().all()
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(page[-1].updated_at, page[-1].id)
+
+    return ConversationPage(
+        items=[
+            ConversationResponse(
+                id=c.id,
+                session_id=c.session_id,
+                title=c.title,
+                created_at=c.created_at.isoformat(),
+                updated_at=c.updated_at.isoformat()
+            )
+            for c in page
+        ],
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/search", response_model=SearchPage)
+async def search_conversations(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user_id: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    البحث في المحادثات - ranked full-text search over stored messages
+
+    Regular users search their own messages. Support staff (SUPPORT_STAFF_EMAILS)
+    search every user, or a single one with `user_id`.
+    """
+
+    if not SEARCH_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search requires the SQLite database with SEARCH_ENABLED"
+        )
+
+    if is_support_staff(current_user):
+        scope = user_id
+    elif user_id is None or user_id == current_user.id:
+        scope = current_user.id
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+
+    position = parse_cursor(cursor, decode_score_cursor)
+    rows = await search_messages(db, q, scope, limit + 1, position)
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last_message, _, last_score = page[-1]
+        next_cursor = encode_score_cursor(last_score, last_message.id)
+
+    return SearchPage(
+        items=[
+            SearchResult(
+                message_id=m.id,
+                conversation_id=c.id,
+                session_id=c.session_id,
+                title=c.title,
+                user_id=c.user_id,
+                role=m.role,
+                content=m.content,
+                created_at=m.created_at.isoformat(),
+                score=score
+            )
+            for m, c, score in page
+        ],
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/{conversation_id}/messages", response_model=MessagePage)
+async def list_messages(
+    conversation_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    رسائل المحادثة - the newest `limit` messages older than `before`,
+    returned in chronological order; next_cursor points to older messages
+    """
+
+    owner_id = await db.scalar(
+        select(Conversation.user_id).where(Conversation.id == conversation_id)
+    )
+    if owner_id is None or (owner_id != current_user.id and not is_support_staff(current_user)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+
+    position = parse_cursor(before)
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    if position is not None:
+        query = query.where(tuple_(Message.created_at, Message.id) < tuple_(*position))
+    query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).scalars().all()
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+
+    return MessagePage(
+        items=[
+            MessageResponse(
+                id=m.id,
+                role=m.role,
+                content=m.content,
+                created_at=m.created_at.isoformat()
+            )
+            for m in reversed(page)
+        ],
+        next_cursor=next_cursor
+    )
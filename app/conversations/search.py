@@ -0,0 +1,172 @@
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import asyncio
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.text import normalize_arabic, search_terms
+from app.core.file_lock import FileLock
+from app.db.database import engine, SessionLocal, IS_SQLITE, DB_PATH
+from app.db.models import Conversation, Message
+from app.auth.security import CurrentUser
+
+# FTS5 is SQLite-only; on PostgreSQL the search endpoint is unavailable
+SEARCH_AVAILABLE = IS_SQLITE and settings.SEARCH_ENABLED
+
+MAX_QUERY_TERMS = 16
+BACKFILL_CHUNK_SIZE = 2000
+
+# body: normalized message text; owner: "u<user_id>" so per-user scoping is
+# an index lookup inside the MATCH instead of a join over every hit
+CREATE_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    body,
+    owner,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+INSERT_FTS_ROW = text(
+    "INSERT INTO messages_fts(rowid, body, owner) VALUES (:id, :body, :owner)"
+)
+
+# bm25 weights: body counts, owner is only a filter. Lower scores rank higher.
+# bm25 is computed for every row the inner query returns, so a common term
+# would score every matching message before LIMIT applies. The inner query
+# walks matches newest first and stops after :max_candidates (-1 = all);
+# only those are scored and ranked.
+RANKED_MATCHES = text("""
+SELECT id, score FROM (
+    SELECT rowid AS id, bm25(messages_fts, 1.0, 0.0) AS score
+    FROM messages_fts
+    WHERE messages_fts MATCH :match
+    ORDER BY rowid DESC
+    LIMIT :max_candidates
+)
+WHERE :after_score IS NULL OR score > :after_score OR (score = :after_score AND id > :after_id)
+ORDER BY score, id
+LIMIT :limit
+""")
+
+
+def owner_token(user_id: int) -> str:
+    return f"u{user_id}"
+
+
+def is_support_staff(user: CurrentUser) -> bool:
+    staff = {e.strip().lower() for e in settings.SUPPORT_STAFF_EMAILS.split(",") if e.strip()}
+    return user.email.lower() in staff
+
+
+def build_match_query(query: str, user_id: Optional[int]) -> Optional[str]:
+    """
+    Translate free text into an FTS5 MATCH expression.
+
+    Every term must match; the last one is a prefix so results follow the
+    user while typing. Terms are quoted, so FTS5 operators in the input are
+    treated as plain words.
+    """
+    terms = search_terms(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += "*"
+    match = f"body : ({' '.join(phrases)})"
+    if user_id is not None:
+        match = f'owner : "{owner_token(user_id)}" AND {match}'
+    return match
+
+
+async def index_messages(db: AsyncSession, rows: Iterable[Tuple[int, int, str]]):
+    """Add (message_id, user_id, content) rows to the index in the caller's transaction"""
+    if not SEARCH_AVAILABLE:
+        return
+    params = [
+        {"id": message_id, "body": normalize_arabic(content), "owner": owner_token(user_id)}
+        for message_id, user_id, content in rows
+    ]
+    if params:
+        await db.execute(INSERT_FTS_ROW, params)
+
+
+async def init_search_index():
+    """Create the FTS5 table and index messages written before it existed"""
+    if not SEARCH_AVAILABLE:
+        return
+    # Every worker runs this at startup; the lock makes one of them do the
+    # backfill while the others wait and then find nothing left to index,
+    # instead of all of them inserting the same rowids
+    lock = FileLock(Path(str(DB_PATH) + ".backfill.lock"))
+    await asyncio.to_thread(lock.acquire)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(CREATE_FTS_TABLE))
+        await _backfill_index()
+    finally:
+        lock.release()
+
+
+async def _backfill_index():
+    # Messages are indexed in the same transaction that inserts them, so
+    # everything up to the highest indexed id is already searchable
+    while True:
+        async with SessionLocal() as db:
+            last_id = await db.scalar(text("SELECT coalesce(max(rowid), 0) FROM messages_fts"))
+            result = await db.execute(
+                select(Message.id, Conversation.user_id, Message.content)
+                .join(Conversation, Conversation.id == Message.conversation_id)
+                .where(Message.id > last_id)
+                .order_by(Message.id)
+                .limit(BACKFILL_CHUNK_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                return
+            await index_messages(db, rows)
+            await db.commit()
+
+
+async def search_messages(
+    db: AsyncSession,
+    query: str,
+    user_id: Optional[int],
+    limit: int,
+    after: Optional[Tuple[float, int]] = None
+) -> List[Tuple[Message, Conversation, float]]:
+    """
+    Ranked search over stored messages, best match first.
+
+    user_id=None searches every user's messages (support staff only).
+    `after` is the (score, id) of the last result of the previous page.
+    Only the newest SEARCH_MAX_CANDIDATES matches are ranked.
+    """
+    match = build_match_query(query, user_id)
+    if match is None:
+        return []
+
+    after_score, after_id = after if after is not None else (None, None)
+    ranked = (await db.execute(RANKED_MATCHES, {
+        "match": match,
+        "after_score": after_score,
+        "after_id": after_id,
+        "limit": limit,
+        "max_candidates": settings.SEARCH_MAX_CANDIDATES or -1,
+    })).all()
+    if not ranked:
+        return []
+
+    scores = {row.id: row.score for row in ranked}
+    result = await db.execute(
+        select(Message, Conversation)
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(Message.id.in_(scores))
+    )
+    found = {message.id: (message, conversation) for message, conversation in result.all()}
+    return [
+        (*found[row.id], row.score)
+        for row in ranked
+        if row.id in found
+    ]
@@ -0,0 +1,165 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import logging
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Conversation, Message
+from app.conversations.search import index_messages
+
+logger = logging.getLogger(__name__)
+
+TITLE_MAX_LENGTH = 80
+
+
+@dataclass
+class ChatLogEntry:
+    user_id: int
+    session_id: str
+    role: str
+    content: str
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+class ChatLogWriter:
+    """
+    Persists chat turns to the conversations/messages tables in batches.
+
+    record() only puts the turn on an in-memory queue, so the WebSocket
+    never waits on the database; a background worker groups queued turns
+    into one transaction every CHAT_LOG_FLUSH_INTERVAL seconds (or every
+    CHAT_LOG_BATCH_SIZE turns). The history is best effort: turns are
+    dropped when the queue is full or a batch fails to commit.
+    """
+
+    def __init__(self):
+        self.enabled = settings.CHAT_LOG_ENABLED
+        self.batch_size = max(1, settings.CHAT_LOG_BATCH_SIZE)
+        self.flush_interval = settings.CHAT_LOG_FLUSH_INTERVAL
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.CHAT_LOG_QUEUE_SIZE)
+        self._worker: Optional[asyncio.Task] = None
+
+        self.written_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0
+
+    def record(self, user_id: int, session_id: str, role: str, content: str):
+        """Queue one chat turn for persistence (never blocks)"""
+        if not self.enabled:
+            return
+        try:
+            self.queue.put_nowait(ChatLogEntry(user_id, session_id, role, content))
+        except asyncio.QueueFull:
+            self.dropped_count += 1
+            logger.warning(f"Chat log queue full, dropping {role} message for session {session_id}")
+
+    def start(self):
+        """Start the background writer (called on app startup)"""
+        if self.enabled and self._worker is None:
+            self._worker = asyncio.create_task(self._run_worker())
+
+    async def _next_batch(self) -> List[ChatLogEntry]:
+        """Wait for one entry, then collect up to batch_size within flush_interval"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_batch(self, batch: List[ChatLogEntry]):
+        async with SessionLocal() as db:
+            session_ids = {entry.session_id for entry in batch}
+            result = await db.execute(
+                select(Conversation).where(Conversation.session_id.in_(session_ids))
+            )
+            conversations: Dict[str, Conversation] = {c.session_id: c for c in result.scalars()}
+
+            accepted = []
+            for entry in batch:
+                conversation = conversations.get(entry.session_id)
+                if conversation is None:
+                    conversation = Conversation(
+                        user_id=entry.user_id,
+                        session_id=entry.session_id,
+                        title=entry.content[:TITLE_MAX_LENGTH] if entry.role == "user" else None,
+                        created_at=entry.created_at,
+                        updated_at=entry.created_at,
+                    )
+                    db.add(conversation)
+                    conversations[entry.session_id] = conversation
+                elif conversation.user_id != entry.user_id:
+                    logger.warning(f"Session {entry.session_id} belongs to another user, message not saved")
+                    continue
+                elif entry.created_at > conversation.updated_at:
+                    conversation.updated_at = entry.created_at
+                if conversation.title is None and entry.role == "user":
+                    conversation.title = entry.content[:TITLE_MAX_LENGTH]
+                accepted.append((conversation, entry))
+
+            # Assign ids to new conversations before inserting their messages
+            await db.flush()
+            messages = [
+                Message(
+                    conversation_id=conversation.id,
+                    role=entry.role,
+                    content=entry.content,
+                    created_at=entry.created_at,
+                )
+                for conversation, entry in accepted
+            ]
+            db.add_all(messages)
+            await db.flush()
+            # Keep the search index in step with the messages table
+            await index_messages(db, [
+                (message.id, conversation.user_id, message.content)
+                for message, (conversation, _) in zip(messages, accepted)
+            ])
+            await db.commit()
+            self.written_count += len(accepted)
+
+    async def _run_worker(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                self.failed_count += len(batch)
+                logger.error(f"Failed to persist {len(batch)} chat messages: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written_count,
+            "failed": self.failed_count,
+            "dropped": self.dropped_count,
+        }
+
+    async def close(self):
+        """Flush queued turns, then stop the writer (called on app shutdown)"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=settings.CHAT_LOG_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Chat log not drained on shutdown, {self.queue.qsize()} messages lost")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
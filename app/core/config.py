@@ -1,5 +1,8 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
 class Settings(BaseSettings):
     APP_NAME: str = "كنق الاتمته - Chatbot"
@@ -11,7 +14,55 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_MODEL: str = "gpt-4"
     OPENAI_MAX_TOKENS: int = 2000
+    OPENAI_PROMPT_TOKEN_BUDGET: int = 6000  # الحد الأقصى لتوكنات السياق المرسل (system + history)
     OPENAI_TEMPERATURE: float = 0.7
+    OPENAI_STREAMING: bool = True  # إرسال الرد عبر WebSocket كأجزاء (assistant_delta) فور توليدها
+    OPENAI_BASE_URL: Optional[str] = None  # خادم متوافق مع OpenAI (اختياري)
+    OPENAI_STREAM_USAGE: bool = True  # طلب usage في آخر جزء من التدفق (عطّله إذا رفضه الخادم المتوافق)
+    OPENAI_MAX_CONCURRENCY: int = 32  # أقصى عدد طلبات متزامنة للنموذج الأساسي
+    OPENAI_RPM: int = 0  # حد الطلبات في الدقيقة (0 = بدون حد)
+    OPENAI_TPM: int = 0  # حد التوكنات في الدقيقة (0 = بدون حد)
+    
+    # Fallback model (used when the primary is saturated or failing)
+    OPENAI_FALLBACK_MODEL: Optional[str] = None  # مثال: gpt-3.5-turbo
+    OPENAI_FALLBACK_BASE_URL: Optional[str] = None
+    OPENAI_FALLBACK_API_KEY: Optional[str] = None
+    OPENAI_FALLBACK_MAX_CONCURRENCY: int = 32
+    OPENAI_FALLBACK_RPM: int = 0
+    OPENAI_FALLBACK_TPM: int = 0
+    
+    # LLM router
+    LLM_PROVIDER: str = "openai"  # openai أو fake (مزود محلي للاختبار)
+    LLM_QUEUE_TIMEOUT: float = 10.0  # أقصى انتظار لمكان لدى أي مزود قبل رسالة "الخدمة مشغولة"
+    LLM_MAX_ATTEMPTS: int = 3
+    LLM_RATE_LIMIT_COOLDOWN: float = 10.0  # تهدئة المزود بعد 429 إذا لم يرسل Retry-After
+    LLM_ERROR_COOLDOWN: float = 1.0  # تهدئة المزود بعد مهلة أو خطأ 5xx
+    LLM_FAKE_LATENCY: float = 0.05
+    LLM_COALESCE_ENABLED: bool = True  # دمج الطلبات المتطابقة الجارية في استدعاء واحد للمزود
+    
+    # Admission control (fair queue in front of the LLM providers)
+    ADMISSION_MAX_CONCURRENT: int = 32  # ردود تعمل في نفس الوقت على هذه العملية (0 = بدون حد)
+    ADMISSION_MAX_QUEUE: int = 500  # طلبات منتظرة قبل رفض الجديد منها فوراً
+    ADMISSION_QUEUE_TIMEOUT: float = 20.0  # أقصى انتظار في الطابور قبل رسالة "الخدمة مشغولة"
+    ADMISSION_POSITION_INTERVAL: float = 0.5  # أقل فاصل بين حسابات مواقع الطابور
+    
+    # Response cache for repeated prompts (opt-in)
+    # الذاكرتان تعملان فقط إذا كانت OPENAI_TEMPERATURE <= RESPONSE_CACHE_MAX_TEMPERATURE (القيمة الافتراضية 0.7 تعطلهما)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_MAX_TEMPERATURE: float = 0.3  # لا يُستخدم التخزين إذا كانت OPENAI_TEMPERATURE أعلى
+    RESPONSE_CACHE_TTL_SECONDS: int = 3600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_REDIS_ENABLED: bool = False  # مشاركة الردود المخزنة بين جميع العمليات
+    
+    # Semantic cache for near-duplicate questions (opt-in, same eligibility as the response cache)
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # أدنى تشابه (cosine) لاعتبار السؤالين متطابقين
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    SEMANTIC_CACHE_EMBEDDER: str = "hashing"  # hashing (محلي بدون اتصال) أو openai
+    SEMANTIC_CACHE_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    SEMANTIC_CACHE_EMBEDDING_DIM: int = 1536  # طول متجه openai؛ يجب أن يطابق النموذج إن لم يكن text-embedding-3
+    SEMANTIC_CACHE_HASH_DIM: int = 512
     
     POSTGRES_HOST: Optional[str] = "localhost"
     POSTGRES_PORT: int = 5432
@@ -19,16 +70,119 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: Optional[str] = None
     POSTGRES_DB: Optional[str] = None
     
+    # Database connection pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    
+    # SQLite (عند عدم إعداد PostgreSQL)
+    SQLITE_PATH: Path = DATA_DIR / "app.db"
+    SQLITE_PRODUCTION_MODE: bool = True  # WAL + PRAGMAs + فصل اتصالات القراءة عن الكتابة
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # NORMAL آمن مع WAL وأسرع من FULL
+    SQLITE_CACHE_SIZE: int = -64000  # قيمة سالبة = حجم بالكيلوبايت (64MB) لكل اتصال
+    SQLITE_MMAP_SIZE: int = 268435456  # 256MB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # انتظار القفل بدلاً من "database is locked"
+    SQLITE_READ_POOL_SIZE: int = 8  # عدد اتصالات القراءة (الكتابة عبر اتصال واحد)
+    
     MONGODB_URI: Optional[str] = None
     MONGODB_DB: Optional[str] = "chatbot_db"
     
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50  # حجم مجمع الاتصالات المشترك
+    REDIS_POOL_TIMEOUT: float = 5.0  # ثوانٍ لانتظار اتصال متاح من المجمع
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    
+    # Conversation history (per session)
+    CONVERSATION_MAX_SESSIONS: int = 10000
+    CONVERSATION_MAX_MESSAGES: int = 20
+    CONVERSATION_TTL_SECONDS: int = 3600
+    CONVERSATION_REDIS_ENABLED: bool = False
+    
+    # Persistent chat log (conversations/messages tables)
+    CHAT_LOG_ENABLED: bool = True  # حفظ محادثات المستخدمين المسجلين في قاعدة البيانات
+    CHAT_LOG_QUEUE_SIZE: int = 10000
+    CHAT_LOG_BATCH_SIZE: int = 200  # عدد الرسائل في كل transaction
+    CHAT_LOG_FLUSH_INTERVAL: float = 0.5  # ثوانٍ لتجميع الدفعة قبل الكتابة
+    CHAT_LOG_DRAIN_TIMEOUT: float = 5.0
+    
+    # Conversation search (SQLite FTS5)
+    SEARCH_ENABLED: bool = True
+    SEARCH_MAX_CANDIDATES: int = 10000  # أحدث النتائج المطابقة التي تُرتب بـ BM25 (0 = كل النتائج)
+    SUPPORT_STAFF_EMAILS: str = ""  # بريد فريق الدعم مفصول بفواصل، يمكنهم البحث في محادثات جميع المستخدمين
+    
+    # Rate limiting (token buckets per user, or per client IP when anonymous)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_ENABLED: bool = False  # حدود مشتركة بين كل العمليات عبر Redis (Lua)
+    RATE_LIMIT_MAX_KEYS: int = 100000  # أقصى عدد buckets في الذاكرة
+    RATE_LIMIT_LOGIN: str = "10/minute"  # لكل IP؛ "0" لإلغاء الحد
+    RATE_LIMIT_REGISTER: str = "5/minute"  # لكل IP
+    RATE_LIMIT_SEND_MESSAGE: str = "30/minute"  # لكل مستخدم أو IP
+    RATE_LIMIT_WS_CONNECT: str = "30/minute"  # اتصالات WebSocket جديدة لكل IP
+    RATE_LIMIT_CHAT_ANON: str = "10/minute"  # رسائل الشات لكل IP بدون تسجيل دخول
+    RATE_LIMIT_CHAT_USER: str = "30/minute"  # رسائل الشات لكل مستخدم مسجل
+    RATE_LIMIT_WS_MAX_VIOLATIONS: int = 5  # رسائل مرفوضة متتالية قبل إغلاق الاتصال (1008)
+    
+    # JWT (shared by all workers)
+    JWT_ALGORITHM: str = "HS256"  # HS256 أو RS256 / ES256 (توقيع غير متماثل)
+    JWT_SECRET_KEY: Optional[str] = None  # مفتاح HS256 المشترك؛ إذا لم يُضبط يُنشأ مرة ويُحفظ في JWT_SECRET_FILE
+    JWT_SECRET_FILE: Path = DATA_DIR / "jwt_secret.key"
+    JWT_KEY_ID: str = "k1"  # kid في ترويسة التوكنات الجديدة؛ يُغيَّر عند تدوير المفتاح
+    JWT_PRIVATE_KEY_PATH: Optional[Path] = None  # مفتاح التوقيع PEM لـ RS256/ES256
+    JWT_PUBLIC_KEY_PATH: Optional[Path] = None  # مفتاح التحقق PEM (يكفي وحده لخدمة تتحقق فقط)
+    JWT_PREVIOUS_KEYS: str = ""  # مفاتيح سابقة مقبولة للتحقق: kid:ALG:secret أو kid:ALG:/path/public.pem مفصولة بفواصل
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 ساعة
+    
+    # Password hashing (bcrypt worker pool)
+    BCRYPT_ROUNDS: int = 12  # كلفة bcrypt (كل +1 يضاعف الوقت)
+    BCRYPT_WORKERS: int = 4  # عدد خيوط التجزئة المتوازية
+    BCRYPT_MAX_QUEUE: int = 64  # طلبات منتظرة قبل الرد بـ 503
+    
+    # Auth hot-path cache (decoded tokens + user rows)
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_TTL_SECONDS: int = 30  # أقصى تأخير لتطبيق تسجيل الخروج إذا فُقدت رسالة pub/sub
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_REVOCATION_CHANNEL: str = "auth:revocations"
     
     # N8N Webhook Configuration
     N8N_WEBHOOK_URL: Optional[str] = None
     N8N_WEBHOOK_ENABLED: bool = False
+    N8N_WEBHOOK_TIMEOUT: float = 10.0
+    N8N_WEBHOOK_MAX_RETRIES: int = 3
+    N8N_WEBHOOK_BACKOFF_BASE: float = 0.5  # ثوانٍ، تتضاعف مع كل محاولة (مع jitter)
+    N8N_WEBHOOK_BACKOFF_MAX: float = 8.0
+    N8N_CIRCUIT_FAILURE_THRESHOLD: int = 5  # إخفاقات متتالية قبل فتح الدائرة
+    N8N_CIRCUIT_RESET_TIMEOUT: float = 30.0  # ثوانٍ قبل إرسال طلب اختبار
+    N8N_WEBHOOK_QUEUE_SIZE: int = 10000  # الحد الأقصى للأحداث المنتظرة في طابور الإرسال
+    N8N_WEBHOOK_CONCURRENCY: int = 20  # أقصى عدد طلبات متزامنة إلى n8n (كل حدث في طلب مستقل)
+    N8N_WEBHOOK_FLUSH_INTERVAL: float = 0.5  # ثوانٍ لتجميع الأحداث قبل إرسالها بالتوازي
+    N8N_WEBHOOK_DRAIN_TIMEOUT: float = 10.0  # مهلة تفريغ الطابور عند إيقاف الخادم
+    N8N_OUTBOX_ENABLED: bool = True  # حفظ الأحداث في ملف دائم حتى تأكيد إرسالها
+    N8N_OUTBOX_PATH: Path = DATA_DIR / "n8n_outbox.jsonl"  # ملف العملية الأولى؛ البقية n8n_outbox.1.jsonl ...
+    N8N_OUTBOX_FSYNC: bool = False  # fsync بعد كل حدث (أبطأ، يحمي من انقطاع الكهرباء)
+    N8N_OUTBOX_COMPACT_THRESHOLD: int = 1000  # عدد التأكيدات قبل إعادة كتابة الملف
+    N8N_OUTBOX_REDELIVER_INTERVAL: float = 5.0  # ثوانٍ بين محاولات إعادة إرسال الأحداث المعلقة
+    N8N_DEAD_LETTER_PATH: Path = DATA_DIR / "n8n_dead_letter.jsonl"  # الأحداث التي رفضها n8n نهائياً (4xx)
+    N8N_CALLBACK_SECRET: Optional[str] = None  # قيمة ترويسة X-N8N-Secret المطلوبة في /api/n8n/callback
+    
+    # WebSocket delivery across workers (Redis pub/sub)
+    WORKERS: int = 1  # عدد عمليات uvicorn في run.py (أكثر من 1 يتطلب REALTIME_REDIS_ENABLED)
+    REALTIME_REDIS_ENABLED: bool = False  # توصيل إشعارات n8n والبث لاتصالات أي عملية عبر Redis
+    REALTIME_CHANNEL: str = "ws:deliver"
+    
+    # Tracing (OpenTelemetry)
+    TRACING_ENABLED: bool = False  # تتبع كل طلب HTTP ودورة شات مع Redis وقاعدة البيانات و n8n
+    TRACING_EXPORTER: str = "memory"  # memory (آخر الـ spans في /api/tracing/spans) | file (JSON lines)
+    TRACING_FILE_PATH: Path = DATA_DIR / "traces.jsonl"
+    TRACING_MAX_SPANS: int = 10000  # عدد الـ spans المحفوظة في الذاكرة
+    TRACING_SAMPLE_RATIO: float = 1.0  # نسبة الطلبات التي يتم تتبعها (0.0 - 1.0)
+    TRACING_SERVICE_NAME: str = "moj-agentic-ai"
+    TRACING_EXCLUDE_PATHS: str = "/metrics,/health"  # مسارات لا يتم تتبعها، مفصولة بفواصل
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,113 @@
+"""
+Prometheus metrics for the hot paths, exposed on GET /metrics.
+
+Every metric lives in the default prometheus_client registry. With
+several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory shared by the workers: each one then writes its
+samples there and render() aggregates all of them, otherwise a scrape
+only sees the worker that happened to answer it.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Sub-millisecond to one second: Redis round trips and SQL statements
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# bcrypt cost 10-14 lands between ~50ms and ~1s
+BCRYPT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Chat turns include queueing behind the admission controller and the provider
+TURN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+CHAT_TURN_SECONDS = Histogram(
+    "chat_turn_duration_seconds",
+    "WebSocket chat turn latency by phase (n8n enqueue, llm_first_token, llm_total, total)",
+    ["phase"],
+    buckets=TURN_BUCKETS,
+)
+CHAT_TURNS = Counter(
+    "chat_turns_total",
+    "WebSocket chat turns by outcome (completed, cancelled, error)",
+    ["outcome"],
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Upstream token usage reported by the provider",
+    ["provider", "model", "kind"],
+)
+
+WEBHOOK_REQUEST_SECONDS = Histogram(
+    "n8n_webhook_request_duration_seconds",
+    "Single n8n webhook POST latency by outcome (success, rejected, error)",
+    ["outcome"],
+    buckets=TURN_BUCKETS,
+)
+WEBHOOK_EVENTS = Counter(
+    "n8n_webhook_events_total",
+    "n8n events after retries (sent, rejected, failed)",
+    ["result"],
+)
+
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_duration_seconds",
+    "Redis command round trip latency",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency by engine (write, read) and statement type",
+    ["engine", "operation"],
+    buckets=FAST_BUCKETS,
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds",
+    "bcrypt time per operation (hash, verify), excluding time queued for a worker thread",
+    ["operation"],
+    buckets=BCRYPT_BUCKETS,
+)
+PASSWORD_JOBS = Gauge(
+    "password_jobs_in_flight",
+    "bcrypt jobs queued for or running on the worker pool",
+    multiprocess_mode="livesum",
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_connections_active",
+    "WebSocket connections currently open",
+    multiprocess_mode="livesum",
+)
+
+
+def record_usage(provider: str, model: str, usage) -> None:
+    """Count prompt/completion tokens from an OpenAI `usage` object (ignored when missing)"""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", None) or 0
+    completion = getattr(usage, "completion_tokens", None) or 0
+    if prompt:
+        LLM_TOKENS.labels(provider, model, "prompt").inc(prompt)
+    if completion:
+        LLM_TOKENS.labels(provider, model, "completion").inc(completion)
+
+
+def render() -> bytes:
+    """Text exposition of every metric (aggregated across workers in multiprocess mode)"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+import asyncio
+import math
+import time
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.redis_client import RedisClient
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate` tokens per second.
+
+    `capacity` bounds the burst size. A rate of 0 or less means unlimited.
+    Waiting callers are not queued fairly; each one sleeps until its own
+    amount could be available and retries.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, limit: float) -> "TokenBucket":
+        """Bucket for an RPM/TPM style limit: full minute of burst, refilled evenly"""
+        return cls(limit / 60.0, capacity=limit)
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> float:
+        if self.unlimited:
+            return float("inf")
+        self._refill()
+        return self._tokens
+
+    def time_until(self, amount: float = 1.0) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        if self.unlimited:
+            return 0.0
+        amount = min(amount, self.capacity)
+        missing = amount - self.available()
+        return max(0.0, missing / self.rate)
+
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        if self.unlimited:
+            return True
+        # Requests larger than the bucket may still pass once it is full
+        amount = min(amount, self.capacity)
+        if self.available() >= amount:
+            self._tokens -= amount
+            return True
+        return False
+
+    async def acquire(self, amount: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Wait until `amount` tokens are taken, or give up after `timeout` seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire(amount):
+            delay = self.time_until(amount)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or delay > remaining:
+                    return False
+            await asyncio.sleep(delay)
+        return True
+
+
+_PERIODS = {
+    "s": 1, "sec": 1, "second": 1,
+    "m": 60, "min": 60, "minute": 60,
+    "h": 3600, "hour": 3600,
+    "d": 86400, "day": 86400,
+}
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """`limit` requests per `period` seconds, with bursts of up to `limit`"""
+
+    limit: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Optional["RateLimitRule"]:
+        """Parse "20/minute" style settings; empty or "0" disables the limit"""
+        if not value or value.strip() in ("0", "off"):
+            return None
+        count, _, unit = value.strip().partition("/")
+        unit = unit.strip().lower() or "minute"
+        if unit not in _PERIODS and unit.endswith("s"):
+            unit = unit[:-1]
+        if unit not in _PERIODS:
+            raise ValueError(f"Invalid rate limit: {value!r}")
+        limit = int(count)
+        return cls(limit, float(_PERIODS[unit])) if limit > 0 else None
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int = 0
+    remaining: int = 0
+    retry_after: float = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class MemoryRateLimitBackend:
+    """Token buckets in this process (per-worker limits)"""
+
+    def __init__(self, max_keys: int):
+        # an idle bucket is full again after one period, so it can be dropped
+        self._buckets = TTLCache(max_keys, ttl_seconds=86400)
+
+    def hit(self, key: str, rule: RateLimitRule, cost: int = 1) -> RateLimitResult:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rule.rate, capacity=rule.limit)
+        allowed = bucket.try_acquire(cost)
+        self._buckets.set(key, bucket, ttl=rule.period)
+        return RateLimitResult(
+            allowed=allowed,
+            limit=rule.limit,
+            remaining=int(bucket.available()),
+            retry_after=0.0 if allowed else bucket.time_until(cost)
+        )
+
+
+class RateLimiter:
+    """
+    Per-identity request throttling with token buckets.
+
+    Rules come from RATE_LIMIT_<SCOPE> settings (e.g. RATE_LIMIT_LOGIN).
+    With RATE_LIMIT_REDIS_ENABLED buckets live in Redis and are updated by a
+    Lua script, so the limit holds across all workers; if Redis is
+    unreachable the in-process buckets are used instead.
+    """
+
+    def __init__(self):
+        self.enabled = settings.RATE_LIMIT_ENABLED
+        self.use_redis = settings.RATE_LIMIT_REDIS_ENABLED
+        self.memory = MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+        self._rules: Dict[str, Optional[RateLimitRule]] = {}
+
+        self.allowed = 0
+        self.throttled = 0
+        self.redis_errors = 0
+
+    def rule(self, scope: str) -> Optional[RateLimitRule]:
+        if scope not in self._rules:
+            self._rules[scope] = RateLimitRule.parse(getattr(settings, f"RATE_LIMIT_{scope.upper()}"))
+        return self._rules[scope]
+
+    async def hit(self, scope: str, identity: str, cost: int = 1) -> RateLimitResult:
+        rule = self.rule(scope)
+        if not self.enabled or rule is None:
+            return RateLimitResult(allowed=True)
+
+        key = f"ratelimit:{scope}:{identity}"
+        result = None
+        if self.use_redis:
+            state = await RedisClient.token_bucket(key, rule.rate, rule.limit, cost)
+            if state is None:
+                self.redis_errors += 1
+            else:
+                allowed, tokens, retry_after = state
+                result = RateLimitResult(allowed, rule.limit, int(tokens), retry_after)
+        if result is None:
+            result = self.memory.hit(key, rule, cost)
+
+        if result.allowed:
+            self.allowed += 1
+        else:
+            self.throttled += 1
+        return result
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "backend": "redis" if self.use_redis else "memory",
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "redis_errors": self.redis_errors,
+        }
+
+
+rate_limiter = RateLimiter()
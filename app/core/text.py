@@ -0,0 +1,33 @@
+import re
+
+# Harakat, tanween, shadda, sukun, superscript alef and Quranic marks
+_ARABIC_DIACRITICS = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+_TATWEEL = "\u0640"
+
+_ARABIC_LETTER_MAP = str.maketrans({
+    "\u0622": "\u0627",  # آ -> ا
+    "\u0623": "\u0627",  # أ -> ا
+    "\u0625": "\u0627",  # إ -> ا
+    "\u0671": "\u0627",  # ٱ -> ا
+    "\u0649": "\u064A",  # ى -> ي
+    "\u0629": "\u0647",  # ة -> ه
+})
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_arabic(text: str) -> str:
+    """
+    Fold Arabic spelling variants so indexing and queries agree.
+
+    Strips diacritics and tatweel, unifies alef/ya/ta-marbuta forms and
+    casefolds Latin text. The same function must be applied to both the
+    indexed text and the search query.
+    """
+    text = _ARABIC_DIACRITICS.sub("", text).replace(_TATWEEL, "")
+    return text.translate(_ARABIC_LETTER_MAP).casefold()
+
+
+def search_terms(text: str) -> list:
+    """Normalized word tokens of a search query"""
+    return _WORD.findall(normalize_arabic(text))
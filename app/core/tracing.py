@@ -0,0 +1,194 @@
+"""
+OpenTelemetry tracing for chat turns and HTTP requests.
+
+Root spans are opened by TracingMiddleware (one per HTTP request) and by
+the WebSocket loop (one per chat turn). Redis commands, SQL statements,
+AIService calls and n8n posts open child spans with child_span(), which
+records nothing unless a traced request or turn is in progress, so
+background work (pub/sub listener, chat log flushes) never starts traces
+of its own.
+
+Spans go to an in-memory ring (TRACING_EXPORTER=memory, read back through
+GET /api/tracing/spans) or to a JSON lines file (TRACING_EXPORTER=file).
+With TRACING_ENABLED=False no SDK is loaded and every span is the no-op
+span of opentelemetry-api.
+"""
+from collections import deque
+from contextlib import nullcontext
+from typing import Deque, Dict, List, Optional
+import functools
+import json
+
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind
+
+from app.core.config import settings
+
+tracer = trace.get_tracer("app")
+
+_provider = None
+_recent = None
+
+
+class RecentSpans:
+    """Span exporter that keeps the last `max_spans` finished spans in memory"""
+
+    def __init__(self, max_spans: int):
+        self._spans: Deque = deque(maxlen=max_spans)
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        self._spans.extend(spans)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+    def find(self, trace_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Newest first; `trace_id` is the 32 character hex id sent to n8n"""
+        found = []
+        for span in reversed(self._spans):
+            if trace_id is not None and format(span.context.trace_id, "032x") != trace_id:
+                continue
+            found.append(json.loads(span.to_json(indent=None)))
+            if len(found) >= limit:
+                break
+        return found
+
+
+def setup_tracing():
+    """Install the SDK tracer provider and exporter (no-op unless TRACING_ENABLED)"""
+    global _provider, _recent
+    if not settings.TRACING_ENABLED or _provider is not None:
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    if settings.TRACING_EXPORTER == "file":
+        path = settings.TRACING_FILE_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # one span per line; the batch processor writes from its own thread
+        exporter = ConsoleSpanExporter(
+            out=open(path, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+    else:
+        _recent = RecentSpans(settings.TRACING_MAX_SPANS)
+        provider.add_span_processor(SimpleSpanProcessor(_recent))
+
+    trace.set_tracer_provider(provider)
+    _provider = provider
+
+
+def shutdown_tracing():
+    """Flush pending spans (called on app shutdown)"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def recent_spans(trace_id: Optional[str] = None, limit: int = 100) -> Optional[List[Dict]]:
+    """Spans kept by the memory exporter, or None when it is not in use"""
+    if _recent is None:
+        return None
+    return _recent.find(trace_id, limit)
+
+
+def child_span(name: str, attributes: Optional[Dict] = None, traceparent: Optional[str] = None,
+               kind: SpanKind = SpanKind.INTERNAL):
+    """
+    Context manager for a span under the current one.
+
+    `traceparent` (W3C header value) parents the span on a trace started
+    elsewhere, e.g. the chat turn that queued an n8n event. Without a
+    recording parent the no-op span is returned and nothing is recorded.
+    """
+    if traceparent:
+        context = propagate.extract({"traceparent": traceparent})
+        if trace.get_current_span(context).get_span_context().is_valid:
+            return tracer.start_as_current_span(name, context=context, kind=kind, attributes=attributes)
+    if not trace.get_current_span().is_recording():
+        return nullcontext(trace.INVALID_SPAN)
+    return tracer.start_as_current_span(name, kind=kind, attributes=attributes)
+
+
+def traced(name: str):
+    """Decorator: run a coroutine function inside child_span(name)"""
+
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with child_span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def trace_fields() -> Dict[str, str]:
+    """trace_id and traceparent of the current span, for payloads sent to n8n"""
+    context = trace.get_current_span().get_span_context()
+    if not context.is_valid:
+        return {}
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return {"trace_id": format(context.trace_id, "032x"), "traceparent": carrier.get("traceparent", "")}
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of every HTTP request.
+
+    An incoming `traceparent` header continues the caller's trace, and the
+    trace id is returned in `X-Trace-Id`. WebSocket turns are traced by the
+    chat loop itself, one span per message instead of one per connection.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.exclude = {path.strip() for path in settings.TRACING_EXCLUDE_PATHS.split(",") if path.strip()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _provider is None or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        method = scope["method"]
+        with tracer.start_as_current_span(
+            method,
+            context=propagate.extract(headers) if "traceparent" in headers else None,
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as span:
+            trace_id = format(span.get_span_context().trace_id, "032x").encode()
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(trace.Status(trace.StatusCode.ERROR))
+                    message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace_id)]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    # the route template keeps span names low-cardinality
+                    span.update_name(f"{method} {route.path}")
+                    span.set_attribute("http.route", route.path)
+
+
+setup_tracing()
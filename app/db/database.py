@@ -1,35 +1,175 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.orm import declarative_base
+from opentelemetry import trace
 from pathlib import Path
+from typing import AsyncIterator
+import time
+
+from app.core.config import settings
+from app.core.metrics import DB_QUERY_SECONDS
+from app.core.tracing import tracer
 
 # SQLite database path
-DB_PATH = Path(__file__).parent.parent.parent / "data" / "app.db"
+DB_PATH = Path(settings.SQLITE_PATH)
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
+def get_database_url() -> URL:
+    """PostgreSQL (asyncpg) when POSTGRES_* is configured, otherwise SQLite (aiosqlite)"""
+    if settings.POSTGRES_USER and settings.POSTGRES_PASSWORD and settings.POSTGRES_DB:
+        return URL.create(
+            "postgresql+asyncpg",
+            username=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            host=settings.POSTGRES_HOST,
+            port=settings.POSTGRES_PORT,
+            database=settings.POSTGRES_DB,
+        )
+    return URL.create("sqlite+aiosqlite", database=str(DB_PATH))
+
+
+SQLALCHEMY_DATABASE_URL = get_database_url()
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.get_backend_name() == "sqlite"
+SQLITE_PRODUCTION = IS_SQLITE and settings.SQLITE_PRODUCTION_MODE
+
+
+def _apply_sqlite_pragmas(engine: AsyncEngine, read_only: bool = False):
+    """Run the production PRAGMAs on every new SQLite connection"""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def _operation(statement: str) -> str:
+    words = statement.split(None, 1)
+    operation = words[0].upper() if words else ""
+    return operation if operation in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def _instrument(engine: AsyncEngine, name: str):
+    """
+    Record every SQL statement's latency in DB_QUERY_SECONDS{engine=name},
+    and as a child span when the statement runs inside a traced request
+    """
+    system = engine.dialect.name
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        operation = _operation(statement)
+        span = None
+        if trace.get_current_span().is_recording():
+            span = tracer.start_span(f"db {operation}", attributes={
+                "db.system": system,
+                "db.operation": operation,
+                "db.statement": statement,
+                "db.engine": name,
+            })
+        conn.info.setdefault("query_started", []).append((time.perf_counter(), operation, span))
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started, operation, span = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(name, operation).observe(time.perf_counter() - started)
+        if span is not None:
+            span.end()
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def drop_timer(exception_context):
+        connection = exception_context.connection
+        started = connection.info.get("query_started") if connection is not None else None
+        if started:
+            _, _, span = started.pop()
+            if span is not None:
+                span.record_exception(exception_context.original_exception)
+                span.set_status(trace.Status(trace.StatusCode.ERROR))
+                span.end()
+
+
+if SQLITE_PRODUCTION:
+    # SQLite allows a single writer at a time: funnel all writes through one
+    # pooled connection so they queue in the pool instead of failing with
+    # "database is locked", while WAL lets the reader pool run concurrently.
+    engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    read_engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    _apply_sqlite_pragmas(engine)
+    _apply_sqlite_pragmas(read_engine, read_only=True)
+else:
+    engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=not IS_SQLITE,
+    )
+    read_engine = engine
+
+_instrument(engine, "write")
+if read_engine is not engine:
+    _instrument(read_engine, "read")
+
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency to get database session"""
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """Dependency to get database session (read/write)"""
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    """Dependency to get a read-only database session (never waits on the writer)"""
+    async with ReadSessionLocal() as db:
+        yield db
+
+
+async def init_db():
     """Initialize database tables"""
-    from app.db.models import User, XAccount
-    Base.metadata.create_all(bind=engine)
+    from app.db.models import User, XAccount, Conversation, Message
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
     print("Database tables created successfully")
+
+
+async def close_db():
+    """Dispose of pooled connections"""
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -15,6 +15,9 @@ class User(Base):
     # Relationship with X accounts
     x_accounts = relationship("XAccount", back_populates="user", cascade="all, delete-orphan")
     
+    # Relationship with chat conversations
+    conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan")
+    
     def __repr__(self):
         return f"<User(id={self.id}, email={self.email})>"
 
@@ -35,3 +38,45 @@ class XAccount(Base):
     
     def __repr__(self):
         return f"<XAccount(id={self.id}, username={self.username}, status={self.status})>"
+
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+    __table_args__ = (
+        # Sidebar listing: WHERE user_id = ? ORDER BY updated_at DESC, id DESC
+        Index("ix_conversations_user_updated", "user_id", "updated_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(String(64), unique=True, nullable=False)
+    title = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    user = relationship("User", back_populates="conversations")
+    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", passive_deletes=True)
+    
+    def __repr__(self):
+        return f"<Conversation(id={self.id}, user_id={self.user_id}, session_id={self.session_id})>"
+
+
+class Message(Base):
+    __tablename__ = "messages"
+    __table_args__ = (
+        # History view: WHERE conversation_id = ? ORDER BY created_at, id
+        Index("ix_messages_conversation_created", "conversation_id", "created_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String(20), nullable=False)  # user, assistant
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationship with Conversation
+    conversation = relationship("Conversation", back_populates="messages")
+    
+    def __repr__(self):
+        return f"<Message(id={self.id}, conversation_id={self.conversation_id}, role={self.role})>"
@@ -1,83 +1,222 @@
-import redis
-from typing import Optional
+import redis.asyncio as redis
+from typing import List, Optional, Tuple
+import time
 from app.core.config import settings
+from app.core.metrics import REDIS_COMMAND_SECONDS
+from app.core.tracing import child_span
+
+# Token bucket refill + take in one atomic step; state is {tokens, ts} in a hash.
+# Returns {allowed, tokens left, seconds until `cost` tokens are available}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), capacity)
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that records every command in REDIS_COMMAND_SECONDS and as a trace span"""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        started = time.perf_counter()
+        try:
+            with child_span(f"redis {command}", {"db.system": "redis", "db.operation": command}):
+                return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(command).observe(time.perf_counter() - started)
 
 
 class RedisClient:
     _instance: Optional[redis.Redis] = None
+    _pool: Optional[redis.BlockingConnectionPool] = None
     
     @classmethod
     def get_client(cls) -> redis.Redis:
-        """Get Redis client instance (singleton)"""
+        """Get asyncio Redis client instance (singleton, shared connection pool)"""
         if cls._instance is None:
-            cls._instance = redis.Redis(
+            cls._pool = redis.BlockingConnectionPool(
                 host=settings.REDIS_HOST,
                 port=settings.REDIS_PORT,
                 db=settings.REDIS_DB,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
                 decode_responses=True
             )
+            cls._instance = InstrumentedRedis(connection_pool=cls._pool)
         return cls._instance
     
     @classmethod
-    def set_session(cls, session_id: str, user_id: int, expires: int = 86400) -> bool:
+    async def close(cls):
+        """Close the client and disconnect all pooled connections"""
+        if cls._instance is not None:
+            await cls._instance.aclose()
+            cls._instance = None
+        if cls._pool is not None:
+            await cls._pool.disconnect()
+            cls._pool = None
+    
+    @classmethod
+    async def set_session(cls, session_id: str, user_id: int, expires: int = 86400) -> bool:
         """Store session in Redis (default 24 hours)"""
         try:
             client = cls.get_client()
-            client.setex(f"session:{session_id}", expires, str(user_id))
+            await client.setex(f"session:{session_id}", expires, str(user_id))
             return True
         except Exception as e:
             print(f"Redis error setting session: {e}")
             return False
     
     @classmethod
-    def get_session(cls, session_id: str) -> Optional[int]:
+    async def get_session(cls, session_id: str) -> Optional[int]:
         """Get user_id from session"""
         try:
             client = cls.get_client()
-            user_id = client.get(f"session:{session_id}")
+            user_id = await client.get(f"session:{session_id}")
             return int(user_id) if user_id else None
         except Exception as e:
             print(f"Redis error getting session: {e}")
             return None
     
     @classmethod
-    def delete_session(cls, session_id: str) -> bool:
+    async def delete_session(cls, session_id: str) -> bool:
         """Delete session from Redis"""
         try:
             client = cls.get_client()
-            client.delete(f"session:{session_id}")
+            await client.delete(f"session:{session_id}")
             return True
         except Exception as e:
             print(f"Redis error deleting session: {e}")
             return False
     
     @classmethod
-    def add_to_blacklist(cls, token: str, expires: int = 86400) -> bool:
+    async def add_to_blacklist(cls, token: str, expires: int = 86400) -> bool:
         """Add JWT token to blacklist (for logout)"""
         try:
             client = cls.get_client()
-            client.setex(f"blacklist:{token}", expires, "1")
+            await client.setex(f"blacklist:{token}", expires, "1")
             return True
         except Exception as e:
             print(f"Redis error adding to blacklist: {e}")
             return False
     
     @classmethod
-    def is_blacklisted(cls, token: str) -> bool:
+    async def is_blacklisted(cls, token: str) -> bool:
         """Check if token is blacklisted"""
         try:
             client = cls.get_client()
-            return client.exists(f"blacklist:{token}") > 0
+            return await client.exists(f"blacklist:{token}") > 0
         except Exception as e:
             print(f"Redis error checking blacklist: {e}")
             return False
     
     @classmethod
-    def test_connection(cls) -> bool:
+    async def publish(cls, channel: str, message: str) -> bool:
+        """Publish a message on a pub/sub channel"""
+        try:
+            client = cls.get_client()
+            await client.publish(channel, message)
+            return True
+        except Exception as e:
+            print(f"Redis error publishing to {channel}: {e}")
+            return False
+    
+    @classmethod
+    async def token_bucket(cls, key: str, rate: float, capacity: int, cost: int = 1) -> Optional[Tuple[bool, float, float]]:
+        """Take `cost` tokens from a shared bucket; returns (allowed, tokens left, retry after) or None on error"""
+        try:
+            client = cls.get_client()
+            script = client.register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, tokens, retry_after = await script(keys=[key], args=[rate, capacity, cost])
+            return bool(allowed), float(tokens), float(retry_after)
+        except Exception as e:
+            print(f"Redis error in rate limiter: {e}")
+            return None
+    
+    @classmethod
+    async def append_history(cls, session_id: str, message: str, max_length: int, expires: int) -> bool:
+        """Append a serialized chat message and keep only the last max_length entries"""
+        try:
+            client = cls.get_client()
+            key = f"chat_history:{session_id}"
+            pipe = client.pipeline(transaction=False)
+            pipe.rpush(key, message)
+            pipe.ltrim(key, -max_length, -1)
+            pipe.expire(key, expires)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis error appending chat history: {e}")
+            return False
+    
+    @classmethod
+    async def get_history(cls, session_id: str) -> List[str]:
+        """Get serialized chat messages for a session (oldest first)"""
+        try:
+            client = cls.get_client()
+            return await client.lrange(f"chat_history:{session_id}", 0, -1)
+        except Exception as e:
+            print(f"Redis error getting chat history: {e}")
+            return []
+    
+    @classmethod
+    async def delete_history(cls, session_id: str) -> bool:
+        """Delete chat history for a session"""
+        try:
+            client = cls.get_client()
+            await client.delete(f"chat_history:{session_id}")
+            return True
+        except Exception as e:
+            print(f"Redis error deleting chat history: {e}")
+            return False
+    
+    @classmethod
+    async def cache_get(cls, key: str) -> Optional[str]:
+        """Get a cached value"""
+        try:
+            client = cls.get_client()
+            return await client.get(f"cache:{key}")
+        except Exception as e:
+            print(f"Redis error getting cache entry: {e}")
+            return None
+    
+    @classmethod
+    async def cache_set(cls, key: str, value: str, expires: int) -> bool:
+        """Store a cached value with an expiry in seconds"""
+        try:
+            client = cls.get_client()
+            await client.setex(f"cache:{key}", expires, value)
+            return True
+        except Exception as e:
+            print(f"Redis error setting cache entry: {e}")
+            return False
+    
+    @classmethod
+    async def test_connection(cls) -> bool:
         """Test Redis connection"""
         try:
             client = cls.get_client()
-            client.ping()
+            await client.ping()
             return True
         except Exception as e:
             print(f"Redis connection failed: {e}")
@@ -1,12 +1,16 @@
 """
 Test database connections - SQLite and Redis
 """
-from app.db.database import engine, init_db, SessionLocal
+import asyncio
+
+from sqlalchemy import select, func
+
+from app.db.database import engine, init_db, close_db, SessionLocal
 from app.db.models import User, XAccount
 from app.db.redis_client import RedisClient
 
 
-def test_sqlite_connection():
+async def check_sqlite_connection():
     """Test SQLite database connection"""
     print("=" * 50)
     print("Testing SQLite Connection...")
@@ -14,20 +18,18 @@ def test_sqlite_connection():
     
     try:
         # Initialize database
-        init_db()
+        await init_db()
         
         # Test connection
-        db = SessionLocal()
-        
-        # Try a simple query
-        users_count = db.query(User).count()
-        x_accounts_count = db.query(XAccount).count()
+        async with SessionLocal() as db:
+            # Try a simple query
+            users_count = await db.scalar(select(func.count()).select_from(User))
+            x_accounts_count = await db.scalar(select(func.count()).select_from(XAccount))
         
         print(f"✓ SQLite connected successfully!")
         print(f"  - Users table: {users_count} records")
         print(f"  - X_Accounts table: {x_accounts_count} records")
         
-        db.close()
         return True
         
     except Exception as e:
@@ -35,24 +37,24 @@ def test_sqlite_connection():
         return False
 
 
-def test_redis_connection():
+async def check_redis_connection():
     """Test Redis connection"""
     print("\n" + "=" * 50)
     print("Testing Redis Connection...")
     print("=" * 50)
     
     try:
-        if RedisClient.test_connection():
+        if await RedisClient.test_connection():
             print("✓ Redis connected successfully!")
             
             # Test set/get
-            RedisClient.set_session("test_session", 999, expires=10)
-            result = RedisClient.get_session("test_session")
+            await RedisClient.set_session("test_session", 999, expires=10)
+            result = await RedisClient.get_session("test_session")
             
             if result == 999:
                 print("✓ Redis read/write test passed!")
             
-            RedisClient.delete_session("test_session")
+            await RedisClient.delete_session("test_session")
             return True
         else:
             print("✗ Redis connection failed")
@@ -66,14 +68,20 @@ def test_redis_connection():
         return False
 
 
+async def run_all_tests_async():
+    sqlite_ok = await check_sqlite_connection()
+    redis_ok = await check_redis_connection()
+    await close_db()
+    return sqlite_ok, redis_ok
+
+
 def run_all_tests():
     """Run all database connection tests"""
     print("\n" + "=" * 60)
     print("   DATABASE CONNECTION TESTS")
     print("=" * 60)
     
-    sqlite_ok = test_sqlite_connection()
-    redis_ok = test_redis_connection()
+    sqlite_ok, redis_ok = asyncio.run(run_all_tests_async())
     
     print("\n" + "=" * 50)
     print("TEST RESULTS:")
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
@@ -9,24 +9,63 @@ import json
 from datetime import datetime
 from typing import List
 import asyncio
+import math
+import time
+import uuid
 from pathlib import Path
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.trace import SpanKind
 
 from app.services.ai_service import AIService
 from app.services.webhook_service import WebhookService
 from app.core.config import settings
-from app.db.database import init_db
+from app.core import metrics
+from app.core.metrics import CHAT_TURN_SECONDS, CHAT_TURNS
+from app.core import tracing
+from app.core.tracing import TracingMiddleware, child_span, tracer
+from app.db.database import init_db, close_db, ReadSessionLocal
+from app.db.redis_client import RedisClient
+from app.auth.cache import auth_cache
+from app.auth.security import CurrentUser, shutdown_password_executor
+from app.auth.middleware import get_current_user, get_user_from_token, client_ip, rate_limit
+from app.core.rate_limit import rate_limiter
 from app.auth.routes import router as auth_router
+from app.conversations.routes import router as conversations_router
+from app.conversations.search import init_search_index, is_support_staff
+from app.conversations.writer import ChatLogWriter
+from app.realtime.connections import manager, owned_session
+from app.realtime.routes import router as realtime_router
 
 app = FastAPI(title="كنق الاتمته - Chatbot API", version="1.0.0")
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    init_db()
+    await init_db()
+    await init_search_index()
     print("Database initialized")
+    webhook_service.start()
+    chat_log.start()
+    auth_cache.start()
+    manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # تفريغ طابور n8n قبل الإغلاق
+    await webhook_service.close()
+    await chat_log.close()
+    await auth_cache.stop()
+    await manager.stop()
+    await RedisClient.close()
+    await close_db()
+    shutdown_password_executor()
+    tracing.shutdown_tracing()
 
 # Include auth routes
 app.include_router(auth_router)
+app.include_router(conversations_router)
+app.include_router(realtime_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,6 +74,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# آخر middleware يُضاف هو الأول في التنفيذ: الـ span يغطي الطلب كاملاً
+app.add_middleware(TracingMiddleware)
 
 static_path = Path(__file__).parent.parent / "static"
 static_path.mkdir(exist_ok=True)
@@ -42,22 +83,7 @@ app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
 
 ai_service = AIService()
 webhook_service = WebhookService()
-
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def send_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_json(message)
-
-manager = ConnectionManager()
+chat_log = ChatLogWriter()
 
 # Models for API requests
 class MessageRequest(BaseModel):
@@ -73,25 +99,235 @@ async def get_chat_interface():
         return FileResponse(html_file)
     return HTMLResponse(content="<h1>Chat interface not found</h1>", status_code=404)
 
+async def stream_assistant_reply(user_message: str, session_id: Optional[str], websocket: WebSocket,
+                                 user_key: Optional[str] = None, on_queue_position=None):
+    """
+    إرسال رد المساعد كأجزاء متتالية (assistant_delta) ثم إطار assistant_done
+
+    يتم إخفاء مؤشر الكتابة عند وصول أول جزء، ويحتوي إطار assistant_done
+    على الرد الكامل حتى يتمكن العميل من استبدال النص المجمّع بالنسخة النهائية.
+    """
+    parts = []
+    started = time.perf_counter()
+    with child_span("ai.stream_response") as span:
+        async for delta in ai_service.stream_response(user_message, session_id=session_id,
+                                                      user_key=user_key, on_queue_position=on_queue_position):
+            if not parts:
+                CHAT_TURN_SECONDS.labels("llm_first_token").observe(time.perf_counter() - started)
+                span.add_event("first_token")
+                await manager.send_message({
+                    "type": "typing",
+                    "status": False
+                }, websocket)
+            parts.append(delta)
+            await manager.send_message({
+                "type": "assistant_delta",
+                "delta": delta
+            }, websocket)
+
+    CHAT_TURN_SECONDS.labels("llm_total").observe(time.perf_counter() - started)
+    if not parts:
+        await manager.send_message({
+            "type": "typing",
+            "status": False
+        }, websocket)
+
+    reply = "".join(parts)
+    await manager.send_message({
+        "type": "assistant_done",
+        "message": reply,
+        "timestamp": datetime.now().isoformat()
+    }, websocket)
+    return reply
+
+def record_turn_completed(received_at: float):
+    """تسجيل زمن الدورة الكامل (من استلام الرسالة حتى آخر إطار للرد) في /metrics"""
+    CHAT_TURN_SECONDS.labels("total").observe(time.perf_counter() - received_at)
+    CHAT_TURNS.labels("completed").inc()
+
+async def run_chat_turn(user_message: str, session_id: str, session_key: str, websocket: WebSocket, user,
+                        received_at: Optional[float] = None):
+    """
+    توليد رد المساعد لرسالة واحدة؛ يعمل كمهمة مستقلة قابلة للإلغاء
+
+    عند الإلغاء (قطع الاتصال، إطار cancel، أو رسالة أحدث في نفس الجلسة)
+    يتوقف الطلب لدى مزود الذكاء الاصطناعي ولا يُحفظ رد ناقص.
+    session_id: معرف الجلسة كما أرسله العميل (يُعاد له ويُحفظ في سجل المحادثات)
+    session_key: نفس الجلسة مقيدة بصاحبها، لسياق المحادثة في AIService
+    received_at: وقت استلام الرسالة (perf_counter) لقياس زمن الدورة الكامل
+    """
+    if received_at is None:
+        received_at = time.perf_counter()
+    # الطابور العادل يتناوب بين المستخدمين، أو بين عناوين IP للزوار
+    user_key = f"user:{user.id}" if user is not None else f"ip:{client_ip(websocket)}"
+
+    async def send_queue_position(position: int):
+        await manager.send_message({
+            "type": "queue_position",
+            "session_id": session_id,
+            "position": position,
+            "timestamp": datetime.now().isoformat()
+        }, websocket)
+
+    try:
+        if settings.OPENAI_STREAMING:
+            ai_response = await stream_assistant_reply(user_message, session_key, websocket,
+                                                       user_key, send_queue_position)
+            if user is not None:
+                chat_log.record(user.id, session_id, "assistant", ai_response)
+            record_turn_completed(received_at)
+            return
+
+        started = time.perf_counter()
+        ai_response = await ai_service.get_response(user_message, session_id=session_key,
+                                                    user_key=user_key, on_queue_position=send_queue_position)
+        # بدون تدفق يصل الرد كاملاً دفعة واحدة: أول جزء هو الرد نفسه
+        elapsed = time.perf_counter() - started
+        CHAT_TURN_SECONDS.labels("llm_first_token").observe(elapsed)
+        CHAT_TURN_SECONDS.labels("llm_total").observe(elapsed)
+        if user is not None:
+            chat_log.record(user.id, session_id, "assistant", ai_response)
+
+        await manager.send_message({
+            "type": "typing",
+            "status": False
+        }, websocket)
+
+        await manager.send_message({
+            "type": "assistant_message",
+            "message": ai_response,
+            "timestamp": datetime.now().isoformat()
+        }, websocket)
+        record_turn_completed(received_at)
+    except asyncio.CancelledError:
+        CHAT_TURNS.labels("cancelled").inc()
+        trace.get_current_span().set_attribute("chat.cancelled", True)
+        raise
+    except WebSocketDisconnect:
+        CHAT_TURNS.labels("cancelled").inc()
+        trace.get_current_span().set_attribute("chat.cancelled", True)
+    except Exception as e:
+        CHAT_TURNS.labels("error").inc()
+        span = trace.get_current_span()
+        span.record_exception(e)
+        span.set_status(trace.Status(trace.StatusCode.ERROR))
+        try:
+            await manager.send_message({
+                "type": "typing",
+                "status": False
+            }, websocket)
+            await manager.send_message({
+                "type": "error",
+                "message": f"حدث خطأ: {str(e)}",
+                "timestamp": datetime.now().isoformat()
+            }, websocket)
+        except Exception:
+            # الاتصال مغلق بالفعل
+            pass
+
+async def cancel_turn(turns: Dict[str, asyncio.Task], session_id: str, websocket: WebSocket, notify: bool = True):
+    """إلغاء الرد الجاري لجلسة وانتظار توقفه، ثم إبلاغ العميل بإطار assistant_cancelled"""
+    task = turns.pop(session_id, None)
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    if notify:
+        await manager.send_message({
+            "type": "assistant_cancelled",
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat()
+        }, websocket)
+
+async def reject_websocket(websocket: WebSocket, code: int, reason: str):
+    """رفض الاتصال برمز إغلاق يصل للعميل: الإغلاق قبل accept يتحول إلى HTTP 403 ويضيع الرمز"""
+    await websocket.accept()
+    await websocket.close(code=code, reason=reason)
+
 @app.websocket("/ws/chat")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = None):
+    # المصادقة اختيارية عبر ?token=؛ يتم حفظ المحادثة فقط للمستخدم المسجل
+    user = None
+    if token:
+        async with ReadSessionLocal() as db:
+            user = await get_user_from_token(token, db)
+        if user is None:
+            await reject_websocket(websocket, 1008, "invalid or expired token")
+            return
+    
+    # حد الاتصالات الجديدة لكل IP: الإغلاق بالرمز 1013 (Try Again Later)
+    connect_limit = await rate_limiter.hit("ws_connect", f"ip:{client_ip(websocket)}")
+    if not connect_limit.allowed:
+        await reject_websocket(websocket, 1013, f"too many connections, retry after {math.ceil(connect_limit.retry_after)}s")
+        return
+    
+    # رسائل الشات تُحد لكل مستخدم مسجل، أو لكل IP للزوار
+    if user is not None:
+        chat_scope, chat_identity = "chat_user", f"user:{user.id}"
+    else:
+        chat_scope, chat_identity = "chat_anon", f"ip:{client_ip(websocket)}"
+    violations = 0
+    
+    await manager.connect(websocket, user.id if user is not None else None)
+    # كل اتصال يحصل على جلسة خاصة به ما لم يرسل العميل session_id
+    connection_session_id = uuid.uuid4().hex
+    # session_id يختاره العميل، فيُقيد بصاحبه قبل التوجيه وسياق المحادثة: لا يمكن لاتصال آخر
+    # انتحال جلسة مستخدم واستقبال ردود n8n أو سياق محادثته. جلسات الزوار تخص الاتصال نفسه
+    session_owner = f"user:{user.id}" if user is not None else f"conn:{connection_session_id}"
+    # الردود الجارية لكل جلسة؛ حلقة القراءة تستمر في الاستقبال أثناء التوليد
+    turns: Dict[str, asyncio.Task] = {}
     try:
         while True:
             data = await websocket.receive_text()
+            received_at = time.perf_counter()
             message_data = json.loads(data)
             
+            session_id = message_data.get("session_id") or connection_session_id
+            session_key = owned_session(session_owner, session_id)
+            manager.bind_session(websocket, session_key)
+            
+            if message_data.get("type") == "cancel":
+                await cancel_turn(turns, session_id, websocket)
+                continue
+            
+            limit = await rate_limiter.hit(chat_scope, chat_identity)
+            if not limit.allowed:
+                violations += 1
+                if violations >= settings.RATE_LIMIT_WS_MAX_VIOLATIONS:
+                    await websocket.close(code=1008)
+                    break
+                await manager.send_message({
+                    "type": "rate_limited",
+                    "message": "لقد أرسلت رسائل كثيرة خلال وقت قصير، يرجى الانتظار قليلاً",
+                    "retry_after": round(limit.retry_after, 1),
+                    "timestamp": datetime.now().isoformat()
+                }, websocket)
+                continue
+            violations = 0
+            
             user_message = message_data.get("message", "")
-            session_id = message_data.get("session_id", None)
             user_id = message_data.get("user_id", None)
             
-            # إرسال رسالة المستخدم إلى n8n webhook
-            await webhook_service.send_message_to_n8n(
-                user_message=user_message,
-                session_id=session_id,
-                user_id=user_id,
-                metadata={"source": "websocket"}
-            )
+            # رسالة جديدة في نفس الجلسة تلغي الرد السابق الذي لم يكتمل
+            await cancel_turn(turns, session_id, websocket)
+            
+            # كل رسالة trace مستقل (وليس span تحت الاتصال الطويل)؛ الـ span يبقى مفتوحاً حتى انتهاء مهمة الرد
+            turn_span = tracer.start_span("chat.turn", context=Context(), kind=SpanKind.SERVER, attributes={
+                "chat.session_id": session_id,
+                "enduser.id": str(user.id) if user is not None else "",
+            })
+            
+            # إضافة رسالة المستخدم إلى طابور n8n (بدون انتظار الـ webhook)
+            with trace.use_span(turn_span), CHAT_TURN_SECONDS.labels("n8n").time():
+                webhook_service.enqueue_message_to_n8n(
+                    user_message=user_message,
+                    session_id=session_key,
+                    user_id=user_id,
+                    metadata={"source": "websocket"}
+                )
             
             await manager.send_message({
                 "type": "user_message",
@@ -104,34 +340,26 @@ async def websocket_endpoint(websocket: WebSocket):
                 "status": True
             }, websocket)
             
-            try:
-                ai_response = await ai_service.get_response(user_message)
-                
-                await manager.send_message({
-                    "type": "typing",
-                    "status": False
-                }, websocket)
-                
-                await manager.send_message({
-                    "type": "assistant_message",
-                    "message": ai_response,
-                    "timestamp": datetime.now().isoformat()
-                }, websocket)
-            except Exception as e:
-                await manager.send_message({
-                    "type": "typing",
-                    "status": False
-                }, websocket)
-                await manager.send_message({
-                    "type": "error",
-                    "message": f"حدث خطأ: {str(e)}",
-                    "timestamp": datetime.now().isoformat()
-                }, websocket)
+            if user is not None:
+                chat_log.record(user.id, session_id, "user", user_message)
+            
+            with trace.use_span(turn_span):
+                turn = asyncio.create_task(run_chat_turn(user_message, session_id, session_key, websocket, user, received_at))
+            turn.add_done_callback(lambda task, span=turn_span: span.end())
+            turns[session_id] = turn
+            turn.add_done_callback(
+                lambda task, sid=session_id: turns.pop(sid, None) if turns.get(sid) is task else None
+            )
     
     except WebSocketDisconnect:
+        pass
+    finally:
+        # المستخدم أغلق الصفحة: إيقاف كل الردود الجارية لهذا الاتصال
+        for session_id in list(turns):
+            await cancel_turn(turns, session_id, websocket, notify=False)
         manager.disconnect(websocket)
 
-@app.post("/api/send-message")
+@app.post("/api/send-message", dependencies=[Depends(rate_limit("send_message"))])
 async def send_message_to_n8n(request: MessageRequest):
     """
     Endpoint POST لإرسال رسالة إلى n8n webhook
@@ -170,6 +398,51 @@ async def send_message_to_n8n(request: MessageRequest):
             detail=f"حدث خطأ أثناء إرسال الرسالة: {str(e)}"
         )
 
+@app.get("/api/webhook/stats")
+async def webhook_stats():
+    """إحصائيات إرسال n8n وحالة قاطع الدائرة"""
+    return webhook_service.get_stats()
+
+@app.get("/api/ai/cache/stats")
+async def response_cache_stats():
+    """إحصائيات ذاكرة الردود المخزنة (hits/misses)"""
+    semantic_cache = ai_service.semantic_cache
+    return {
+        "exact": ai_service.response_cache.get_stats(),
+        "semantic": semantic_cache.get_stats() if semantic_cache is not None else {"enabled": False},
+    }
+
+@app.get("/api/ratelimit/stats")
+async def rate_limit_stats():
+    """عدد الطلبات المقبولة والمرفوضة بسبب حدود المعدل"""
+    return rate_limiter.get_stats()
+
+@app.get("/api/ai/providers/stats")
+async def llm_provider_stats():
+    """حالة مزودي النماذج اللغوية (الطلبات الجارية، الفشل، فترات التهدئة، الطلبات المدموجة)"""
+    if ai_service.router is None:
+        return {"providers": {}}
+    return {
+        **ai_service.router.get_stats(),
+        "coalescing": ai_service.inflight.get_stats(),
+        "admission": ai_service.admission.get_stats(),
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """مقاييس Prometheus (زمن الدورات، التوكنات، n8n، Redis، قاعدة البيانات، bcrypt، الاتصالات)"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/tracing/spans")
+async def tracing_spans(trace_id: Optional[str] = None, limit: int = 100, current_user: CurrentUser = Depends(get_current_user)):
+    """آخر الـ spans المحفوظة في الذاكرة (TRACING_EXPORTER=memory)، أو spans لـ trace_id معين - لفريق الدعم فقط"""
+    if not is_support_staff(current_user):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    spans = tracing.recent_spans(trace_id, max(1, min(limit, 1000)))
+    if spans is None:
+        raise HTTPException(status_code=404, detail="In-memory tracing is not enabled")
+    return {"spans": spans}
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
@@ -0,0 +1,212 @@
+from typing import Dict, Optional, Set
+from datetime import datetime
+import asyncio
+import json
+import uuid
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+from app.core.metrics import WEBSOCKET_CONNECTIONS
+from app.db.redis_client import RedisClient
+
+
+def owned_session(owner: str, session_id: str) -> str:
+    """
+    Routing key for a chat session named by the client.
+
+    Clients choose their own session ids, so the id is scoped to its owner
+    (the user, or the connection for anonymous clients). Otherwise any
+    connection could bind another user's session id and receive its n8n
+    callbacks and conversation context.
+    """
+    return f"{owner}:{session_id}"
+
+
+class ConnectionManager:
+    """
+    Registry of the WebSocket connections open on this worker.
+
+    Connections are indexed by user id and by chat session id, so targeted
+    delivery is a dict lookup and connect/disconnect touch only the sets a
+    socket belongs to (no list scans).
+
+    send_to_user / send_to_session / broadcast reach sockets on every
+    worker: with REALTIME_REDIS_ENABLED the event is published on
+    REALTIME_CHANNEL and each worker's listener delivers it to its own
+    matching sockets. Without Redis, or if publishing fails, delivery is
+    local to this worker.
+    """
+
+    def __init__(self):
+        self.enabled = settings.REALTIME_REDIS_ENABLED
+        self.channel = settings.REALTIME_CHANNEL
+        self.worker_id = uuid.uuid4().hex[:12]
+
+        self.active_connections: Dict[WebSocket, Optional[int]] = {}
+        self._sessions: Dict[WebSocket, Set[str]] = {}
+        self._by_user: Dict[int, Set[WebSocket]] = {}
+        self._by_session: Dict[str, Set[WebSocket]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+        self.delivered = 0
+        self.published = 0
+        self.send_errors = 0
+
+    async def connect(self, websocket: WebSocket, user_id: Optional[int] = None):
+        await websocket.accept()
+        self.active_connections[websocket] = user_id
+        self._sessions[websocket] = set()
+        WEBSOCKET_CONNECTIONS.inc()
+        if user_id is not None:
+            self._by_user.setdefault(user_id, set()).add(websocket)
+
+    def bind_session(self, websocket: WebSocket, session_id: str):
+        """Route events for `session_id` to this socket (called per incoming message)"""
+        sessions = self._sessions.get(websocket)
+        if sessions is None or session_id in sessions:
+            return
+        sessions.add(session_id)
+        self._by_session.setdefault(session_id, set()).add(websocket)
+
+    @staticmethod
+    def _discard(index: Dict, key, websocket: WebSocket):
+        sockets = index.get(key)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del index[key]
+
+    def disconnect(self, websocket: WebSocket):
+        if websocket not in self.active_connections:
+            return
+        WEBSOCKET_CONNECTIONS.dec()
+        user_id = self.active_connections.pop(websocket)
+        if user_id is not None:
+            self._discard(self._by_user, user_id, websocket)
+        for session_id in self._sessions.pop(websocket, ()):
+            self._discard(self._by_session, session_id, websocket)
+
+    async def send_message(self, message: dict, websocket: WebSocket):
+        await websocket.send_json(message)
+
+    def _targets(self, target: str, key) -> Set[WebSocket]:
+        if target == "user":
+            return set(self._by_user.get(key, ()))
+        if target == "session":
+            return set(self._by_session.get(key, ()))
+        return set(self.active_connections)
+
+    async def deliver_local(self, target: str, key, message: dict) -> int:
+        """Send to the matching sockets on this worker; returns how many received it"""
+        sockets = self._targets(target, key)
+        if not sockets:
+            return 0
+        results = await asyncio.gather(
+            *(socket.send_json(message) for socket in sockets),
+            return_exceptions=True
+        )
+        sent = 0
+        for result in results:
+            if isinstance(result, Exception):
+                # the reader loop of a closed socket unregisters it
+                self.send_errors += 1
+            else:
+                sent += 1
+        self.delivered += sent
+        return sent
+
+    async def _route(self, target: str, key, message: dict) -> bool:
+        """
+        Publish for all workers, or deliver locally when Redis is off.
+
+        Returns True when the event was handed to Redis; the local copy then
+        arrives through this worker's own subscription.
+        """
+        if self.enabled:
+            envelope = json.dumps(
+                {"target": target, "key": key, "message": message},
+                ensure_ascii=False
+            )
+            if await RedisClient.publish(self.channel, envelope):
+                self.published += 1
+                return True
+        await self.deliver_local(target, key, message)
+        return False
+
+    async def send_to_user(self, user_id: int, message: dict) -> bool:
+        return await self._route("user", user_id, message)
+
+    async def send_to_session(self, session_id: str, message: dict) -> bool:
+        return await self._route("session", session_id, message)
+
+    async def broadcast(self, message: dict) -> bool:
+        return await self._route("all", None, message)
+
+    async def _listen(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = RedisClient.get_client().pubsub()
+                await pubsub.subscribe(self.channel)
+                async for event in pubsub.listen():
+                    if event.get("type") != "message":
+                        continue
+                    try:
+                        envelope = json.loads(event["data"])
+                        await self.deliver_local(envelope["target"], envelope.get("key"), envelope["message"])
+                    except (ValueError, KeyError, TypeError) as e:
+                        print(f"Invalid realtime event: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Redis error in realtime listener: {e}")
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    def start(self):
+        """Start the cross-worker listener (called on app startup)"""
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "redis_enabled": self.enabled,
+            "connections": len(self.active_connections),
+            "users": len(self._by_user),
+            "sessions": len(self._by_session),
+            "delivered": self.delivered,
+            "published": self.published,
+            "send_errors": self.send_errors,
+        }
+
+
+def notification(message: str, source: str, data: Optional[dict] = None) -> dict:
+    """WebSocket frame for a server-initiated message"""
+    frame = {
+        "type": "notification",
+        "source": source,
+        "message": message,
+        "timestamp": datetime.now().isoformat()
+    }
+    if data:
+        frame["data"] = data
+    return frame
+
+
+manager = ConnectionManager()
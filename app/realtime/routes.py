@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+import hmac
+
+from app.core.config import settings
+from app.auth.middleware import get_current_user
+from app.auth.security import CurrentUser
+from app.conversations.search import is_support_staff
+from app.realtime.connections import manager, notification
+
+router = APIRouter(tags=["Realtime"])
+
+
+class CallbackRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+    user_id: Optional[int] = None
+    data: Optional[Dict[str, Any]] = None
+
+
+class BroadcastRequest(BaseModel):
+    message: str
+    data: Optional[Dict[str, Any]] = None
+
+
+class DeliveryResponse(BaseModel):
+    status: str
+    via: str
+
+
+def delivery(published: bool) -> DeliveryResponse:
+    return DeliveryResponse(status="sent", via="redis" if published else "local")
+
+
+@router.post("/api/n8n/callback", response_model=DeliveryResponse)
+async def n8n_callback(
+    request: CallbackRequest,
+    x_n8n_secret: Optional[str] = Header(None)
+):
+    """
+    رسالة من n8n إلى المستخدم - pushed to the user's sockets on any worker
+
+    Targets a chat session (`session_id`) or every connection of a user
+    (`user_id`). Requests must carry the shared secret in `X-N8N-Secret`.
+    """
+
+    if not settings.N8N_CALLBACK_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="N8N callback is not configured"
+        )
+    if x_n8n_secret is None or not hmac.compare_digest(x_n8n_secret, settings.N8N_CALLBACK_SECRET):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid callback secret"
+        )
+
+    frame = notification(request.message, "n8n", request.data)
+    if request.session_id is not None:
+        return delivery(await manager.send_to_session(request.session_id, frame))
+    if request.user_id is not None:
+        return delivery(await manager.send_to_user(request.user_id, frame))
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="session_id or user_id is required"
+    )
+
+
+@router.post("/api/admin/broadcast", response_model=DeliveryResponse)
+async def broadcast(
+    request: BroadcastRequest,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """إرسال إشعار لجميع المتصلين - support staff only"""
+
+    if not is_support_staff(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return delivery(await manager.broadcast(notification(request.message, "broadcast", request.data)))
+
+
+@router.get("/api/realtime/stats")
+async def realtime_stats():
+    """اتصالات WebSocket على هذه العملية وإحصائيات التوصيل"""
+    return manager.get_stats()
@@ -0,0 +1,257 @@
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+# المواقع القريبة من الدور تُبلغ عند كل تغير، والأبعد عند تغير نسبي ملحوظ فقط
+EXACT_POSITIONS = 10
+POSITION_CHANGE_RATIO = 0.1
+
+
+class AdmissionRejected(Exception):
+    """الطلب رُفض لأن الطابور ممتلئ أو انتهت مهلة الانتظار (load shedding)"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, key: str):
+        self.key = key
+        self.position = 0
+        self.notified = 0
+        self.admitted = False
+        self.event = asyncio.Event()
+
+    def update_position(self, position: int):
+        """تسجيل الموقع الجديد، وإيقاظ المنتظر فقط إذا كان التغير يستحق الإبلاغ"""
+        self.position = position
+        if position == self.notified:
+            return
+        if (self.notified == 0 or position <= EXACT_POSITIONS
+                or abs(position - self.notified) >= self.notified * POSITION_CHANGE_RATIO):
+            self.notified = position
+            self.event.set()
+
+
+class AdmissionController:
+    """
+    تحديد عدد ردود الذكاء الاصطناعي التي تعمل في نفس الوقت
+
+    - max_concurrent: عدد الطلبات المسموح بها لدى المزود في نفس الوقت
+    - الطلبات الزائدة تنتظر في طابور عادل: دور لكل مستخدم بالتناوب
+      (round-robin)، فلا يحجز مستخدم واحد يرسل رسائل كثيرة كل الأماكن
+    - كل طلب منتظر يُبلَّغ بموقعه عند تغيره (on_position)؛ فشل الإبلاغ
+      (مثل اتصال أُغلق) يوقف الإبلاغ فقط ولا يلغي الانتظار
+    - المواقع تُحسب مرة واحدة لكل دفعة تغييرات، بفاصل position_interval على
+      الأقل، بدلاً من حسابها لكل الطابور عند كل إضافة أو قبول
+    - الطلب الذي ينتظر أكثر من queue_timeout، أو يصل والطابور ممتلئ
+      (max_queue)، يُرفض بـ AdmissionRejected بدلاً من تراكم الطلبات
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = settings.ADMISSION_MAX_CONCURRENT,
+        max_queue: int = settings.ADMISSION_MAX_QUEUE,
+        queue_timeout: float = settings.ADMISSION_QUEUE_TIMEOUT,
+        position_interval: float = settings.ADMISSION_POSITION_INTERVAL
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.position_interval = position_interval
+        self._reposition_handle: Optional[asyncio.TimerHandle] = None
+        self._last_reposition = float("-inf")
+
+        self.in_flight = 0
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+
+        self.admitted_count = 0
+        self.queued_count = 0
+        self.waited_count = 0
+        self.shed_count = 0
+        self.total_wait = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def _schedule_reposition(self):
+        """جدولة حساب المواقع؛ كل التغييرات حتى موعده تُحسب في مرور واحد"""
+        if self._reposition_handle is not None or not self._queues:
+            return
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, self._last_reposition + self.position_interval - loop.time())
+        self._reposition_handle = loop.call_later(delay, self._reposition)
+
+    def _reposition(self):
+        """حساب ترتيب الخدمة بالتناوب، وإيقاظ من تغير موقعه تغيراً يستحق الإبلاغ"""
+        self._reposition_handle = None
+        self._last_reposition = asyncio.get_running_loop().time()
+        queues = list(self._queues.values())
+        position = 1
+        depth = 0
+        while queues:
+            remaining = []
+            for queue in queues:
+                queue[depth].update_position(position)
+                position += 1
+                if len(queue) > depth + 1:
+                    remaining.append(queue)
+            queues = remaining
+            depth += 1
+
+    def _dispatch(self):
+        while self.in_flight < self.max_concurrent and self._queues:
+            key, queue = self._queues.popitem(last=False)
+            waiter = queue.popleft()
+            if queue:
+                # المستخدم ينتقل لنهاية الدور
+                self._queues[key] = queue
+            self._queued -= 1
+            self.in_flight += 1
+            waiter.admitted = True
+            waiter.event.set()
+        self._schedule_reposition()
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.key)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        self._queued -= 1
+        if not queue:
+            del self._queues[waiter.key]
+        self._schedule_reposition()
+
+    async def acquire(self, key: str, on_position: Optional[PositionCallback] = None):
+        """
+        انتظار مكان للطلب؛ يجب استدعاء release() بعد انتهائه
+
+        key: هوية صاحب الطلب للتناوب العادل (المستخدم أو الجلسة)
+        """
+        if not self.enabled:
+            return
+        if self.in_flight < self.max_concurrent and not self._queues:
+            self.in_flight += 1
+            self.admitted_count += 1
+            return
+        if self._queued >= self.max_queue:
+            self.shed_count += 1
+            raise AdmissionRejected("queue full", self.queue_timeout)
+
+        waiter = _Waiter(key)
+        self._queues.setdefault(key, deque()).append(waiter)
+        self._queued += 1
+        self.queued_count += 1
+        self._schedule_reposition()
+
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        reported = 0
+        try:
+            while True:
+                waiter.event.clear()
+                if waiter.admitted:
+                    break
+                if on_position is not None and waiter.notified != reported:
+                    reported = waiter.notified
+                    try:
+                        await on_position(reported)
+                    except Exception:
+                        # الطلب قد يخدم آخرين (طلبات مدموجة): لا يُلغى بسبب إشعار واحد
+                        logger.warning("Queue position callback failed, no further updates for this waiter",
+                                       exc_info=True)
+                        on_position = None
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(waiter)
+                    self.shed_count += 1
+                    raise AdmissionRejected("queue timeout", self.queue_timeout)
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if waiter.admitted:
+                # قُبل الطلب في نفس لحظة الإلغاء: إعادة المكان
+                self.release()
+            else:
+                self._remove(waiter)
+            raise
+
+        self.admitted_count += 1
+        self.waited_count += 1
+        self.total_wait += time.monotonic() - started
+
+    def release(self):
+        if not self.enabled:
+            return
+        self.in_flight -= 1
+        self._dispatch()
+
+    def get_stats(self) -> Dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "queued": self._queued,
+            "queued_users": len(self._queues),
+            "admitted": self.admitted_count,
+            "waited": self.queued_count,
+            "shed": self.shed_count,
+            "avg_wait": round(self.total_wait / self.waited_count, 3) if self.waited_count else 0.0,
+        }
+
+
+class PositionFanout:
+    """
+    موقع طلب مشترك في الطابور، يُرسل لكل من ينتظر نفس الرد (طلبات مدموجة)
+
+    الطلب المشترك يحجز مكاناً واحداً بهذا الكائن كـ on_position، بدلاً من
+    callback أول مشترك: إغلاق اتصاله لا يُفشل الانتظار على الباقين، ومن
+    ينضم أثناء الانتظار يحصل على الموقع الحالي فوراً.
+    """
+
+    def __init__(self):
+        self.listeners: List[PositionCallback] = []
+        self.position: Optional[int] = None
+
+    async def _send(self, callback: PositionCallback, position: int):
+        try:
+            await callback(position)
+        except Exception:
+            logger.warning("Queue position update failed for one subscriber", exc_info=True)
+
+    async def __call__(self, position: int):
+        self.position = position
+        for callback in list(self.listeners):
+            await self._send(callback, position)
+
+    async def add(self, callback: PositionCallback):
+        self.listeners.append(callback)
+        if self.position is not None:
+            await self._send(callback, self.position)
+
+    def remove(self, callback: PositionCallback):
+        self.listeners.remove(callback)
+
+    async def admit(self, admission: "AdmissionController", key: str):
+        """انتظار مكان للطلب المشترك؛ بعد القبول لا يوجد موقع يُرسل للمنضمين"""
+        try:
+            await admission.acquire(key, self)
+        finally:
+            self.position = None
@@ -1,51 +1,297 @@
 from openai import AsyncOpenAI
 from app.core.config import settings
+from app.core.tracing import traced
+from app.services.conversation_store import ConversationStore
+from app.services.context_builder import ContextBuilder
+from app.services.response_cache import ResponseCache, request_scope
+from app.services.semantic_cache import SemanticCache
+from app.services.embeddings import get_embedder
+from app.services.llm_router import build_router, LLMUnavailable
+from app.services.llm_providers import Completion, CompletionStream
+from app.services.single_flight import SingleFlight
+from app.services.admission import AdmissionController, AdmissionRejected, PositionCallback, PositionFanout
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
 import asyncio
+import logging
+
+import numpy as np
+
+SYSTEM_PROMPT = "أنت مساعد ذكي متخصص في إدارة وسائل التواصل الاجتماعي والأتمتة. تتحدث العربية بطلاقة وتساعد المستخدمين في مهامهم."
+NO_API_KEY_MESSAGE = "مرحباً! أنا مساعد AI. لتفعيل الذكاء الاصطناعي، يرجى إضافة OPENAI_API_KEY في ملف .env"
+BUSY_MESSAGE = "عذراً، خدمة الذكاء الاصطناعي مشغولة حالياً بسبب كثرة الطلبات. يرجى المحاولة بعد قليل."
+
+logger = logging.getLogger(__name__)
+
 
 class AIService:
     def __init__(self):
         self.client = None
         if settings.OPENAI_API_KEY:
-            self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        self.conversation_history = []
-    
-    async def get_response(self, user_message: str) -> str:
-        if not self.client:
-            return "مرحباً! أنا مساعد AI. لتفعيل الذكاء الاصطناعي، يرجى إضافة OPENAI_API_KEY في ملف .env"
-        
+            # إعادة المحاولة والانتقال للنموذج الاحتياطي يتولاها LLMRouter
+            self.client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                max_retries=0
+            )
+        self.router = build_router(self.client)
+        self.inflight = SingleFlight()
+        self.admission = AdmissionController()
+        self._position_fanouts: Dict[str, PositionFanout] = {}
+        self.conversations = ConversationStore()
+        self.context_builder = ContextBuilder(SYSTEM_PROMPT)
+        self.response_cache = ResponseCache()
+        self.semantic_cache = None
+        if settings.SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = SemanticCache(get_embedder(self.client))
+        caching = self.response_cache.enabled or self.semantic_cache is not None
+        if caching and settings.OPENAI_TEMPERATURE > settings.RESPONSE_CACHE_MAX_TEMPERATURE:
+            # كل الطلبات ستتجاوز الذاكرة؛ تنبيه بدلاً من hit rate صفري دون سبب ظاهر
+            logger.warning(
+                f"Response caching is enabled but OPENAI_TEMPERATURE={settings.OPENAI_TEMPERATURE} is above "
+                f"RESPONSE_CACHE_MAX_TEMPERATURE={settings.RESPONSE_CACHE_MAX_TEMPERATURE}, so no reply will be cached"
+            )
+
+    async def _build_messages(self, user_message: str, session_id: Optional[str]) -> list:
+        await self.conversations.append(session_id, "user", user_message)
+        return self.context_builder.build(await self.conversations.get_history(session_id))
+
+    async def _cache_scope(self, session_id: Optional[str]) -> Optional[str]:
+        """نطاق التخزين، أو None إذا كان التخزين معطلاً أو الطلب غير مؤهل (سجل سابق أو حرارة مرتفعة)"""
+        if not self.response_cache.enabled and self.semantic_cache is None:
+            return None
+        return self.response_cache.scope(
+            context=[{"role": "system", "content": self.context_builder.system_prompt}],
+            history=await self.conversations.get_history(session_id),
+            # نفس النموذج في مفتاح الدمج وفي فحص الردود القابلة للتخزين
+            model=self.router.primary.model,
+            temperature=settings.OPENAI_TEMPERATURE,
+            max_tokens=settings.OPENAI_MAX_TOKENS
+        )
+
+    async def _cached_reply(self, scope: Optional[str], user_message: str, session_id: Optional[str]) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        البحث عن رد مخزن: تطابق تام أولاً ثم أقرب سؤال دلالياً
+
+        يُرجع (الرد أو None، متجه السؤال لإعادة استخدامه عند التخزين).
+        عند وجود رد يُسجل الدور في سجل المحادثة كأنه رد جديد.
+        """
+        if scope is None:
+            return None, None
+
+        cached = None
+        vector = None
+        if self.response_cache.enabled:
+            cached = await self.response_cache.get(self.response_cache.make_key(user_message, scope))
+        if cached is None and self.semantic_cache is not None:
+            vector = await self.semantic_cache.embed(user_message)
+            cached = self.semantic_cache.lookup(vector, scope)
+
+        if cached is not None:
+            await self.conversations.append(session_id, "user", user_message)
+            await self.conversations.append(session_id, "assistant", cached)
+        return cached, vector
+
+    async def _store_reply(self, scope: Optional[str], user_message: str, vector: Optional[np.ndarray], reply: str):
+        if scope is None:
+            return
+        if self.response_cache.enabled:
+            await self.response_cache.set(self.response_cache.make_key(user_message, scope), reply)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(vector, scope, reply)
+
+    async def _coalesce_key(self, user_message: str, session_id: Optional[str]) -> Optional[str]:
+        """مفتاح دمج الطلبات المتطابقة: نفس صيغة مفتاح ResponseCache مع السجل ضمن السياق"""
+        if not settings.LLM_COALESCE_ENABLED:
+            return None
+        history = await self.conversations.get_history(session_id)
+        scope = request_scope(
+            context=[{"role": "system", "content": self.context_builder.system_prompt}, *history],
+            model=self.router.primary.model,
+            temperature=settings.OPENAI_TEMPERATURE,
+            max_tokens=settings.OPENAI_MAX_TOKENS
+        )
+        return self.response_cache.make_key(user_message, scope)
+
+    def _admission(self, key: Optional[str], user_key: str,
+                   on_queue_position: Optional[PositionCallback]) -> Callable[[], Awaitable[None]]:
+        """انتظار المكان: مباشرة للطلب المنفرد، وعبر PositionFanout المفتاح للطلبات المدموجة"""
+        if key is None:
+            return lambda: self.admission.acquire(user_key, on_queue_position)
+        return lambda: self._admit_shared(key, user_key)
+
+    async def _admit_shared(self, key: str, user_key: str):
+        fanout = self._position_fanouts.setdefault(key, PositionFanout())
+        try:
+            await fanout.admit(self.admission, user_key)
+        finally:
+            self._drop_fanout(key, fanout)
+
+    def _drop_fanout(self, key: str, fanout: PositionFanout):
+        if not fanout.listeners and self._position_fanouts.get(key) is fanout:
+            del self._position_fanouts[key]
+
+    @asynccontextmanager
+    async def _queue_position_listener(self, key: Optional[str], on_queue_position: Optional[PositionCallback]):
+        """الاشتراك في موقع الطلب المدموج طوال انتظار هذا الطلب له"""
+        if key is None or on_queue_position is None:
+            yield
+            return
+        fanout = self._position_fanouts.setdefault(key, PositionFanout())
+        await fanout.add(on_queue_position)
+        try:
+            yield
+        finally:
+            fanout.remove(on_queue_position)
+            self._drop_fanout(key, fanout)
+
+    async def _complete(self, messages: list, scope: Optional[str], user_message: str, vector: Optional[np.ndarray],
+                        admit: Callable[[], Awaitable[None]]) -> Completion:
+        """
+        انتظار دور في AdmissionController ثم استدعاء المزود وتخزين الرد
+
+        يُنفذ مرة واحدة لكل مجموعة طلبات مدموجة، فالطلبات المنتظرة لنفس الرد لا تحجز أماكن.
+        """
+        await admit()
+        try:
+            result = await self.router.complete(
+                messages,
+                max_tokens=settings.OPENAI_MAX_TOKENS,
+                temperature=settings.OPENAI_TEMPERATURE
+            )
+        finally:
+            self.admission.release()
+        # الردود المقطوعة (length) وردود النموذج الاحتياطي لا تُخزن
+        if result.finish_reason == "stop" and result.model == self.router.primary.model:
+            await self._store_reply(scope, user_message, vector, result.content)
+        return result
+
+    async def _open_stream(self, messages: list, scope: Optional[str], user_message: str, vector: Optional[np.ndarray],
+                           admit: Callable[[], Awaitable[None]]) -> CompletionStream:
+        """نسخة متدفقة من _complete: المكان محجوز حتى نهاية التدفق، ويُخزن الرد بعد اكتماله"""
+        await admit()
+        released = False
+
+        def release_once():
+            nonlocal released
+            if not released:
+                released = True
+                self.admission.release()
+
         try:
-            self.conversation_history.append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            if len(self.conversation_history) > 20:
-                self.conversation_history = self.conversation_history[-20:]
-            
-            response = await self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "أنت مساعد ذكي متخصص في إدارة وسائل التواصل الاجتماعي والأتمتة. تتحدث العربية بطلاقة وتساعد المستخدمين في مهامهم."
-                    },
-                    *self.conversation_history
-                ],
+            stream = await self.router.stream(
+                messages,
                 max_tokens=settings.OPENAI_MAX_TOKENS,
                 temperature=settings.OPENAI_TEMPERATURE
             )
-            
-            assistant_message = response.choices[0].message.content
-            
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message
-            })
-            
+        except BaseException:
+            release_once()
+            raise
+
+        async def deltas():
+            try:
+                parts = []
+                async for delta in stream:
+                    parts.append(delta)
+                    yield delta
+            finally:
+                release_once()
+            result.finish_reason = stream.finish_reason
+            if stream.finish_reason == "stop" and stream.model == self.router.primary.model:
+                await self._store_reply(scope, user_message, vector, "".join(parts))
+
+        async def close():
+            try:
+                await stream.aclose()
+            finally:
+                release_once()
+
+        result = CompletionStream(deltas(), stream.model, close=close)
+        return result
+
+    @traced("ai.get_response")
+    async def get_response(self, user_message: str, session_id: Optional[str] = None,
+                           user_key: Optional[str] = None, on_queue_position: Optional[PositionCallback] = None) -> str:
+        """
+        user_key: هوية صاحب الطلب للتناوب العادل في طابور الانتظار (الافتراضي: الجلسة)
+        on_queue_position: يُستدعى بموقع الطلب في الطابور عند تغيره
+        """
+        if not self.router:
+            return NO_API_KEY_MESSAGE
+
+        scope = await self._cache_scope(session_id)
+        cached, vector = await self._cached_reply(scope, user_message, session_id)
+        if cached is not None:
+            return cached
+
+        key = await self._coalesce_key(user_message, session_id)
+        messages = await self._build_messages(user_message, session_id)
+
+        admit = self._admission(key, user_key or session_id or "anonymous", on_queue_position)
+
+        def call():
+            return self._complete(messages, scope, user_message, vector, admit)
+
+        try:
+            async with self._queue_position_listener(key, on_queue_position):
+                result = await (self.inflight.run(key, call) if key else call())
+
+            assistant_message = result.content
+
+            await self.conversations.append(session_id, "assistant", assistant_message)
+
             return assistant_message
-            
+
+        except (LLMUnavailable, AdmissionRejected):
+            return BUSY_MESSAGE
         except Exception as e:
             return f"عذراً، حدث خطأ في الاتصال بخدمة الذكاء الاصطناعي: {str(e)}"
-    
-    def clear_history(self):
-        self.conversation_history = []
+
+    async def stream_response(self, user_message: str, session_id: Optional[str] = None,
+                              user_key: Optional[str] = None, on_queue_position: Optional[PositionCallback] = None) -> AsyncIterator[str]:
+        """
+        نسخة متدفقة من get_response تُرجع أجزاء الرد (deltas) فور وصولها
+
+        يتم حفظ الرد الكامل في سجل المحادثة بعد انتهاء التدفق فقط،
+        فإذا تم إغلاق المولّد مبكراً لا يُضاف رد ناقص إلى السجل.
+        """
+        if not self.router:
+            yield NO_API_KEY_MESSAGE
+            return
+
+        scope = await self._cache_scope(session_id)
+        cached, vector = await self._cached_reply(scope, user_message, session_id)
+        if cached is not None:
+            yield cached
+            return
+
+        key = await self._coalesce_key(user_message, session_id)
+        messages = await self._build_messages(user_message, session_id)
+
+        admit = self._admission(key, user_key or session_id or "anonymous", on_queue_position)
+
+        def start():
+            return self._open_stream(messages, scope, user_message, vector, admit)
+
+        try:
+            async with self._queue_position_listener(key, on_queue_position):
+                stream = await (self.inflight.stream(key, start) if key else start())
+        except (LLMUnavailable, AdmissionRejected):
+            yield BUSY_MESSAGE
+            return
+        except Exception as e:
+            yield f"عذراً، حدث خطأ في الاتصال بخدمة الذكاء الاصطناعي: {str(e)}"
+            return
+
+        parts = []
+        try:
+            async for delta in stream:
+                parts.append(delta)
+                yield delta
+        finally:
+            await stream.aclose()
+
+        await self.conversations.append(session_id, "assistant", "".join(parts))
+
+    async def clear_history(self, session_id: Optional[str] = None):
+        await self.conversations.clear(session_id)
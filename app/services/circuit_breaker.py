@@ -0,0 +1,92 @@
+from typing import Any, Dict
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    قاطع دائرة بسيط لخدمة خارجية
+
+    - closed: الطلبات تمر، وبعد failure_threshold إخفاقات متتالية ينتقل إلى open
+    - open: الطلبات تُرفض فوراً حتى انتهاء reset_timeout
+    - half_open: يُسمح بطلب اختبار واحد؛ نجاحه يعيد الدائرة إلى closed وفشله يعيدها إلى open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+
+        # عدادات للمراقبة
+        self.success_count = 0
+        self.failure_count = 0
+        self.rejected_count = 0
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def retry_after(self) -> float:
+        """الثواني المتبقية قبل السماح بطلب اختبار (0 إذا كانت الدائرة غير مفتوحة)"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected_count += 1
+        return False
+
+    def record_success(self):
+        self.success_count += 1
+        self.consecutive_failures = 0
+        if self._state != self.CLOSED:
+            logger.info(f"Circuit '{self.name}' closed")
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failure_count += 1
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.opened_count += 1
+                logger.warning(
+                    f"Circuit '{self.name}' opened after {self.consecutive_failures} failures, "
+                    f"retrying in {self.reset_timeout}s"
+                )
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after": round(self.retry_after(), 3),
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "rejected_count": self.rejected_count,
+            "opened_count": self.opened_count,
+        }
@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional, Reversible
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# عدد التوكنات الإضافية التي يضيفها تنسيق chat لكل رسالة (role + فواصل)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken اختياري، نستخدم التقدير التقريبي بدونه
+    tiktoken = None
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.encoding_for_model(settings.OPENAI_MODEL)
+            except Exception as e:
+                # يحدث عند نموذج غير معروف أو عدم توفر ملفات الترميز بدون إنترنت
+                logger.warning(f"tiktoken unavailable for {settings.OPENAI_MODEL}, using estimate: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    حساب عدد توكنات النص
+
+    يستخدم tiktoken إن توفر، وإلا تقديراً تقريبياً متحفظاً
+    (النص العربي يستهلك توكنات أكثر لكل حرف من الإنجليزي).
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 2)
+
+
+def message_tokens(message: Dict) -> int:
+    """عدد توكنات الرسالة مع تخزينه داخلها حتى لا يُحسب أكثر من مرة"""
+    tokens = message.get("tokens")
+    if tokens is None:
+        tokens = count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        message["tokens"] = tokens
+    return tokens
+
+
+class ContextBuilder:
+    """
+    بناء قائمة الرسائل المرسلة للنموذج ضمن ميزانية توكنات محددة
+
+    تُضاف الرسائل من الأحدث إلى الأقدم حتى تنفد الميزانية، فتُحذف
+    الأدوار الأقدم أولاً. الرسالة الأخيرة (رسالة المستخدم الحالية) تُضاف
+    دائماً، ويُقص محتواها إذا تجاوزت الميزانية وحدها.
+    """
+
+    def __init__(self, system_prompt: str, budget: Optional[int] = None):
+        self.system_prompt = system_prompt
+        self.budget = budget if budget is not None else settings.OPENAI_PROMPT_TOKEN_BUDGET
+        self.system_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+
+    def build(self, history: Reversible[Dict]) -> List[Dict[str, str]]:
+        remaining = self.budget - self.system_tokens
+        selected: List[Dict[str, str]] = []
+
+        for message in reversed(history):
+            tokens = message_tokens(message)
+            if tokens > remaining:
+                if not selected:
+                    selected.append(self._truncate(message, remaining))
+                break
+            remaining -= tokens
+            selected.append({"role": message["role"], "content": message["content"]})
+
+        selected.reverse()
+        return [{"role": "system", "content": self.system_prompt}, *selected]
+
+    @staticmethod
+    def _truncate(message: Dict, available_tokens: int) -> Dict[str, str]:
+        """قص محتوى الرسالة بشكل تناسبي ليتسع ضمن التوكنات المتاحة (يُبقي النهاية)"""
+        content = message["content"]
+        content_tokens = max(1, message_tokens(message) - MESSAGE_OVERHEAD_TOKENS)
+        available = max(0, available_tokens - MESSAGE_OVERHEAD_TOKENS)
+        keep_chars = int(len(content) * available / content_tokens)
+        return {"role": message["role"], "content": content[-keep_chars:] if keep_chars > 0 else ""}
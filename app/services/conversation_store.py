@@ -0,0 +1,114 @@
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+import json
+import time
+import logging
+
+from app.core.config import settings
+from app.db.redis_client import RedisClient
+from app.services.context_builder import message_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_ID = "default"
+
+
+class _Session:
+    __slots__ = ("messages", "expires_at")
+
+    def __init__(self, messages: Deque[Dict], expires_at: float):
+        self.messages = messages
+        self.expires_at = expires_at
+
+
+class ConversationStore:
+    """
+    مخزن سجل المحادثات لكل جلسة (session_id)
+
+    الطبقة الأولى في الذاكرة: LRU بحد أقصى لعدد الجلسات مع انتهاء صلاحية
+    (TTL) يتجدد عند كل استخدام. كل جلسة تحفظ رسائلها في deque محدود الطول
+    فتتم الإضافة بشكل تدريجي دون نسخ السجل.
+
+    الطبقة الثانية (اختيارية) في Redis عبر RedisClient: تُكتب الرسائل فيها
+    مباشرة (write-through) وتُقرأ منها عند عدم وجود الجلسة في الذاكرة.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = settings.CONVERSATION_MAX_SESSIONS,
+        max_messages: int = settings.CONVERSATION_MAX_MESSAGES,
+        ttl_seconds: int = settings.CONVERSATION_TTL_SECONDS,
+        use_redis: bool = settings.CONVERSATION_REDIS_ENABLED
+    ):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_expired(self, now: float):
+        # الجلسات مرتبة حسب آخر استخدام، والصلاحية تتجدد عند الاستخدام،
+        # لذلك الجلسات المنتهية تكون دائماً في بداية القاموس
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.expires_at > now:
+                break
+            del self._sessions[session_id]
+
+    def _touch(self, session_id: str, session: _Session, now: float):
+        session.expires_at = now + self.ttl_seconds
+        self._sessions.move_to_end(session_id)
+
+    async def _load(self, session_id: str) -> _Session:
+        """جلب الجلسة من الذاكرة أو من Redis أو إنشاء جلسة جديدة"""
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._touch(session_id, session, now)
+            return session
+
+        messages: Deque[Dict] = deque(maxlen=self.max_messages)
+        if self.use_redis:
+            for raw in await RedisClient.get_history(session_id):
+                try:
+                    messages.append(json.loads(raw))
+                except ValueError:
+                    logger.warning(f"Skipping malformed history entry for session {session_id}")
+
+        session = _Session(messages, now + self.ttl_seconds)
+        self._sessions[session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    async def get_history(self, session_id: Optional[str]) -> Deque[Dict]:
+        """إرجاع رسائل الجلسة (مرجع للـ deque الداخلي دون نسخ)"""
+        return (await self._load(session_id or DEFAULT_SESSION_ID)).messages
+
+    async def append(self, session_id: Optional[str], role: str, content: str) -> Dict:
+        """إضافة رسالة إلى نهاية سجل الجلسة (مع حساب عدد توكناتها مرة واحدة)"""
+        session_id = session_id or DEFAULT_SESSION_ID
+        message = {"role": role, "content": content}
+        message_tokens(message)
+        (await self._load(session_id)).messages.append(message)
+
+        if self.use_redis:
+            await RedisClient.append_history(
+                session_id,
+                json.dumps(message, ensure_ascii=False),
+                max_length=self.max_messages,
+                expires=self.ttl_seconds
+            )
+        return message
+
+    async def clear(self, session_id: Optional[str]):
+        """حذف سجل الجلسة من الذاكرة ومن Redis"""
+        session_id = session_id or DEFAULT_SESSION_ID
+        self._sessions.pop(session_id, None)
+        if self.use_redis:
+            await RedisClient.delete_history(session_id)
@@ -0,0 +1,93 @@
+from typing import Optional
+import zlib
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.response_cache import normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+
+class Embedder:
+    """
+    واجهة دوال التضمين (embedding) المستخدمة في الذاكرة الدلالية
+
+    تُرجع embed متجهاً float32 بطول dim وطول (norm) يساوي 1،
+    فيصبح حاصل الضرب النقطي هو تشابه جيب التمام (cosine).
+    """
+
+    dim: int
+
+    async def embed(self, text: str) -> np.ndarray:
+        raise NotImplementedError
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class HashingEmbedder(Embedder):
+    """
+    تضمين حتمي يعمل دون اتصال: n-grams من الحروف موزعة على dim خانة
+
+    يلتقط اختلافات الإملاء والتشكيل (بعد normalize_prompt) وليس المعنى،
+    وهو مناسب للاختبار أو كبديل عند عدم توفر نموذج تضمين.
+    """
+
+    def __init__(self, dim: int = settings.SEMANTIC_CACHE_HASH_DIM, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    async def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in normalize_prompt(text).split():
+            padded = f" {word} "
+            for i in range(max(1, len(padded) - self.ngram + 1)):
+                gram = padded[i:i + self.ngram].encode("utf-8")
+                vector[zlib.crc32(gram) % self.dim] += 1.0
+        return _unit(vector)
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    تضمين عبر OpenAI Embeddings API
+
+    الطول من SEMANTIC_CACHE_EMBEDDING_DIM: نماذج text-embedding-3 تُرجعه
+    مباشرة (المعامل dimensions)، أما غيرها فيجب أن يطابق طول النموذج
+    الفعلي وإلا يُرفض المتجه بخطأ واضح بدلاً من فشل ضرب المصفوفة.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str = settings.SEMANTIC_CACHE_EMBEDDING_MODEL,
+        dim: int = settings.SEMANTIC_CACHE_EMBEDDING_DIM
+    ):
+        self.client = client
+        self.model = model
+        self.dim = dim
+        self._request_dim = model.startswith("text-embedding-3")
+
+    async def embed(self, text: str) -> np.ndarray:
+        kwargs = {"dimensions": self.dim} if self._request_dim else {}
+        response = await self.client.embeddings.create(model=self.model, input=normalize_prompt(text), **kwargs)
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            raise ValueError(
+                f"{self.model} returned {vector.size} dimensions, "
+                f"set SEMANTIC_CACHE_EMBEDDING_DIM={vector.size}"
+            )
+        return _unit(vector)
+
+
+def get_embedder(client=None, name: Optional[str] = None) -> Embedder:
+    """اختيار دالة التضمين من SEMANTIC_CACHE_EMBEDDER (hashing أو openai)"""
+    name = (name or settings.SEMANTIC_CACHE_EMBEDDER).lower()
+    if name == "openai":
+        if client is not None:
+            return OpenAIEmbedder(client)
+        logger.warning("SEMANTIC_CACHE_EMBEDDER=openai requires OPENAI_API_KEY, using hashing embedder")
+    return HashingEmbedder()
@@ -0,0 +1,274 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import time
+import logging
+
+import openai
+
+from app.core.config import settings
+from app.core.metrics import record_usage
+from app.core.rate_limit import TokenBucket
+from app.services.context_builder import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailable(Exception):
+    """خطأ مؤقت من المزود (429، انتهاء المهلة، خطأ شبكة أو 5xx) يسمح بالانتقال للمزود التالي"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class Completion:
+    content: str
+    finish_reason: Optional[str]
+    model: str
+
+
+class CompletionStream:
+    """
+    تدفق رد من مزود: يُقرأ بـ async for كأجزاء نصية (deltas)
+
+    بعد انتهاء التدفق تحتوي finish_reason على سبب الانتهاء من المزود.
+    """
+
+    def __init__(self, deltas: AsyncIterator[str], model: str, close: Optional[Callable[[], Awaitable]] = None):
+        self._deltas = deltas
+        self._close = close
+        self.model = model
+        self.finish_reason: Optional[str] = None
+
+    def __aiter__(self):
+        return self._deltas
+
+    async def aclose(self):
+        await self._deltas.aclose()
+        if self._close is not None:
+            await self._close()
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """
+    تقدير توكنات الطلب لحد TPM (السياق + max_tokens كما يحسبها OpenAI)
+
+    لا يعدّل الرسائل: هذه القائمة تُرسل كما هي للمزود، وأي مفتاح إضافي
+    (مثل tokens) يجعل OpenAI يرفض الطلب بـ 400.
+    """
+    return sum(
+        m.get("tokens") or count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS
+        for m in messages
+    ) + max_tokens
+
+
+class LLMProvider(ABC):
+    """
+    مزود نماذج لغوية مع حدوده الخاصة
+
+    كل مزود يجب أن يُعرّف complete و stream، وإلا يفشل إنشاؤه بـ TypeError
+    بدلاً من الفشل أثناء طلب.
+
+    - max_concurrency: الحد الأقصى للطلبات المتزامنة (semaphore)
+    - rpm / tpm: token buckets حسب حدود الطلبات والتوكنات في الدقيقة (0 = بدون حد)
+    - cooldown: بعد 429 لا يُستخدم المزود حتى انتهاء Retry-After
+    """
+
+    def __init__(self, name: str, model: str, max_concurrency: int, rpm: int = 0, tpm: int = 0):
+        self.name = name
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self._slot_freed = asyncio.Event()
+        self.rpm = TokenBucket.per_minute(rpm)
+        self.tpm = TokenBucket.per_minute(tpm)
+        self.cooldown_until = 0.0
+
+        self.in_flight = 0
+        self.request_count = 0
+        self.failure_count = 0
+
+    def _can_admit(self, tokens: int) -> bool:
+        return (
+            time.monotonic() >= self.cooldown_until
+            and self.in_flight < self.max_concurrency
+            and self.rpm.available() >= 1
+            and self.tpm.available() >= min(tokens, self.tpm.capacity)
+        )
+
+    def _take(self, tokens: int):
+        # بدون await بين الفحص والحجز، فلا يمكن لطلب آخر أن يسبقنا
+        self.rpm.try_acquire(1)
+        self.tpm.try_acquire(tokens)
+        self.in_flight += 1
+
+    def try_admit(self, tokens: int) -> bool:
+        """حجز مكان للطلب فوراً إن أمكن"""
+        if not self._can_admit(tokens):
+            return False
+        self._take(tokens)
+        return True
+
+    def wait_hint(self, tokens: int) -> float:
+        """
+        ثوانٍ حتى تسمح حدود المعدل أو فترة التهدئة بالطلب
+
+        القيمة 0 مع عدم القبول تعني أن المانع هو التزامن فقط،
+        وعندها يُنتظر slot_freed الذي يُطلق عند release().
+        """
+        return max(
+            self.cooldown_until - time.monotonic(),
+            self.rpm.time_until(1),
+            self.tpm.time_until(tokens),
+            0.0,
+        )
+
+    @property
+    def slot_freed(self) -> asyncio.Event:
+        return self._slot_freed
+
+    def release(self):
+        self.in_flight -= 1
+        slot_freed, self._slot_freed = self._slot_freed, asyncio.Event()
+        slot_freed.set()
+
+    def mark_failure(self, error: ProviderUnavailable):
+        self.failure_count += 1
+        if error.retry_after:
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + error.retry_after)
+
+    def get_stats(self) -> Dict:
+        return {
+            "model": self.model,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.request_count,
+            "failures": self.failure_count,
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - time.monotonic()), 2),
+        }
+
+    @abstractmethod
+    async def complete(self, messages: List[Dict], max_tokens: int, temperature: float) -> Completion:
+        """رد كامل في طلب واحد"""
+
+    @abstractmethod
+    async def stream(self, messages: List[Dict], max_tokens: int, temperature: float) -> CompletionStream:
+        """بدء تدفق الرد؛ أخطاء البدء (مثل ProviderUnavailable) تُرفع هنا"""
+
+
+def _retry_after(error: openai.APIStatusError) -> Optional[float]:
+    value = error.response.headers.get("retry-after") if error.response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class OpenAIProvider(LLMProvider):
+    """مزود OpenAI (أو أي خادم متوافق عبر OPENAI_BASE_URL)"""
+
+    def __init__(self, client: openai.AsyncOpenAI, name: str, model: str, **limits):
+        super().__init__(name, model, **limits)
+        self.client = client
+
+    def _translate(self, error: Exception) -> Exception:
+        if isinstance(error, openai.RateLimitError):
+            return ProviderUnavailable(
+                f"{self.name} rate limited",
+                retry_after=_retry_after(error) or settings.LLM_RATE_LIMIT_COOLDOWN
+            )
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+            return ProviderUnavailable(f"{self.name} unreachable: {error}", settings.LLM_ERROR_COOLDOWN)
+        if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+            return ProviderUnavailable(f"{self.name} returned {error.status_code}", settings.LLM_ERROR_COOLDOWN)
+        return error
+
+    async def complete(self, messages: List[Dict], max_tokens: int, temperature: float) -> Completion:
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        except Exception as e:
+            translated = self._translate(e)
+            if translated is e:
+                raise
+            raise translated from e
+        record_usage(self.name, self.model, response.usage)
+        choice = response.choices[0]
+        return Completion(choice.message.content or "", choice.finish_reason, self.model)
+
+    async def stream(self, messages: List[Dict], max_tokens: int, temperature: float) -> CompletionStream:
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                # آخر جزء في التدفق يحمل usage (لعداد التوكنات في /metrics)
+                **({"stream_options": {"include_usage": True}} if settings.OPENAI_STREAM_USAGE else {})
+            )
+        except Exception as e:
+            translated = self._translate(e)
+            if translated is e:
+                raise
+            raise translated from e
+
+        async def deltas():
+            async for chunk in response:
+                if getattr(chunk, "usage", None) is not None:
+                    record_usage(self.name, self.model, chunk.usage)
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    result.finish_reason = choice.finish_reason
+                if choice.delta.content:
+                    yield choice.delta.content
+
+        result = CompletionStream(deltas(), self.model, close=response.close)
+        return result
+
+
+class FakeProvider(LLMProvider):
+    """
+    مزود محلي للاختبارات وقياس الأداء بدون اتصال
+
+    يعيد صياغة آخر رسالة للمستخدم بعد latency ثانية، ويُرسلها كلمة كلمة
+    عند التدفق بفاصل chunk_delay.
+    """
+
+    def __init__(self, name: str = "fake", model: str = "fake-model",
+                 latency: float = settings.LLM_FAKE_LATENCY, chunk_delay: float = 0.0, **limits):
+        limits.setdefault("max_concurrency", 1000)
+        super().__init__(name, model, **limits)
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+
+    @staticmethod
+    def _reply(messages: List[Dict]) -> str:
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        return f"رد تجريبي على: {question}"
+
+    async def complete(self, messages: List[Dict], max_tokens: int, temperature: float) -> Completion:
+        await asyncio.sleep(self.latency)
+        return Completion(self._reply(messages), "stop", self.model)
+
+    async def stream(self, messages: List[Dict], max_tokens: int, temperature: float) -> CompletionStream:
+        await asyncio.sleep(self.latency)
+        words = self._reply(messages).split(" ")
+
+        async def deltas():
+            for i, word in enumerate(words):
+                if self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+                yield word if i == 0 else " " + word
+            result.finish_reason = "stop"
+
+        result = CompletionStream(deltas(), self.model)
+        return result
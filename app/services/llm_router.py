@@ -0,0 +1,192 @@
+from typing import Dict, List, Optional
+import asyncio
+import time
+import logging
+
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services.llm_providers import (
+    LLMProvider,
+    OpenAIProvider,
+    FakeProvider,
+    ProviderUnavailable,
+    Completion,
+    CompletionStream,
+    estimate_tokens
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailable(Exception):
+    """جميع المزودين مشغولون أو فشلوا خلال مهلة الانتظار"""
+
+
+class LLMRouter:
+    """
+    توجيه طلبات النموذج اللغوي إلى قائمة مزودين مرتبة
+
+    يُرسل الطلب إلى أول مزود لديه مكان (التزامن + RPM/TPM + بدون فترة تهدئة).
+    إذا كان الأساسي ممتلئاً أو فشل بخطأ مؤقت (429، مهلة، 5xx) يُستخدم المزود
+    التالي (نموذج احتياطي). إذا لم يتوفر أي مزود ينتظر الطلب حتى
+    LLM_QUEUE_TIMEOUT بدلاً من الفشل فوراً، ثم يُرفع LLMUnavailable.
+    """
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        queue_timeout: float = settings.LLM_QUEUE_TIMEOUT,
+        max_attempts: int = settings.LLM_MAX_ATTEMPTS
+    ):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = providers
+        self.queue_timeout = queue_timeout
+        self.max_attempts = max_attempts
+        self.fallback_count = 0
+        self.rejected_count = 0
+
+    @property
+    def primary(self) -> LLMProvider:
+        return self.providers[0]
+
+    async def _admit(self, tokens: int, deadline: float) -> Optional[LLMProvider]:
+        """أول مزود بالترتيب يقبل الطلب، مع الانتظار حتى deadline"""
+        while True:
+            for provider in self.providers:
+                if provider.try_admit(tokens):
+                    return provider
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            # الاستيقاظ عند أقرب تعبئة/انتهاء تهدئة أو عند تحرير أي مكان
+            hints = [provider.wait_hint(tokens) for provider in self.providers]
+            timeout = min([h for h in hints if h > 0] + [remaining])
+            waiters = [
+                asyncio.ensure_future(provider.slot_freed.wait())
+                for provider, hint in zip(self.providers, hints)
+                if hint <= 0
+            ]
+            if waiters:
+                done, pending = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in pending:
+                    waiter.cancel()
+            else:
+                await asyncio.sleep(timeout)
+
+    async def _run(self, messages: List[Dict], max_tokens: int, call):
+        tokens = estimate_tokens(messages, max_tokens)
+        deadline = time.monotonic() + self.queue_timeout
+        last_error: Optional[ProviderUnavailable] = None
+
+        for _ in range(self.max_attempts):
+            provider = await self._admit(tokens, deadline)
+            if provider is None:
+                break
+            provider.request_count += 1
+            if provider is not self.primary:
+                self.fallback_count += 1
+            try:
+                return await call(provider)
+            except ProviderUnavailable as e:
+                provider.release()
+                provider.mark_failure(e)
+                last_error = e
+                logger.warning(f"LLM provider {provider.name} unavailable: {e}")
+            except BaseException:
+                provider.release()
+                raise
+
+        self.rejected_count += 1
+        raise LLMUnavailable("No LLM provider available") from last_error
+
+    async def complete(self, messages: List[Dict], max_tokens: int, temperature: float) -> Completion:
+        async def call(provider: LLMProvider) -> Completion:
+            result = await provider.complete(messages, max_tokens, temperature)
+            provider.release()
+            return result
+
+        return await self._run(messages, max_tokens, call)
+
+    async def stream(self, messages: List[Dict], max_tokens: int, temperature: float) -> CompletionStream:
+        """
+        بدء تدفق رد؛ الانتقال للمزود التالي ممكن فقط قبل بدء التدفق
+
+        يبقى مكان المزود محجوزاً حتى انتهاء التدفق أو إغلاقه.
+        """
+        async def call(provider: LLMProvider) -> CompletionStream:
+            inner = await provider.stream(messages, max_tokens, temperature)
+            return self._holding_slot(inner, provider)
+
+        return await self._run(messages, max_tokens, call)
+
+    @staticmethod
+    def _holding_slot(inner: CompletionStream, provider: LLMProvider) -> CompletionStream:
+        released = False
+
+        def release_once():
+            nonlocal released
+            if not released:
+                released = True
+                provider.release()
+
+        async def deltas():
+            try:
+                async for delta in inner:
+                    yield delta
+                outer.finish_reason = inner.finish_reason
+            finally:
+                release_once()
+
+        async def close():
+            try:
+                await inner.aclose()
+            finally:
+                release_once()
+
+        outer = CompletionStream(deltas(), inner.model, close=close)
+        return outer
+
+    def get_stats(self) -> Dict:
+        return {
+            "providers": {p.name: p.get_stats() for p in self.providers},
+            "fallbacks": self.fallback_count,
+            "rejected": self.rejected_count,
+        }
+
+
+def build_router(client: Optional[AsyncOpenAI]) -> Optional[LLMRouter]:
+    """بناء المزودين من الإعدادات؛ None إذا لم يتوفر أي مزود (بدون OPENAI_API_KEY)"""
+    if settings.LLM_PROVIDER == "fake":
+        return LLMRouter([FakeProvider()])
+    if client is None:
+        return None
+
+    providers: List[LLMProvider] = [
+        OpenAIProvider(
+            client, "openai", settings.OPENAI_MODEL,
+            max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+            rpm=settings.OPENAI_RPM,
+            tpm=settings.OPENAI_TPM
+        )
+    ]
+    if settings.OPENAI_FALLBACK_MODEL:
+        fallback_client = client
+        if settings.OPENAI_FALLBACK_BASE_URL or settings.OPENAI_FALLBACK_API_KEY:
+            fallback_client = AsyncOpenAI(
+                api_key=settings.OPENAI_FALLBACK_API_KEY or settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_FALLBACK_BASE_URL or settings.OPENAI_BASE_URL,
+                max_retries=0
+            )
+        providers.append(
+            OpenAIProvider(
+                fallback_client, "openai_fallback", settings.OPENAI_FALLBACK_MODEL,
+                max_concurrency=settings.OPENAI_FALLBACK_MAX_CONCURRENCY,
+                rpm=settings.OPENAI_FALLBACK_RPM,
+                tpm=settings.OPENAI_FALLBACK_TPM
+            )
+        )
+    return LLMRouter(providers)
@@ -0,0 +1,137 @@
+from typing import Dict, List, Optional
+import hashlib
+import json
+import re
+import logging
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.text import normalize_arabic
+from app.db.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = "?!.,;:؟،؛ "
+
+
+def normalize_prompt(prompt: str) -> str:
+    """توحيد صيغة السؤال: التشكيل والهمزات والمسافات وعلامات الترقيم في الأطراف"""
+    prompt = _WHITESPACE.sub(" ", normalize_arabic(prompt))
+    return prompt.strip(_EDGE_PUNCTUATION)
+
+
+def context_hash(messages: List[Dict]) -> str:
+    """بصمة السياق السابق للسؤال (system prompt والسجل)"""
+    payload = json.dumps(
+        [(m["role"], m["content"]) for m in messages],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def request_scope(context: List[Dict], model: str, temperature: float, max_tokens: int) -> str:
+    """بصمة كل ما يؤثر على الرد عدا السؤال: السياق والنموذج وإعدادات التوليد"""
+    raw = json.dumps({
+        "context": context_hash(context),
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    ذاكرة تخزين مؤقت لردود الذكاء الاصطناعي للأسئلة المتكررة
+
+    المفتاح: السؤال بعد التوحيد + بصمة السياق + النموذج + درجة الحرارة + max_tokens.
+    الطبقة الأولى LRU في الذاكرة والثانية (اختيارية) في Redis تشترك فيها كل
+    العمليات، ولكل مدخل مدة صلاحية (TTL).
+
+    يُستخدم (مع SemanticCache) فقط عندما يكون الرد شبه حتمي: درجة حرارة منخفضة
+    (RESPONSE_CACHE_MAX_TEMPERATURE) وبداية محادثة بدون سجل سابق.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.RESPONSE_CACHE_ENABLED,
+        max_entries: int = settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.RESPONSE_CACHE_TTL_SECONDS,
+        max_temperature: float = settings.RESPONSE_CACHE_MAX_TEMPERATURE,
+        use_redis: bool = settings.RESPONSE_CACHE_REDIS_ENABLED
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.use_redis = use_redis
+        self._memory = TTLCache(max_entries, ttl_seconds)
+
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+
+    def scope(
+        self,
+        context: List[Dict],
+        history: List[Dict],
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> Optional[str]:
+        """
+        نطاق التخزين (كل ما يؤثر على الرد عدا السؤال)، أو None إذا كان الطلب غير مؤهل
+
+        context: الرسائل التي تسبق السؤال (system prompt)
+        history: سجل الجلسة قبل السؤال؛ أي سجل سابق يجعل الطلب غير مؤهل
+        """
+        if history or temperature > self.max_temperature:
+            self.bypassed += 1
+            return None
+        return request_scope(context, model, temperature, max_tokens)
+
+    @staticmethod
+    def make_key(prompt: str, scope: str) -> str:
+        """مفتاح الرد: السؤال بعد التوحيد ضمن النطاق"""
+        raw = f"{scope}:{normalize_prompt(prompt)}"
+        return "ai_response:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self._memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self.use_redis:
+            value = await RedisClient.cache_get(key)
+            if value is not None:
+                self.redis_hits += 1
+                self._memory.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        ttl = ttl or self.ttl_seconds
+        self._memory.set(key, value, ttl=ttl)
+        if self.use_redis:
+            await RedisClient.cache_set(key, value, ttl)
+        self.stores += 1
+
+    def get_stats(self) -> Dict:
+        lookups = self.memory_hits + self.redis_hits + self.misses
+        hits = self.memory_hits + self.redis_hits
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "bypassed": self.bypassed,
+        }
@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional
+import time
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.embeddings import Embedder
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    ذاكرة دلالية للأسئلة المتقاربة في المعنى أو الإملاء
+
+    كل سؤال مخزن يُحفظ كمتجه في مصفوفة NumPy محجوزة مسبقاً
+    (max_entries × dim)، والبحث هو ضرب مصفوفة في متجه واحد ثم أخذ
+    أعلى تشابه. تُستبعد المدخلات المنتهية أو التي تختلف في النطاق (scope:
+    النموذج والحرارة والسياق). إذا تجاوز التشابه threshold يُرجع الرد المخزن.
+
+    عند امتلاء المصفوفة يُستبدل مدخل منتهي الصلاحية إن وجد، وإلا الأقل
+    استخداماً مؤخراً (LRU).
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        threshold: float = settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.SEMANTIC_CACHE_TTL_SECONDS
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._vectors = np.zeros((max_entries, embedder.dim), dtype=np.float32)
+        self._scopes = np.zeros(max_entries, dtype=np.int64)
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._answers: List[Optional[str]] = [None] * max_entries
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.embed_errors = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _scope_id(scope: str) -> int:
+        # النطاق (مفتاح sha256 بصيغة hex) كعدد صحيح للمقارنة داخل NumPy
+        return int(scope[-15:], 16)
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            return await self.embedder.embed(text)
+        except Exception as e:
+            self.embed_errors += 1
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None
+
+    def lookup(self, vector: Optional[np.ndarray], scope: str) -> Optional[str]:
+        """أقرب سؤال مخزن في نفس النطاق إذا تجاوز التشابه threshold"""
+        if vector is None or self._size == 0:
+            self.misses += 1
+            return None
+
+        size = self._size
+        now = time.monotonic()
+        similarities = self._vectors[:size] @ vector
+        valid = (self._scopes[:size] == self._scope_id(scope)) & (self._expires_at[:size] > now)
+        similarities = np.where(valid, similarities, -np.inf)
+
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self._last_used[best] = now
+        self.hits += 1
+        return self._answers[best]
+
+    def _free_slot(self, now: float) -> int:
+        if self._size < self.max_entries:
+            self._size += 1
+            return self._size - 1
+        expired = np.flatnonzero(self._expires_at <= now)
+        if expired.size:
+            return int(expired[0])
+        self.evictions += 1
+        return int(np.argmin(self._last_used))
+
+    def add(self, vector: Optional[np.ndarray], scope: str, answer: str):
+        if vector is None:
+            return
+        now = time.monotonic()
+        slot = self._free_slot(now)
+        self._vectors[slot] = vector
+        self._scopes[slot] = self._scope_id(scope)
+        self._expires_at[slot] = now + self.ttl_seconds
+        self._last_used[slot] = now
+        self._answers[slot] = answer
+        self.stores += 1
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "embed_errors": self.embed_errors,
+        }
@@ -0,0 +1,164 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from app.services.llm_providers import CompletionStream
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """طلب جارٍ واحد مشترك بين كل من ينتظر نفس المفتاح"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        # حالة التدفق (stream فقط)
+        self.model: Optional[str] = None
+        self.chunks: List[str] = []
+        self.finish_reason: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self._changed = asyncio.Event()
+
+    async def changed(self):
+        await self._changed.wait()
+
+    def notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """
+    دمج الطلبات المتطابقة الجارية في طلب واحد للمزود (single-flight)
+
+    أول طلب لمفتاح معين يبدأ الاستدعاء الفعلي، وكل طلب مطابق يصل قبل
+    انتهائه ينتظر نفس النتيجة بدلاً من استدعاء جديد:
+    - run: كل المنتظرين يحصلون على نفس النتيجة (أو نفس الخطأ)
+    - stream: الأجزاء تُوزع على كل المشتركين، ومن ينضم متأخراً يحصل
+      أولاً على ما وصل منها ثم يتابع مع الباقين
+
+    إذا ألغى كل المنتظرين طلباتهم يُلغى الاستدعاء الفعلي أيضاً.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, kind: str, key: str) -> Tuple[_Flight, bool]:
+        flight = self._flights.get((kind, key))
+        if flight is None:
+            flight = _Flight()
+            self._flights[(kind, key)] = flight
+            self.leaders += 1
+            is_new = True
+        else:
+            self.coalesced += 1
+            is_new = False
+        flight.waiters += 1
+        return flight, is_new
+
+    def _forget(self, kind: str, key: str, flight: _Flight):
+        if self._flights.get((kind, key)) is flight:
+            del self._flights[(kind, key)]
+
+    def _leave(self, kind: str, key: str, flight: _Flight):
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            # لم يعد أحد ينتظر الرد: إيقاف الطلب لدى المزود
+            self._forget(kind, key, flight)
+            flight.task.cancel()
+
+    async def run(self, key: str, call: Callable[[], Awaitable]):
+        flight, is_new = self._join("run", key)
+        if is_new:
+            flight.task = asyncio.create_task(call())
+            flight.task.add_done_callback(lambda _: self._forget("run", key, flight))
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave("run", key, flight)
+
+    async def _pump(self, key: str, flight: _Flight, start: Callable[[], Awaitable[CompletionStream]]):
+        try:
+            stream = await start()
+            flight.model = stream.model
+            flight.notify()
+            try:
+                async for delta in stream:
+                    flight.chunks.append(delta)
+                    flight.notify()
+                flight.finish_reason = stream.finish_reason
+            finally:
+                await stream.aclose()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            # يصل الخطأ لكل المشتركين عبر flight.error
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget("stream", key, flight)
+            flight.notify()
+
+    async def stream(self, key: str, start: Callable[[], Awaitable[CompletionStream]]) -> CompletionStream:
+        """
+        الاشتراك في تدفق مشترك؛ يُرجع بعد بدء التدفق لدى المزود
+
+        أخطاء بدء التدفق (مثل LLMUnavailable) تُرفع هنا لكل المشتركين.
+        """
+        flight, is_new = self._join("stream", key)
+        if is_new:
+            flight.task = asyncio.create_task(self._pump(key, flight, start))
+
+        left = False
+
+        def leave():
+            nonlocal left
+            if not left:
+                left = True
+                self._leave("stream", key, flight)
+
+        try:
+            while flight.model is None and not flight.done:
+                await flight.changed()
+        except BaseException:
+            leave()
+            raise
+        if flight.model is None:
+            leave()
+            raise flight.error
+
+        async def deltas():
+            try:
+                index = 0
+                while True:
+                    while index < len(flight.chunks):
+                        yield flight.chunks[index]
+                        index += 1
+                    if flight.done:
+                        break
+                    await flight.changed()
+                if flight.error is not None:
+                    raise flight.error
+                result.finish_reason = flight.finish_reason
+            finally:
+                leave()
+
+        async def close():
+            leave()
+
+        result = CompletionStream(deltas(), flight.model, close=close)
+        return result
+
+    def get_stats(self) -> Dict:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 3) if total else 0.0,
+        }
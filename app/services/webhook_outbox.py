@@ -0,0 +1,222 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import re
+import logging
+
+from app.core.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookOutbox:
+    """
+    سجل دائم (write-ahead) لأحداث n8n قبل إرسالها
+
+    الملف append-only بصيغة JSON Lines:
+        {"id": 1, "payload": {...}}   حدث جديد
+        {"ack": 1}                    تأكيد إرسال الحدث
+
+    عند بدء التشغيل يُقرأ الملف وتُستعاد الأحداث غير المؤكدة لإعادة إرسالها
+    (at-least-once). بعد تراكم عدد من التأكيدات يُعاد كتابة الملف بالأحداث
+    المعلقة فقط (compaction) عبر ملف مؤقت و os.replace.
+
+    مع عدة عمليات (WORKERS > 1) تحجز كل عملية ملفاً خاصاً بها بقفل حصري:
+    n8n_outbox.jsonl ثم n8n_outbox.1.jsonl ثم n8n_outbox.2.jsonl ...
+    فلا تُرسل عمليتان نفس الأحداث ولا تحذف compaction أحداث عملية أخرى.
+    الملفات التي لم تحجزها أي عملية (بعد تقليل عدد العمليات) تتبناها أول
+    عملية تبدأ: تنقل أحداثها المعلقة إلى ملفها ثم تحذفها.
+
+    الأحداث التي يرفضها n8n نهائياً (4xx) تُنقل إلى ملف dead letter مشترك
+    بدلاً من إعادة إرسالها إلى الأبد.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fsync: bool = False,
+        compact_threshold: int = 1000,
+        dead_letter_path: Optional[Path] = None
+    ):
+        self.base_path = Path(path)
+        self.path = self.base_path
+        self.fsync = fsync
+        self.compact_threshold = compact_threshold
+        self.dead_letter_path = Path(dead_letter_path) if dead_letter_path is not None else None
+
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self._next_id = 1
+        self._acked_since_compact = 0
+        self._file = None
+        self._lock: Optional[FileLock] = None
+
+    def _slot_path(self, slot: int) -> Path:
+        if slot == 0:
+            return self.base_path
+        return self.base_path.with_name(f"{self.base_path.stem}.{slot}{self.base_path.suffix}")
+
+    @staticmethod
+    def _lock_path(path: Path) -> Path:
+        return path.with_name(path.name + ".lock")
+
+    def _slot_paths(self) -> List[Path]:
+        """ملفات كل العمليات الموجودة على القرص (الملف الأساسي أولاً)"""
+        stem, suffix = self.base_path.stem, self.base_path.suffix
+        slot_name = re.compile(rf"{re.escape(stem)}\.\d+{re.escape(suffix)}")
+        others = [
+            path for path in self.base_path.parent.glob(f"{stem}.*{suffix}")
+            if slot_name.fullmatch(path.name)
+        ]
+        return [self.base_path, *sorted(others)]
+
+    def _claim_slot(self):
+        """حجز أول ملف غير مستخدم من عملية أخرى"""
+        slot = 0
+        while True:
+            path = self._slot_path(slot)
+            lock = FileLock(self._lock_path(path))
+            if lock.acquire(blocking=False):
+                self.path = path
+                self._lock = lock
+                return
+            slot += 1
+
+    @staticmethod
+    def _read(path: Path) -> Tuple[Dict[int, Dict[str, Any]], int, int]:
+        """الأحداث المعلقة في ملف، وعدد التأكيدات فيه، وأكبر معرف مستخدم"""
+        pending: Dict[int, Dict[str, Any]] = {}
+        acked = 0
+        last_id = 0
+        if not path.exists():
+            return pending, acked, last_id
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # سطر ناقص من إغلاق مفاجئ أثناء الكتابة
+                    logger.warning(f"Skipping corrupt outbox record in {path}")
+                    continue
+                if "ack" in record:
+                    if pending.pop(record["ack"], None) is not None:
+                        acked += 1
+                else:
+                    pending[record["id"]] = record["payload"]
+                    last_id = max(last_id, record["id"])
+        return pending, acked, last_id
+
+    def _adopt_orphans(self) -> int:
+        """نقل الأحداث المعلقة من ملفات لا تحجزها أي عملية إلى ملف هذه العملية"""
+        adopted = 0
+        for path in self._slot_paths():
+            if path == self.path or not path.exists():
+                continue
+            lock = FileLock(self._lock_path(path))
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                pending, _, _ = self._read(path)
+                for payload in pending.values():
+                    self.append(payload)
+                    adopted += 1
+                if self.fsync and self._file is not None:
+                    os.fsync(self._file.fileno())
+                path.unlink()
+            finally:
+                lock.release()
+        return adopted
+
+    def open(self):
+        """حجز ملف لهذه العملية، وقراءة الأحداث المعلقة منه ثم فتحه للإضافة"""
+        self.base_path.parent.mkdir(parents=True, exist_ok=True)
+        self._claim_slot()
+
+        self.pending, acked, last_id = self._read(self.path)
+        self._next_id = last_id + 1
+        self._file = open(self.path, "a", encoding="utf-8")
+
+        adopted = self._adopt_orphans()
+        if self.pending:
+            logger.info(f"Replaying {len(self.pending)} pending n8n events from outbox {self.path}"
+                        + (f" ({adopted} adopted from other workers' files)" if adopted else ""))
+        if acked:
+            self.compact()
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, payload: Dict[str, Any]) -> int:
+        """تسجيل حدث جديد وإرجاع معرفه"""
+        event_id = self._next_id
+        self._next_id += 1
+        self._write({"id": event_id, "payload": payload})
+        self.pending[event_id] = payload
+        return event_id
+
+    def ack(self, event_id: int):
+        """تأكيد إرسال الحدث؛ يُحذف من الملف عند الـ compaction التالي"""
+        if self.pending.pop(event_id, None) is None:
+            return
+        self._write({"ack": event_id})
+        self._acked_since_compact += 1
+        if self._acked_since_compact >= self.compact_threshold:
+            self.compact()
+
+    def dead_letter(self, event_id: int):
+        """نقل حدث رفضه n8n نهائياً إلى ملف الـ dead letter ثم تأكيده"""
+        payload = self.pending.get(event_id)
+        if payload is None:
+            return
+        if self.dead_letter_path is not None:
+            line = json.dumps(
+                {"payload": payload, "rejected_at": datetime.now().isoformat()},
+                ensure_ascii=False
+            ) + "\n"
+            self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+            # كتابة واحدة في وضع append حتى لا تتداخل أسطر العمليات المختلفة
+            fd = os.open(self.dead_letter_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line.encode("utf-8"))
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+        logger.warning(f"n8n rejected {payload.get('type')} event {event_id}, moved to dead letter file")
+        self.ack(event_id)
+
+    def items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """الأحداث المعلقة بترتيب إضافتها"""
+        return iter(list(self.pending.items()))
+
+    def compact(self):
+        """إعادة كتابة الملف بالأحداث المعلقة فقط"""
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for event_id, payload in self.pending.items():
+                f.write(json.dumps({"id": event_id, "payload": payload}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._acked_since_compact = 0
+
+    def close(self):
+        if self._file is None:
+            return
+        self.compact()
+        self._file.close()
+        self._file = None
+        self._lock.release()
+        self._lock = None
@@ -1,7 +1,16 @@
 import httpx
 from app.core.config import settings
+from app.core.metrics import WEBHOOK_EVENTS, WEBHOOK_REQUEST_SECONDS
+from app.core.tracing import child_span, trace_fields
+from opentelemetry import propagate
+from opentelemetry.trace import SpanKind
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.webhook_outbox import WebhookOutbox
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Set, Tuple
+import asyncio
+import random
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,73 +19,225 @@ class WebhookService:
     def __init__(self):
         self.webhook_url = settings.N8N_WEBHOOK_URL
         self.enabled = settings.N8N_WEBHOOK_ENABLED and self.webhook_url is not None
-        self.client = httpx.AsyncClient(timeout=10.0)
+        self.client = httpx.AsyncClient(timeout=settings.N8N_WEBHOOK_TIMEOUT)
+        
+        # إعادة المحاولة وقاطع الدائرة
+        self.max_retries = settings.N8N_WEBHOOK_MAX_RETRIES
+        self.backoff_base = settings.N8N_WEBHOOK_BACKOFF_BASE
+        self.backoff_max = settings.N8N_WEBHOOK_BACKOFF_MAX
+        self.breaker = CircuitBreaker(
+            "n8n_webhook",
+            failure_threshold=settings.N8N_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.N8N_CIRCUIT_RESET_TIMEOUT
+        )
+        self.sent_count = 0
+        self.failed_count = 0
+        self.rejected_count = 0
+        self.retry_count = 0
+        
+        # طابور الإرسال في الخلفية (خارج مسار الشات)
+        self.concurrency = settings.N8N_WEBHOOK_CONCURRENCY
+        self.flush_interval = settings.N8N_WEBHOOK_FLUSH_INTERVAL
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.N8N_WEBHOOK_QUEUE_SIZE)
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+        self.dropped_count = 0
+        
+        # سجل دائم للأحداث حتى لا تضيع عند إعادة تشغيل الخادم
+        self.outbox: Optional[WebhookOutbox] = None
+        self.redeliver_interval = settings.N8N_OUTBOX_REDELIVER_INTERVAL
+        self._queued_ids: Set[int] = set()
+        if self.enabled and settings.N8N_OUTBOX_ENABLED:
+            self.outbox = WebhookOutbox(
+                settings.N8N_OUTBOX_PATH,
+                fsync=settings.N8N_OUTBOX_FSYNC,
+                compact_threshold=settings.N8N_OUTBOX_COMPACT_THRESHOLD,
+                dead_letter_path=settings.N8N_DEAD_LETTER_PATH
+            )
     
-    async def send_message_to_n8n(
+    def _build_user_payload(
         self,
         user_message: str,
         session_id: Optional[str] = None,
         user_id: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None
-    ) -> bool:
-        """
-        إرسال رسالة المستخدم إلى n8n webhook
+    ) -> Dict[str, Any]:
+        payload = {
+            "message": user_message,
+            "timestamp": datetime.now().isoformat(),
+            "source": "moj_ai_chatbot",
+            "type": "user_message"
+        }
         
-        Args:
-            user_message: الرسالة التي أرسلها المستخدم
-            session_id: معرف الجلسة (اختياري)
-            user_id: معرف المستخدم (اختياري)
-            metadata: بيانات إضافية (اختياري)
+        # إضافة البيانات الاختيارية
+        if session_id:
+            payload["session_id"] = session_id
+        
+        if user_id:
+            payload["user_id"] = user_id
         
+        if metadata:
+            payload["metadata"] = metadata
+        
+        # trace_id لربط الحدث بسجل التنفيذ في n8n، و traceparent لربط الإرسال بنفس الـ trace
+        payload.update(trace_fields())
+        
+        return payload
+    
+    def _build_ai_payload(
+        self,
+        user_message: str,
+        ai_response: str,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        payload = {
+            "user_message": user_message,
+            "ai_response": ai_response,
+            "timestamp": datetime.now().isoformat(),
+            "source": "moj_ai_chatbot",
+            "type": "ai_response"
+        }
+        
+        if session_id:
+            payload["session_id"] = session_id
+        
+        if user_id:
+            payload["user_id"] = user_id
+        
+        payload.update(trace_fields())
+        
+        return payload
+    
+    async def _post_once(self, payload: Dict[str, Any]) -> Optional[bool]:
+        """
+        محاولة إرسال واحدة
+
         Returns:
-            bool: True إذا تم الإرسال بنجاح، False خلاف ذلك
+            True عند النجاح، False عند خطأ نهائي لا تفيد إعادة المحاولة معه (4xx)،
+            None عند خطأ مؤقت (timeout، خطأ شبكة، 5xx، 429)
         """
-        if not self.enabled:
-            logger.debug("N8N webhook is disabled")
-            return False
-        
+        started = time.perf_counter()
+        result = await self._send(payload)
+        outcome = {True: "success", False: "rejected", None: "error"}[result]
+        WEBHOOK_REQUEST_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+        return result
+    
+    async def _send(self, payload: Dict[str, Any]) -> Optional[bool]:
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "Moj-AI-Chatbot/2.0"
+        }
+        propagate.inject(headers)
         try:
-            payload = {
-                "message": user_message,
-                "timestamp": datetime.now().isoformat(),
-                "source": "moj_ai_chatbot",
-                "type": "user_message"
-            }
-            
-            # إضافة البيانات الاختيارية
-            if session_id:
-                payload["session_id"] = session_id
-            
-            if user_id:
-                payload["user_id"] = user_id
-            
-            if metadata:
-                payload["metadata"] = metadata
-            
-            # إرسال الطلب إلى n8n webhook
             response = await self.client.post(
                 self.webhook_url,
                 json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "User-Agent": "Moj-AI-Chatbot/2.0"
-                }
+                headers=headers
             )
             
             response.raise_for_status()
-            logger.info(f"Message sent to n8n webhook successfully. Status: {response.status_code}")
+            logger.info(f"Payload ({payload.get('type')}) sent to n8n webhook successfully. Status: {response.status_code}")
             return True
-            
+        
         except httpx.TimeoutException:
             logger.error("Timeout while sending message to n8n webhook")
-            return False
+            return None
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error while sending to n8n webhook: {e.response.status_code} - {e.response.text}")
+            if e.response.status_code >= 500 or e.response.status_code in (408, 429):
+                return None
             return False
+        except httpx.TransportError as e:
+            logger.error(f"Connection error while sending to n8n webhook: {str(e)}")
+            return None
         except Exception as e:
             logger.error(f"Error sending message to n8n webhook: {str(e)}")
             return False
     
+    def _backoff_delay(self, attempt: int) -> float:
+        """تأخير أُسّي مع jitter كامل: عشوائي بين 0 و min(max, base * 2^attempt)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    async def _post(self, payload: Dict[str, Any]) -> Optional[bool]:
+        """
+        إرسال payload إلى n8n webhook مع إعادة المحاولة وقاطع الدائرة
+
+        Returns:
+            True عند الإرسال، False عند الرفض النهائي، None عند فشل مؤقت
+            (استنفاد المحاولات أو دائرة مفتوحة) يستحق إعادة الإرسال لاحقاً
+        """
+        # الإرسال يتم لاحقاً في الخلفية: الـ span يتبع الدورة التي أضافت الحدث للطابور
+        with child_span(
+            "n8n.webhook.post",
+            {"n8n.event_type": payload.get("type", "")},
+            traceparent=payload.get("traceparent"),
+            kind=SpanKind.CLIENT
+        ) as span:
+            result = await self._post_with_retries(payload)
+            span.set_attribute("n8n.sent", result is True)
+            span.set_attribute("n8n.rejected", result is False)
+            return result
+    
+    async def _post_with_retries(self, payload: Dict[str, Any]) -> Optional[bool]:
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow_request():
+                logger.warning(f"N8N circuit is open, skipping {payload.get('type')} event")
+                self.failed_count += 1
+                WEBHOOK_EVENTS.labels("failed").inc()
+                return None
+            
+            result = await self._post_once(payload)
+            
+            if result is True:
+                self.breaker.record_success()
+                self.sent_count += 1
+                WEBHOOK_EVENTS.labels("sent").inc()
+                return True
+            
+            if result is False:
+                # الخادم متاح لكنه رفض الطلب، لا داعي لفتح الدائرة أو إعادة المحاولة
+                self.breaker.record_success()
+                self.rejected_count += 1
+                WEBHOOK_EVENTS.labels("rejected").inc()
+                return False
+            
+            self.breaker.record_failure()
+            if attempt < self.max_retries:
+                self.retry_count += 1
+                await asyncio.sleep(self._backoff_delay(attempt))
+        
+        self.failed_count += 1
+        WEBHOOK_EVENTS.labels("failed").inc()
+        return None
+    
+    async def send_message_to_n8n(
+        self,
+        user_message: str,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        إرسال رسالة المستخدم إلى n8n webhook
+        
+        Args:
+            user_message: الرسالة التي أرسلها المستخدم
+            session_id: معرف الجلسة (اختياري)
+            user_id: معرف المستخدم (اختياري)
+            metadata: بيانات إضافية (اختياري)
+        
+        Returns:
+            bool: True إذا تم الإرسال بنجاح، False خلاف ذلك
+        """
+        if not self.enabled:
+            logger.debug("N8N webhook is disabled")
+            return False
+        
+        return await self._post(
+            self._build_user_payload(user_message, session_id, user_id, metadata)
+        ) is True
+    
     async def send_ai_response_to_n8n(
         self,
         user_message: str,
@@ -99,37 +260,187 @@ class WebhookService:
         if not self.enabled:
             return False
         
-        try:
-            payload = {
-                "user_message": user_message,
-                "ai_response": ai_response,
-                "timestamp": datetime.now().isoformat(),
-                "source": "moj_ai_chatbot",
-                "type": "ai_response"
-            }
-            
-            if session_id:
-                payload["session_id"] = session_id
-            
-            if user_id:
-                payload["user_id"] = user_id
-            
-            response = await self.client.post(
-                self.webhook_url,
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "User-Agent": "Moj-AI-Chatbot/2.0"
-                }
-            )
-            
-            response.raise_for_status()
+        return await self._post(
+            self._build_ai_payload(user_message, ai_response, session_id, user_id)
+        ) is True
+    
+    def enqueue(self, payload: Dict[str, Any]) -> bool:
+        """
+        إضافة payload إلى طابور الإرسال دون انتظار n8n
+        
+        Returns:
+            bool: True إذا تمت الإضافة، False إذا كان الـ webhook معطّلاً أو الطابور ممتلئاً
+        """
+        if not self.enabled or self._closing:
+            return False
+        
+        event_id = None
+        if self.outbox is not None:
+            if not self.outbox.is_open:
+                self.outbox.open()
+            event_id = self.outbox.append(payload)
+        
+        if self._put(event_id, payload):
             return True
-            
-        except Exception as e:
-            logger.error(f"Error sending AI response to n8n webhook: {str(e)}")
+        
+        if event_id is not None:
+            # الحدث محفوظ في الـ outbox وسيُعاد إرساله عند توفر مساحة في الطابور
+            logger.warning(f"N8N delivery queue is full, deferring {payload.get('type')} event to outbox")
+            return True
+        
+        self.dropped_count += 1
+        logger.warning(f"N8N delivery queue is full, dropping {payload.get('type')} event")
+        return False
+    
+    def _put(self, event_id: Optional[int], payload: Dict[str, Any]) -> bool:
+        try:
+            self.queue.put_nowait((event_id, payload))
+        except asyncio.QueueFull:
+            return False
+        if event_id is not None:
+            self._queued_ids.add(event_id)
+        return True
+    
+    def _requeue_pending(self):
+        """إعادة الأحداث المعلقة في الـ outbox (غير الموجودة في الطابور) إلى الطابور"""
+        if self.outbox is None:
+            return
+        for event_id, payload in self.outbox.items():
+            if event_id in self._queued_ids:
+                continue
+            if not self._put(event_id, payload):
+                break
+    
+    def enqueue_message_to_n8n(
+        self,
+        user_message: str,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """نسخة غير حاجبة من send_message_to_n8n عبر طابور الخلفية"""
+        if not self.enabled:
+            logger.debug("N8N webhook is disabled")
+            return False
+        return self.enqueue(self._build_user_payload(user_message, session_id, user_id, metadata))
+    
+    def enqueue_ai_response_to_n8n(
+        self,
+        user_message: str,
+        ai_response: str,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> bool:
+        """نسخة غير حاجبة من send_ai_response_to_n8n عبر طابور الخلفية"""
+        if not self.enabled:
             return False
+        return self.enqueue(self._build_ai_payload(user_message, ai_response, session_id, user_id))
+    
+    def start(self):
+        """تشغيل عامل الإرسال في الخلفية (يُستدعى عند بدء التطبيق)"""
+        if self.enabled and self._worker is None:
+            if self.outbox is not None and not self.outbox.is_open:
+                self.outbox.open()
+            self._worker = asyncio.create_task(self._run_worker())
+    
+    async def _next_events(self) -> List[Tuple[Optional[int], Dict[str, Any]]]:
+        """
+        انتظار أول عنصر ثم جمع ما يصل حتى concurrency حدث أو انتهاء flush_interval
+
+        يُرجع قائمة فارغة إذا لم يصل أي عنصر خلال redeliver_interval
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            events = [await asyncio.wait_for(self.queue.get(), self.redeliver_interval)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = loop.time() + self.flush_interval
+        
+        while len(events) < self.concurrency:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                events.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return events
+    
+    async def _deliver_next(self):
+        """
+        إرسال مجموعة أحداث من الطابور
+
+        كل حدث يُرسل في طلب مستقل (n8n يستقبل حدثاً واحداً في كل طلب)،
+        والمجموعة تُرسل بالتوازي: concurrency هو حد الطلبات المتزامنة.
+        """
+        # أثناء فتح الدائرة تبقى الأحداث في الطابور بدلاً من رفضها فوراً
+        delay = self.breaker.retry_after()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.queue.empty():
+            self._requeue_pending()
+        events = await self._next_events()
+        try:
+            results = await asyncio.gather(*(self._post(payload) for _, payload in events))
+            for (event_id, _), result in zip(events, results):
+                if event_id is None:
+                    continue
+                if result is True:
+                    self.outbox.ack(event_id)
+                elif result is False:
+                    # رفض نهائي: إعادة الإرسال ستُرفض مجدداً، فلا يبقى الحدث في الـ outbox
+                    self.outbox.dead_letter(event_id)
+                # None: فشل مؤقت، يبقى معلقاً ويُعاد إرساله لاحقاً
+        finally:
+            for event_id, _ in events:
+                # حتى عند الخطأ: الأحداث غير المؤكدة تعود للطابور من الـ outbox
+                self._queued_ids.discard(event_id)
+                self.queue.task_done()
+    
+    async def _run_worker(self):
+        while True:
+            try:
+                await self._deliver_next()
+            except Exception:
+                # خطأ غير متوقع (مثل OSError عند الكتابة في الـ outbox) لا يوقف العامل،
+                # وإلا يمتلئ الطابور دون إرسال أي حدث
+                logger.exception("N8N delivery worker failed, retrying")
+                await asyncio.sleep(self.redeliver_interval)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الإرسال وحالة قاطع الدائرة للمراقبة"""
+        return {
+            "enabled": self.enabled,
+            "sent": self.sent_count,
+            "failed": self.failed_count,
+            "rejected": self.rejected_count,
+            "retries": self.retry_count,
+            "dropped": self.dropped_count,
+            "queue_size": self.queue.qsize(),
+            "outbox_pending": len(self.outbox.pending) if self.outbox is not None else 0,
+            "circuit": self.breaker.stats()
+        }
     
     async def close(self):
-        """إغلاق العميل HTTP"""
+        """تفريغ طابور الإرسال ثم إغلاق العميل HTTP"""
+        self._closing = True
+        
+        if self._worker is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=settings.N8N_WEBHOOK_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                if self.outbox is not None:
+                    logger.warning(f"N8N delivery queue not drained on shutdown, {self.queue.qsize()} events kept in outbox")
+                else:
+                    logger.warning(f"N8N delivery queue not drained on shutdown, {self.queue.qsize()} events lost")
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        if self.outbox is not None:
+            self.outbox.close()
+        
         await self.client.aclose()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SQLite auth benchmark - register/login throughput with SQLITE_PRODUCTION_MODE off vs on
+
+Each mode runs in its own subprocess (settings and engines are built at
+import time) against a fresh database file in a temp directory. Redis is
+replaced by fakeredis when it is installed so only the database and bcrypt
+are measured; bcrypt rounds are lowered so the database dominates.
+Rate limits are disabled, otherwise the benchmark would time 429 responses.
+
+Usage:
+    python benchmarks/bench_auth_sqlite.py [--users 200] [--concurrency 32] [--rounds 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, latencies, errors, elapsed):
+    return {
+        "phase": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_phase(client, name, requests, concurrency):
+    """Fire (path, body) requests with bounded concurrency and time each one"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(path, body):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(path, body) for path, body in requests))
+    return summarize(name, latencies, errors, time.perf_counter() - started)
+
+
+async def run_single(users, concurrency):
+    import httpx
+    from fastapi import FastAPI
+
+    try:
+        import fakeredis
+        from app.db.redis_client import RedisClient
+        RedisClient._instance = fakeredis.FakeAsyncRedis(decode_responses=True)
+    except ImportError:
+        pass
+
+    from app.auth.routes import router
+    from app.db.database import init_db, close_db
+
+    app = FastAPI()
+    app.include_router(router)
+    await init_db()
+
+    credentials = [
+        {"email": f"bench{i}@example.com", "password": "bench-password"}
+        for i in range(users)
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = [
+            await run_phase(client, "register", [("/api/auth/register", c) for c in credentials], concurrency),
+            await run_phase(client, "login", [("/api/auth/login", c) for c in credentials], concurrency),
+        ]
+    await close_db()
+    return results
+
+
+def run_mode(production, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            SQLITE_PATH=str(Path(tmp) / "bench.db"),
+            SQLITE_PRODUCTION_MODE=str(production),
+            BCRYPT_ROUNDS=str(args.rounds),
+            POSTGRES_USER="",
+            # the register/login limits would turn most requests into 429s
+            RATE_LIMIT_ENABLED="False",
+        )
+        output = subprocess.run(
+            [sys.executable, __file__, "--single",
+             "--users", str(args.users), "--concurrency", str(args.concurrency)],
+            env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt rounds")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(asyncio.run(run_single(args.users, args.concurrency))))
+        return
+
+    report = {
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "bcrypt_rounds": args.rounds,
+        "baseline": run_mode(False, args),
+        "production": run_mode(True, args),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
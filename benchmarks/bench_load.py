@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+End-to-end load benchmark - WebSocket chat, login storms and /api/send-message floods
+
+Runs fully offline. The app is started with uvicorn in a subprocess,
+pointed at benchmarks/fake_upstreams.py (another subprocess) for both the
+OpenAI-compatible API and the n8n webhook, with a fresh SQLite database in
+a temp directory. Redis is fakeredis inside the app process by default
+(--redis local uses REDIS_HOST/REDIS_PORT from the environment).
+
+Scenarios (--scenarios, comma-separated):
+- chat: --chatters WebSocket clients, each sending --messages messages one
+  after another; reports time to first token and full turn latency
+- login: registers --users accounts, then --logins logins at --concurrency
+- send_message: --requests POSTs to /api/send-message at --concurrency
+
+Rate limits are disabled unless --rate-limits is given, so the numbers
+show capacity rather than throttling. The report is JSON (p50/p95/p99 in
+milliseconds) so runs can be diffed; --output also writes it to a file.
+
+Usage:
+    python benchmarks/bench_load.py [--scenarios chat,login,send_message] [--chatters 50] [--messages 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SCENARIOS = ("chat", "login", "send_message")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, latencies, errors, elapsed):
+    return {
+        "phase": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(client, url, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout}s")
+
+
+async def run_requests(client, name, requests, concurrency):
+    """Fire (path, body) POSTs with bounded concurrency and time each one"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(path, body):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(path, body) for path, body in requests))
+    return summarize(name, latencies, errors, time.perf_counter() - started)
+
+
+async def chat_scenario(ws_url, chatters, messages, turn_timeout):
+    import websockets
+
+    first_token = []
+    turns = []
+    errors = 0
+
+    async def chatter(index):
+        nonlocal errors
+        answered = 0
+        try:
+            async with websockets.connect(ws_url, max_size=None, open_timeout=turn_timeout) as ws:
+                for number in range(messages):
+                    await ws.send(json.dumps({
+                        "message": f"bench chatter {index} message {number}",
+                        "session_id": f"bench-{index}",
+                    }))
+                    started = time.perf_counter()
+                    got_first = False
+                    while True:
+                        frame = json.loads(await asyncio.wait_for(ws.recv(), turn_timeout))
+                        kind = frame.get("type")
+                        if kind == "assistant_delta" and not got_first:
+                            got_first = True
+                            first_token.append(time.perf_counter() - started)
+                        elif kind in ("assistant_done", "assistant_message"):
+                            if not got_first:
+                                first_token.append(time.perf_counter() - started)
+                            turns.append(time.perf_counter() - started)
+                            break
+                        elif kind in ("error", "rate_limited"):
+                            errors += 1
+                            break
+                    answered += 1
+        except Exception:
+            # connection failed or a turn timed out: the rest of this chatter's messages count as errors
+            errors += messages - answered
+
+    started = time.perf_counter()
+    await asyncio.gather(*(chatter(i) for i in range(chatters)))
+    elapsed = time.perf_counter() - started
+    return [
+        summarize("chat_first_token", first_token, errors, elapsed),
+        summarize("chat_turn", turns, errors, elapsed),
+    ]
+
+
+async def run_benchmark(args, app_url, upstream_url):
+    import httpx
+
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=60.0, limits=limits) as client:
+        if "chat" in args.scenarios:
+            ws_url = app_url.replace("http://", "ws://") + "/ws/chat"
+            results += await chat_scenario(ws_url, args.chatters, args.messages, args.turn_timeout)
+
+        if "login" in args.scenarios:
+            credentials = [
+                {"email": f"bench{i}@example.com", "password": "bench-password"}
+                for i in range(args.users)
+            ]
+            results.append(await run_requests(
+                client, "register", [("/api/auth/register", c) for c in credentials], args.concurrency
+            ))
+            results.append(await run_requests(
+                client, "login",
+                [("/api/auth/login", credentials[i % args.users]) for i in range(args.logins)],
+                args.concurrency
+            ))
+
+        if "send_message" in args.scenarios:
+            results.append(await run_requests(
+                client, "send_message",
+                [("/api/send-message", {"message": f"bench message {i}", "session_id": f"bench-{i % 100}"})
+                 for i in range(args.requests)],
+                args.concurrency
+            ))
+
+        upstream = (await client.get(f"{upstream_url}/stats")).json()
+    return results, upstream
+
+
+def serve(port):
+    """App process: swap in fakeredis before the app is imported, then run uvicorn"""
+    import uvicorn
+
+    if os.environ.get("BENCH_REDIS") == "fakeredis":
+        try:
+            import fakeredis
+            from app.db.redis_client import RedisClient
+            RedisClient._instance = fakeredis.FakeAsyncRedis(decode_responses=True)
+        except ImportError:
+            # the app falls back to in-process state when Redis is unreachable
+            print("fakeredis is not installed, running without Redis", file=sys.stderr)
+
+    from app.main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--chatters", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=5, help="messages per chatter")
+    parser.add_argument("--users", type=int, default=50, help="accounts registered for the login storm")
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=1000, help="/api/send-message requests")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--turn-timeout", type=float, default=60.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--n8n-latency", type=float, default=0.02)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt rounds")
+    parser.add_argument("--redis", choices=("fakeredis", "local"), default="fakeredis")
+    parser.add_argument("--no-streaming", action="store_true", help="run with OPENAI_STREAMING=False")
+    parser.add_argument("--rate-limits", action="store_true", help="keep RATE_LIMIT_ENABLED on")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    upstream_port, app_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            BENCH_REDIS=args.redis,
+            LLM_PROVIDER="openai",
+            OPENAI_API_KEY="bench-key",
+            OPENAI_BASE_URL=f"{upstream_url}/v1",
+            OPENAI_MODEL="fake-model",
+            OPENAI_STREAMING=str(not args.no_streaming),
+            N8N_WEBHOOK_ENABLED="True",
+            N8N_WEBHOOK_URL=f"{upstream_url}/webhook",
+            N8N_OUTBOX_PATH=str(Path(tmp) / "n8n_outbox.jsonl"),
+            SQLITE_PATH=str(Path(tmp) / "bench.db"),
+            POSTGRES_USER="",
+            JWT_SECRET_KEY="bench-secret-" + "x" * 32,
+            BCRYPT_ROUNDS=str(args.rounds),
+            RATE_LIMIT_ENABLED=str(args.rate_limits),
+            TRACING_ENABLED="False",
+            DEBUG="False",
+        )
+        upstream = subprocess.Popen(
+            [sys.executable, str(ROOT / "benchmarks" / "fake_upstreams.py"),
+             "--port", str(upstream_port),
+             "--latency", str(args.latency),
+             "--tokens-per-second", str(args.tokens_per_second),
+             "--reply-tokens", str(args.reply_tokens),
+             "--n8n-latency", str(args.n8n_latency)],
+            cwd=ROOT,
+        )
+        server = subprocess.Popen(
+            [sys.executable, __file__, "--serve", str(app_port)],
+            env=env, cwd=ROOT, stdout=subprocess.DEVNULL,
+        )
+        try:
+            async def run():
+                import httpx
+                async with httpx.AsyncClient() as probe:
+                    await wait_until_up(probe, f"{upstream_url}/stats", upstream)
+                    await wait_until_up(probe, f"{app_url}/health", server)
+                return await run_benchmark(args, app_url, upstream_url)
+
+            results, upstream_stats = asyncio.run(run())
+        finally:
+            for process in (server, upstream):
+                process.terminate()
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    report = {
+        "config": {
+            "scenarios": args.scenarios,
+            "chatters": args.chatters,
+            "messages": args.messages,
+            "users": args.users,
+            "logins": args.logins,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "reply_tokens": args.reply_tokens,
+            "n8n_latency": args.n8n_latency,
+            "bcrypt_rounds": args.rounds,
+            "redis": args.redis,
+            "streaming": not args.no_streaming,
+            "rate_limits": args.rate_limits,
+        },
+        "results": results,
+        "upstream": upstream_stats,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Conversation search benchmark - FTS5 query latency over a large message table
+
+Seeds a fresh SQLite database in a temp directory with synthetic Arabic and
+English messages spread over many users, builds the FTS5 index through the
+same startup backfill the app uses, then times ranked searches per user and
+across all users (support staff scope), for topic words and for the most
+frequent filler words (which match most messages and exercise
+SEARCH_MAX_CANDIDATES).
+
+Usage:
+    python benchmarks/bench_search.py [--messages 1000000] [--users 1000] [--queries 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+WORDS = [
+    "إدارة", "الحسابات", "تويتر", "مكتبة", "المحتوى", "جدولة", "التغريدات", "تحليل",
+    "الأداء", "المتابعين", "حملة", "إعلانية", "الأتمتة", "سير", "العمل", "تقرير",
+    "أسبوعي", "منشور", "الصورة", "الفيديو", "الجمهور", "التفاعل", "الرسائل", "الدعم",
+    "schedule", "report", "campaign", "analytics", "followers", "engagement", "n8n", "webhook",
+]
+
+QUERIES = {
+    "topic": ["مكتبه", "اداره الحسابات", "تقرير اسبوعي", "campaign", "التفاع", "جدوله التغريدات"],
+    # top-ranked Zipf filler words: present in most messages
+    "common": ["w0", "w1", "w2"],
+}
+
+# Share of tokens drawn from WORDS; the rest come from a Zipf-distributed
+# filler vocabulary so term frequencies look like real chat text
+TOPIC_RATIO = 0.1
+FILLER_VOCABULARY = 50000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(db_path, messages, users):
+    """Insert users, conversations and messages directly (fast, bypasses the index)"""
+    rng = random.Random(42)
+    filler_weights = [1 / rank for rank in range(1, FILLER_VOCABULARY + 1)]
+    filler = rng.choices(range(FILLER_VOCABULARY), weights=filler_weights, k=messages * 15)
+    filler_pos = 0
+    conn = sqlite3.connect(db_path)
+    start = datetime(2024, 1, 1)
+    conn.executemany(
+        "INSERT INTO users (id, email, password_hash, created_at) VALUES (?, ?, 'x', ?)",
+        [(u, f"user{u}@example.com", start) for u in range(1, users + 1)],
+    )
+    conversations = max(1, messages // 20)
+    conn.executemany(
+        "INSERT INTO conversations (id, user_id, session_id, title, created_at, updated_at) "
+        "VALUES (?, ?, ?, 'bench', ?, ?)",
+        [(c, rng.randint(1, users), f"bench{c}", start, start) for c in range(1, conversations + 1)],
+    )
+    batch = []
+    for i in range(1, messages + 1):
+        tokens = []
+        for _ in range(rng.randint(5, 25)):
+            if rng.random() < TOPIC_RATIO:
+                tokens.append(rng.choice(WORDS))
+            else:
+                tokens.append(f"w{filler[filler_pos % len(filler)]}")
+                filler_pos += 1
+        text = " ".join(tokens)
+        batch.append((i, rng.randint(1, conversations), "user" if i % 2 else "assistant",
+                      text, start + timedelta(seconds=i)))
+        if len(batch) == 50000:
+            conn.executemany(
+                "INSERT INTO messages (id, conversation_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                batch,
+            )
+            batch = []
+    if batch:
+        conn.executemany(
+            "INSERT INTO messages (id, conversation_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+            batch,
+        )
+    conn.commit()
+    conn.close()
+
+
+async def run(args, db_path):
+    from app.db.database import init_db, close_db, ReadSessionLocal
+    from app.conversations.search import init_search_index, search_messages
+
+    await init_db()
+    started = time.perf_counter()
+    seed(db_path, args.messages, args.users)
+    seed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await init_search_index()
+    index_seconds = time.perf_counter() - started
+
+    rng = random.Random(7)
+    results = {}
+    for kind, queries in QUERIES.items():
+        for scope in ("user", "all"):
+            latencies = []
+            hits = 0
+            for _ in range(args.queries):
+                user_id = rng.randint(1, args.users) if scope == "user" else None
+                query = rng.choice(queries)
+                async with ReadSessionLocal() as db:
+                    t0 = time.perf_counter()
+                    rows = await search_messages(db, query, user_id, 20)
+                    latencies.append(time.perf_counter() - t0)
+                hits += len(rows)
+            results[f"{kind}_{scope}"] = {
+                "queries": args.queries,
+                "avg_hits": round(hits / args.queries, 1),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            }
+
+    await close_db()
+    return {
+        "messages": args.messages,
+        "users": args.users,
+        "seed_seconds": round(seed_seconds, 1),
+        "index_seconds": round(index_seconds, 1),
+        "search": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        # settings are read at import time
+        os.environ["SQLITE_PATH"] = db_path
+        os.environ["POSTGRES_USER"] = ""
+        print(json.dumps(asyncio.run(run(args, db_path)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
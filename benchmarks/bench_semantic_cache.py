@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Semantic cache benchmark - lookup latency against index size
+
+Fills SemanticCache with random unit vectors (index contents do not affect
+the cost of a lookup) and times lookup() for random queries at each size.
+Also reports the latency of the offline HashingEmbedder for a typical
+question, since embedding is the other half of every lookup.
+
+Usage:
+    python benchmarks/bench_semantic_cache.py [--sizes 1000,10000,50000,100000] [--dim 512] [--queries 500]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.services.embeddings import Embedder, HashingEmbedder
+from app.services.semantic_cache import SemanticCache
+
+SCOPE = "0" * 64
+QUESTION = "كيف أقوم بجدولة منشور على حساب إكس الخاص بي؟"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def random_unit(rng, count, dim):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class _FixedDim(Embedder):
+    def __init__(self, dim):
+        self.dim = dim
+
+
+def bench_size(size, dim, queries, rng):
+    cache = SemanticCache(_FixedDim(dim), threshold=0.95, max_entries=size, ttl_seconds=3600)
+    for vector in random_unit(rng, size, dim):
+        cache.add(vector, SCOPE, "answer")
+
+    latencies = []
+    for vector in random_unit(rng, queries, dim):
+        started = time.perf_counter()
+        cache.lookup(vector, SCOPE)
+        latencies.append(time.perf_counter() - started)
+    return {
+        "entries": size,
+        "dim": dim,
+        "memory_mb": round(size * dim * 4 / 1e6, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def bench_hashing_embedder(queries):
+    embedder = HashingEmbedder()
+    latencies = []
+    for _ in range(queries):
+        started = time.perf_counter()
+        await embedder.embed(QUESTION)
+        latencies.append(time.perf_counter() - started)
+    return {
+        "embedder": "hashing",
+        "dim": embedder.dim,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,50000,100000")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    report = {
+        "embedding": asyncio.run(bench_hashing_embedder(args.queries)),
+        "lookup": [
+            bench_size(int(size), args.dim, args.queries, rng)
+            for size in args.sizes.split(",")
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Fake upstreams for offline load tests - OpenAI-compatible chat API and n8n webhook
+
+One local server provides both dependencies of the chat path, so the app
+can be benchmarked without network access or API keys:
+
+- POST /v1/chat/completions: waits --latency seconds (time to first token),
+  then emits --reply-tokens tokens at --tokens-per-second. Supports
+  stream=true (SSE chunks, plus a usage chunk when stream_options asks for
+  it) and plain JSON responses.
+- POST /webhook: the n8n receiver; waits --n8n-latency seconds and answers
+  200, or 500 for a --n8n-error-rate fraction of the events.
+- GET /stats: request counts, for checking what actually reached upstream.
+
+Usage:
+    python benchmarks/fake_upstreams.py [--port 9100] [--latency 0.2] [--tokens-per-second 50] [--reply-tokens 40]
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1 and
+N8N_WEBHOOK_URL=http://127.0.0.1:9100/webhook (bench_load.py does this).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def create_app(latency=0.2, tokens_per_second=50.0, reply_tokens=40, n8n_latency=0.02, n8n_error_rate=0.0):
+    app = FastAPI()
+    stats = {"completions": 0, "streams": 0, "tokens": 0, "webhooks": 0, "webhook_errors": 0}
+    token_delay = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+
+    def prompt_tokens(messages):
+        return sum(len(str(m.get("content", "")).split()) + 4 for m in messages)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        tokens = min(reply_tokens, body.get("max_tokens") or reply_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens(body.get("messages", [])),
+            "completion_tokens": tokens,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + tokens
+        stats["tokens"] += tokens
+
+        if not body.get("stream"):
+            stats["completions"] += 1
+            await asyncio.sleep(latency + tokens * token_delay)
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(f"tok{i}" for i in range(tokens))},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        stats["streams"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta, finish_reason=None):
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }) + "\n\n"
+
+        async def events():
+            await asyncio.sleep(latency)
+            yield chunk({"role": "assistant", "content": ""})
+            for i in range(tokens):
+                if i and token_delay:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"content": f"tok{i} " if i < tokens - 1 else f"tok{i}"})
+            yield chunk({}, "stop")
+            if include_usage:
+                yield "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/webhook")
+    async def webhook(request: Request):
+        await request.body()
+        await asyncio.sleep(n8n_latency)
+        if n8n_error_rate and random.random() < n8n_error_rate:
+            stats["webhook_errors"] += 1
+            return JSONResponse({"error": "fake failure"}, status_code=500)
+        stats["webhooks"] += 1
+        return {"ok": True}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--n8n-latency", type=float, default=0.02)
+    parser.add_argument("--n8n-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(
+        create_app(args.latency, args.tokens_per_second, args.reply_tokens, args.n8n_latency, args.n8n_error_rate),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,20 +7,32 @@ import Sidebar from './Sidebar'
 import MessageList from './MessageList'
 import MessageInput from './MessageInput'
 
+const API_URL = 'http://localhost:8000'
+const WELCOME_MESSAGE = 'مرحباً! أنا مساعدك الذكي في MOJ AI. يمكنني مساعدتك في إدارة وسائل التواصل الاجتماعي، التحليلات، والأتمتة. كيف يمكنني مساعدتك اليوم؟'
+
+const newSessionId = () => (
+  window.crypto?.randomUUID ? window.crypto.randomUUID().replace(/-/g, '') : `${Date.now()}${Math.random().toString(16).slice(2)}`
+)
+
 const ChatInterface = ({ darkMode, setDarkMode, user, onLogout }) => {
   const [messages, setMessages] = useState([
     {
       id: 1,
       type: 'assistant',
-      content: 'مرحباً! أنا مساعدك الذكي في MOJ AI. يمكنني مساعدتك في إدارة وسائل التواصل الاجتماعي، التحليلات، والأتمتة. كيف يمكنني مساعدتك اليوم؟',
+      content: WELCOME_MESSAGE,
       timestamp: new Date().toISOString()
     }
   ])
+  const [sessionId, setSessionId] = useState(newSessionId)
+  const [historyVersion, setHistoryVersion] = useState(0)
   const [inputValue, setInputValue] = useState('')
   const [isTyping, setIsTyping] = useState(false)
+  const [isGenerating, setIsGenerating] = useState(false)
+  const [queuePosition, setQueuePosition] = useState(null)
   const [ws, setWs] = useState(null)
   const [isConnected, setIsConnected] = useState(false)
   const messagesEndRef = useRef(null)
+  const streamingIdRef = useRef(null)
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
@@ -41,7 +53,9 @@ const ChatInterface = ({ darkMode, setDarkMode, user, onLogout }) => {
 
   const connectWebSocket = () => {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
-    const wsUrl = `${protocol}//${window.location.hostname}:8000/ws/chat`
+    const token = localStorage.getItem('token')
+    const query = token ? `?token=${encodeURIComponent(token)}` : ''
+    const wsUrl = `${protocol}//${window.location.hostname}:8000/ws/chat${query}`
     
     const websocket = new WebSocket(wsUrl)
     
@@ -62,6 +76,8 @@ const ChatInterface = ({ darkMode, setDarkMode, user, onLogout }) => {
     websocket.onclose = () => {
       console.log('WebSocket disconnected')
       setIsConnected(false)
+      setIsGenerating(false)
+      streamingIdRef.current = null
       setTimeout(connectWebSocket, 3000)
     }
     
@@ -71,14 +87,73 @@ const ChatInterface = ({ darkMode, setDarkMode, user, onLogout }) => {
   const handleWebSocketMessage = (data) => {
     if (data.type === 'typing') {
       setIsTyping(data.status)
+      if (!data.status) setQueuePosition(null)
+    } else if (data.type === 'queue_position') {
+      setQueuePosition(data.position)
     } else if (data.type === 'assistant_message') {
+      setIsGenerating(false)
+      setMessages(prev => [...prev, {
+        id: Date.now(),
+        type: 'assistant',
+        content: data.message,
+        timestamp: data.timestamp
+      }])
+    } else if (data.type === 'assistant_delta') {
+      if (streamingIdRef.current === null) {
+        const id = Date.now()
+        streamingIdRef.current = id
+        setMessages(prev => [...prev, {
+          id,
+          type: 'assistant',
+          content: data.delta,
+          timestamp: new Date().toISOString()
+        }])
+      } else {
+        const id = streamingIdRef.current
+        setMessages(prev => prev.map(msg =>
+          msg.id === id ? { ...msg, content: msg.content + data.delta } : msg
+        ))
+      }
+    } else if (data.type === 'assistant_done') {
+      const id = streamingIdRef.current
+      streamingIdRef.current = null
+      setIsGenerating(false)
+      setHistoryVersion(v => v + 1)
+      if (id === null) {
+        setMessages(prev => [...prev, {
+          id: Date.now(),
+          type: 'assistant',
+          content: data.message,
+          timestamp: data.timestamp
+        }])
+      } else {
+        setMessages(prev => prev.map(msg =>
+          msg.id === id ? { ...msg, content: data.message, timestamp: data.timestamp } : msg
+        ))
+      }
+    } else if (data.type === 'notification') {
       setMessages(prev => [...prev, {
         id: Date.now(),
         type: 'assistant',
         content: data.message,
         timestamp: data.timestamp
       }])
+    } else if (data.type === 'assistant_cancelled') {
+      // الجزء الذي وصل قبل الإيقاف يبقى ظاهراً
+      streamingIdRef.current = null
+      setIsTyping(false)
+      setIsGenerating(false)
+    } else if (data.type === 'rate_limited') {
+      setIsGenerating(false)
+      setMessages(prev => [...prev, {
+        id: Date.now(),
+        type: 'error',
+        content: data.message,
+        timestamp: data.timestamp
+      }])
     } else if (data.type === 'error') {
+      streamingIdRef.current = null
+      setIsGenerating(false)
       setMessages(prev => [...prev, {
         id: Date.now(),
         type: 'error',
@@ -101,26 +176,64 @@ const ChatInterface = ({ darkMode, setDarkMode, user, onLogout }) => {
     setMessages(prev => [...prev, newMessage])
     
     if (ws && ws.readyState === WebSocket.OPEN) {
-      ws.send(JSON.stringify({ message: inputValue }))
+      ws.send(JSON.stringify({ message: inputValue, session_id: sessionId }))
+      setIsGenerating(true)
     }
 
     setInputValue('')
   }
 
+  const handleStopGenerating = () => {
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify({ type: 'cancel', session_id: sessionId }))
+    }
+  }
+
   const handleNewChat = () => {
-    if (window.confirm('هل تريد بدء محادثة جديدة؟ سيتم حذف المحادثة الحالية.')) {
+    if (window.confirm('هل تريد بدء محادثة جديدة؟ ستبقى المحادثة الحالية في السجل.')) {
+      setSessionId(newSessionId())
       setMessages([{
         id: Date.now(),
         type: 'assistant',
-        content: 'مرحباً! أنا مساعدك الذكي في MOJ AI. يمكنني مساعدتك في إدارة وسائل التواصل الاجتماعي، التحليلات، والأتمتة. كيف يمكنني مساعدتك اليوم؟',
+        content: WELCOME_MESSAGE,
         timestamp: new Date().toISOString()
       }])
     }
   }
 
+  const handleSelectConversation = async (conversation) => {
+    try {
+      const response = await axios.get(`${API_URL}/api/conversations/${conversation.id}/messages`, {
+        params: { limit: 100 },
+        headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
+      })
+      handleStopGenerating()
+      streamingIdRef.current = null
+      setIsTyping(false)
+      setIsGenerating(false)
+      setSessionId(conversation.session_id)
+      setMessages(response.data.items.map(msg => ({
+        id: `db-${msg.id}`,
+        type: msg.role,
+        content: msg.content,
+        timestamp: msg.created_at
+      })))
+    } catch (err) {
+      console.error('Failed to load conversation:', err)
+    }
+  }
+
   return (
     <div className="flex h-screen w-full overflow-hidden">
-      <Sidebar darkMode={darkMode} setDarkMode={setDarkMode} user={user} onLogout={onLogout} />
+      <Sidebar
+        darkMode={darkMode}
+        setDarkMode={setDarkMode}
+        user={user}
+        onLogout={onLogout}
+        activeSessionId={sessionId}
+        historyVersion={historyVersion}
+        onSelectConversation={handleSelectConversation}
+      />
       
       <main className="flex-1 flex flex-col h-full bg-gradient-to-br from-gray-50 via-white to-gray-50 dark:from-gray-900 dark:via-background-dark dark:to-gray-900 relative">
         {/* Header */}
@@ -153,6 +266,7 @@ const ChatInterface = ({ darkMode, setDarkMode, user, onLogout }) => {
         <MessageList 
           messages={messages} 
           isTyping={isTyping}
+          queuePosition={queuePosition}
           messagesEndRef={messagesEndRef}
         />
 
@@ -161,6 +275,8 @@ const ChatInterface = ({ darkMode, setDarkMode, user, onLogout }) => {
           inputValue={inputValue}
           setInputValue={setInputValue}
           handleSendMessage={handleSendMessage}
+          handleStopGenerating={handleStopGenerating}
+          isGenerating={isGenerating}
           isConnected={isConnected}
         />
       </main>
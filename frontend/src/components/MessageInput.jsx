@@ -1,6 +1,6 @@
-import { FiSend, FiPlus } from 'react-icons/fi'
+import { FiSend, FiPlus, FiSquare } from 'react-icons/fi'
 
-const MessageInput = ({ inputValue, setInputValue, handleSendMessage, isConnected }) => {
+const MessageInput = ({ inputValue, setInputValue, handleSendMessage, handleStopGenerating, isGenerating, isConnected }) => {
   const handleKeyPress = (e) => {
     if (e.key === 'Enter' && !e.shiftKey) {
       e.preventDefault()
@@ -24,6 +24,15 @@ const MessageInput = ({ inputValue, setInputValue, handleSendMessage, isConnecte
             rows="1"
             style={{ minHeight: '48px' }}
           />
+          {isGenerating && !inputValue.trim() ? (
+          <button
+            onClick={handleStopGenerating}
+            title="إيقاف التوليد"
+            className="p-3 mb-0.5 rounded-xl transition-all duration-300 shrink-0 shadow-md bg-gray-800 dark:bg-gray-200 text-white dark:text-gray-900 hover:scale-105 active:scale-95"
+          >
+            <FiSquare size={20} />
+          </button>
+          ) : (
           <button
             onClick={handleSendMessage}
             disabled={!inputValue.trim() || !isConnected}
@@ -35,6 +44,7 @@ const MessageInput = ({ inputValue, setInputValue, handleSendMessage, isConnecte
           >
             <FiSend size={20} className={inputValue.trim() && isConnected ? 'animate-pulse' : ''} />
           </button>
+          )}
         </div>
         <div className="text-center mt-3">
           <p className="text-xs text-gray-400 dark:text-gray-500 font-medium">
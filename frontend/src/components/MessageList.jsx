@@ -1,7 +1,7 @@
 import Message from './Message'
 import TypingIndicator from './TypingIndicator'
 
-const MessageList = ({ messages, isTyping, messagesEndRef }) => {
+const MessageList = ({ messages, isTyping, queuePosition, messagesEndRef }) => {
   return (
     <div className="flex-1 overflow-y-auto w-full p-4 md:p-6 pb-2">
       <div className="flex flex-col w-full max-w-[900px] mx-auto">
@@ -21,7 +21,7 @@ const MessageList = ({ messages, isTyping, messagesEndRef }) => {
               {messages.map((message) => (
                 <Message key={message.id} message={message} />
               ))}
-              {isTyping && <TypingIndicator />}
+              {isTyping && <TypingIndicator queuePosition={queuePosition} />}
             </>
           )}
           <div ref={messagesEndRef} />
@@ -1,10 +1,36 @@
 import { MdDashboard, MdSettings, MdPerson, MdLogout } from 'react-icons/md'
-import { BsListUl, BsFileText } from 'react-icons/bs'
+import { BsListUl, BsFileText, BsChatLeftText } from 'react-icons/bs'
 import { FiSun, FiMoon } from 'react-icons/fi'
+import { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
+import axios from 'axios'
 
-const Sidebar = ({ darkMode, setDarkMode, user, onLogout }) => {
+const API_URL = 'http://localhost:8000'
+
+const Sidebar = ({ darkMode, setDarkMode, user, onLogout, activeSessionId, historyVersion, onSelectConversation }) => {
   const navigate = useNavigate()
+  const [conversations, setConversations] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+
+  const fetchConversations = async (cursor = null) => {
+    const token = localStorage.getItem('token')
+    if (!token) return
+    try {
+      const response = await axios.get(`${API_URL}/api/conversations`, {
+        params: cursor ? { limit: 20, cursor } : { limit: 20 },
+        headers: { Authorization: `Bearer ${token}` }
+      })
+      setConversations(prev => cursor ? [...prev, ...response.data.items] : response.data.items)
+      setNextCursor(response.data.next_cursor)
+    } catch (err) {
+      console.error('Failed to load conversations:', err)
+    }
+  }
+
+  // يتم تحديث القائمة بعد كل رد (historyVersion)
+  useEffect(() => {
+    fetchConversations()
+  }, [historyVersion])
 
   const handleLogout = () => {
     if (window.confirm('هل أنت متأكد من تسجيل الخروج؟')) {
@@ -33,6 +59,36 @@ const Sidebar = ({ darkMode, setDarkMode, user, onLogout }) => {
             <BsFileText className="text-gray-500 group-hover:text-gray-700 dark:text-gray-400 dark:group-hover:text-gray-200" size={20} />
             <span className="text-sm font-medium text-gray-700 dark:text-gray-300 group-hover:text-gray-900 dark:group-hover:text-white">ملخص</span>
           </button>
+
+          {conversations.length > 0 && (
+            <div className="mt-4 flex flex-col gap-1">
+              <span className="px-3 pb-1 text-xs font-semibold text-gray-500 dark:text-gray-400">المحادثات السابقة</span>
+              {conversations.map(conversation => (
+                <button
+                  key={conversation.id}
+                  onClick={() => onSelectConversation(conversation)}
+                  className={`flex items-center gap-3 px-3 py-2 rounded-lg transition-colors text-left group ${
+                    conversation.session_id === activeSessionId
+                      ? 'bg-gray-100 dark:bg-gray-800'
+                      : 'hover:bg-gray-100 dark:hover:bg-gray-800'
+                  }`}
+                >
+                  <BsChatLeftText className="text-gray-500 shrink-0 group-hover:text-gray-700 dark:text-gray-400 dark:group-hover:text-gray-200" size={16} />
+                  <span className="text-sm text-gray-700 dark:text-gray-300 truncate group-hover:text-gray-900 dark:group-hover:text-white">
+                    {conversation.title || 'محادثة بدون عنوان'}
+                  </span>
+                </button>
+              ))}
+              {nextCursor && (
+                <button
+                  onClick={() => fetchConversations(nextCursor)}
+                  className="px-3 py-2 text-xs font-medium text-primary hover:underline text-left"
+                >
+                  عرض المزيد
+                </button>
+              )}
+            </div>
+          )}
         </div>
 
         <div className="mt-auto border-t border-gray-200 dark:border-gray-800 pt-4 flex flex-col gap-1">
@@ -1,4 +1,4 @@
-const TypingIndicator = () => {
+const TypingIndicator = ({ queuePosition }) => {
   return (
     <div className="group flex gap-4 md:gap-6 py-6 border-b border-transparent rounded-xl px-2 message-enter">
       <div className="shrink-0 flex flex-col items-center">
@@ -9,6 +9,9 @@ const TypingIndicator = () => {
       <div className="flex flex-col gap-2 w-full min-w-0">
         <div className="flex items-center gap-2">
           <span className="text-sm font-semibold text-gray-900 dark:text-white">المساعد</span>
+          {queuePosition && (
+            <span className="text-xs text-gray-400">في الانتظار - دورك رقم {queuePosition}</span>
+          )}
         </div>
         <div className="flex gap-1 py-2">
           <span className="w-2 h-2 bg-primary rounded-full typing-dot"></span>
@@ -38,10 +38,21 @@ if __name__ == "__main__":
     print("تأكد من إضافة OPENAI_API_KEY في ملف .env")
     print("=" * 60)
     
+    from app.core.config import settings
+    
+    # reload يعمل مع عملية واحدة فقط؛ مع عدة عمليات يجب تفعيل REALTIME_REDIS_ENABLED
+    # حتى تصل إشعارات n8n والبث لاتصالات WebSocket على أي عملية
+    workers = max(1, settings.WORKERS)
+    if workers > 1:
+        print(f"Workers: {workers}")
+        if not settings.REALTIME_REDIS_ENABLED:
+            print("تحذير: REALTIME_REDIS_ENABLED=False - الإشعارات ستصل فقط للاتصالات على نفس العملية")
+    
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=workers == 1,
+        workers=workers,
         log_level="info"
     )
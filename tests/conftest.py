@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Settings are read at import time: keep tests offline and out of data/
+_tmp = tempfile.mkdtemp(prefix="moj-tests-")
+os.environ.setdefault("SQLITE_PATH", str(Path(_tmp) / "test.db"))
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-" + "x" * 32)
+os.environ.setdefault("N8N_OUTBOX_PATH", str(Path(_tmp) / "n8n_outbox.jsonl"))
+os.environ.setdefault("TRACING_ENABLED", "False")
+os.environ.setdefault("CONVERSATION_REDIS_ENABLED", "False")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "False")
+os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "False")
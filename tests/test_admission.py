@@ -0,0 +1,275 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.ai_service import AIService
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_admitted_round_robin_by_key():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5, position_interval=0)
+        await controller.acquire("holder")
+        admitted = []
+
+        async def wait_in_line(key, name):
+            await controller.acquire(key)
+            admitted.append(name)
+
+        tasks = []
+        for key, name in (("A", "A0"), ("A", "A1"), ("A", "A2"), ("B", "B0")):
+            tasks.append(asyncio.create_task(wait_in_line(key, name)))
+            await settle()
+
+        order = []
+        for _ in tasks:
+            controller.release()
+            await settle()
+            order.append(list(admitted))
+        await asyncio.gather(*tasks)
+        return order, controller.get_stats()
+
+    order, stats = asyncio.run(scenario())
+
+    # one admission per released slot, and B does not wait behind all of A
+    assert order == [["A0"], ["A0", "B0"], ["A0", "B0", "A1"], ["A0", "B0", "A1", "A2"]]
+    assert stats["queued"] == 0
+    assert stats["waited"] == 4
+
+
+def test_position_callback_reports_changes():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5, position_interval=0)
+        await controller.acquire("holder")
+        positions = {"A0": [], "A1": [], "B0": []}
+
+        def reporter(name):
+            async def on_position(position):
+                positions[name].append(position)
+            return on_position
+
+        tasks = []
+        for key, name in (("A", "A0"), ("A", "A1"), ("B", "B0")):
+            tasks.append(asyncio.create_task(controller.acquire(key, on_position=reporter(name))))
+            await settle()
+
+        controller.release()  # A0 admitted, B0 moves to the front
+        await settle()
+        controller.release()  # B0 admitted
+        await settle()
+        controller.release()  # A1 admitted
+        await asyncio.gather(*tasks)
+        return positions
+
+    positions = asyncio.run(scenario())
+
+    assert positions["A0"] == [1]
+    assert positions["B0"] == [2, 1]
+    # A1 drops back when B0 joins (round-robin), then moves up as others are admitted
+    assert positions["A1"] == [2, 3, 2, 1]
+
+
+def test_waiter_is_shed_after_queue_timeout():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=0.05, position_interval=0)
+        await controller.acquire("holder")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("C")
+        return rejected.value, controller.get_stats()
+
+    rejected, stats = asyncio.run(scenario())
+
+    assert rejected.reason == "queue timeout"
+    assert rejected.retry_after == 0.05
+    assert stats["shed"] == 1
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 1
+
+
+def test_request_is_shed_when_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5, position_interval=0)
+        await controller.acquire("holder")
+        waiting = asyncio.create_task(controller.acquire("A"))
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("B")
+        controller.release()
+        await waiting
+        return rejected.value, controller.get_stats()
+
+    rejected, stats = asyncio.run(scenario())
+
+    assert rejected.reason == "queue full"
+    assert stats["shed"] == 1
+    assert stats["in_flight"] == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5, position_interval=0)
+        await controller.acquire("holder")
+        waiting = asyncio.create_task(controller.acquire("A"))
+        await settle()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        queued = controller.get_stats()["queued"]
+        controller.release()
+        return queued, controller.get_stats()
+
+    queued, stats = asyncio.run(scenario())
+
+    assert queued == 0
+    assert stats["in_flight"] == 0
+
+
+def test_waiter_cancelled_as_it_is_admitted_releases_its_slot():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5, position_interval=0)
+        await controller.acquire("holder")
+
+        async def slow_position_report(position):
+            await asyncio.Event().wait()
+
+        waiting = asyncio.create_task(controller.acquire("A", on_position=slow_position_report))
+        await settle()
+        controller.release()  # the slot goes to A while it is still reporting its position
+        in_flight = controller.in_flight
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return in_flight, controller.get_stats()
+
+    in_flight, stats = asyncio.run(scenario())
+
+    assert in_flight == 1
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+
+
+def test_failing_position_callback_does_not_abort_the_wait():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5, position_interval=0)
+        await controller.acquire("holder")
+        calls = []
+
+        async def closed_socket(position):
+            calls.append(position)
+            raise RuntimeError("websocket is closed")
+
+        waiting = asyncio.create_task(controller.acquire("A", on_position=closed_socket))
+        await settle()
+        controller.release()
+        await waiting
+        return calls, controller.get_stats()
+
+    calls, stats = asyncio.run(scenario())
+
+    assert calls == [1]  # reporting stops after the first failure
+    assert stats["in_flight"] == 1
+    assert stats["shed"] == 0
+
+
+def test_coalesced_followers_survive_the_leaders_position_callback_failing(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(settings, "LLM_COALESCE_ENABLED", True)
+    service = AIService()
+    service.router.primary.latency = 0
+
+    async def scenario():
+        service.admission = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5, position_interval=0)
+        await service.admission.acquire("holder")
+        follower_positions = []
+
+        async def leader_socket_closed(position):
+            raise RuntimeError("websocket is closed")
+
+        async def follower_socket(position):
+            follower_positions.append(position)
+
+        leader = asyncio.create_task(service.get_response(
+            "same question", session_id="leader", on_queue_position=leader_socket_closed))
+        await settle()
+        follower = asyncio.create_task(service.get_response(
+            "same question", session_id="follower", on_queue_position=follower_socket))
+        await settle()
+        service.admission.release()
+        return await leader, await follower, follower_positions, service.inflight.get_stats()
+
+    leader, follower, follower_positions, stats = asyncio.run(scenario())
+    assert service._position_fanouts == {}
+
+    assert leader == follower == "رد تجريبي على: same question"
+    assert stats["upstream_calls"] == 1
+    assert stats["coalesced"] == 1
+    assert follower_positions == [1]
+
+
+def test_far_waiters_are_only_woken_for_significant_moves():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1000, queue_timeout=5, position_interval=0)
+        await controller.acquire("holder")
+        reports = []
+
+        def reporter(index):
+            async def on_position(position):
+                reports.append((index, position))
+            return on_position
+
+        waiters = 200
+        tasks = []
+        for index in range(waiters):
+            tasks.append(asyncio.create_task(controller.acquire(f"user{index}", on_position=reporter(index))))
+        await settle()
+        for _ in range(waiters):
+            controller.release()
+            await settle()
+        await asyncio.gather(*tasks)
+        return reports
+
+    reports = asyncio.run(scenario())
+
+    last = [r for r in reports if r[0] == 199]
+    assert last[0] == (199, 200)
+    assert last[-1] == (199, 1)
+    assert [p for _, p in last][-10:] == list(range(10, 0, -1))
+    # every change would be ~20000 callbacks; relative steps keep it near N log N
+    assert len(reports) < 200 * 40
+
+
+def test_positions_are_computed_at_most_once_per_interval():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=100, queue_timeout=5, position_interval=60)
+        await controller.acquire("holder")
+        positions = {}
+
+        def reporter(index):
+            async def on_position(position):
+                positions.setdefault(index, []).append(position)
+            return on_position
+
+        tasks = []
+        for index in range(3):
+            tasks.append(asyncio.create_task(controller.acquire(f"user{index}", on_position=reporter(index))))
+            await settle()
+        first_pass = dict(positions)
+        controller.release()
+        await settle()
+        after_release = dict(positions)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return first_pass, after_release
+
+    first_pass, after_release = asyncio.run(scenario())
+
+    # the first pass ran at once; later changes wait for the next interval
+    assert first_pass == {0: [1]}
+    assert after_release == {0: [1]}
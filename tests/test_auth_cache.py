@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.auth import cache as auth_cache_module
+from app.auth.cache import AuthCache
+from app.auth.middleware import auth_cache, load_user_cached
+from app.auth.security import CurrentUser
+from app.core.config import settings
+from app.db.models import User
+
+
+class FakeSession:
+    """Stands in for AsyncSession: hands out the row and counts the queries"""
+
+    def __init__(self, row):
+        self.row = row
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return SimpleNamespace(scalar_one_or_none=lambda: self.row)
+
+
+def test_cached_user_is_a_plain_copy_of_the_row(monkeypatch):
+    monkeypatch.setattr(auth_cache, "enabled", True)
+    auth_cache.invalidate_user(7)
+    row = User(id=7, email="a@example.com", password_hash="hash", created_at=datetime(2024, 1, 1))
+    db = FakeSession(row)
+
+    async def scenario():
+        return await load_user_cached(7, db), await load_user_cached(7, db)
+
+    first, second = asyncio.run(scenario())
+    auth_cache.invalidate_user(7)
+
+    assert first == second == CurrentUser(id=7, email="a@example.com", created_at=datetime(2024, 1, 1))
+    assert not isinstance(first, User)
+    assert not hasattr(first, "password_hash")
+    assert db.queries == 1
+
+
+def test_missing_user_is_not_cached(monkeypatch):
+    monkeypatch.setattr(auth_cache, "enabled", True)
+    db = FakeSession(None)
+
+    async def scenario():
+        return await load_user_cached(404, db), await load_user_cached(404, db)
+
+    assert asyncio.run(scenario()) == (None, None)
+    assert db.queries == 2
+
+
+def test_revocation_listener_backs_off_without_redis(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_CACHE_ENABLED", True)
+    delays = []
+
+    def unreachable():
+        raise ConnectionError("redis is down")
+
+    async def record_sleep(delay):
+        delays.append(delay)
+        if len(delays) == 8:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(auth_cache_module.RedisClient, "get_client", staticmethod(unreachable))
+    monkeypatch.setattr(auth_cache_module.asyncio, "sleep", record_sleep)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(AuthCache()._listen())
+
+    assert delays == [1, 2, 4, 8, 16, 32, 60, 60]
@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.embeddings import OpenAIEmbedder
+from app.services.semantic_cache import SemanticCache
+
+
+class FakeEmbeddings:
+    """Returns a vector of `size` dimensions and records the request"""
+
+    def __init__(self, size):
+        self.size = size
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        size = kwargs.get("dimensions", self.size)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0] * size)])
+
+
+def client_returning(size):
+    return SimpleNamespace(embeddings=FakeEmbeddings(size))
+
+
+def test_embedding_3_models_are_asked_for_the_configured_dimension():
+    client = client_returning(1536)
+    embedder = OpenAIEmbedder(client, model="text-embedding-3-large", dim=256)
+
+    vector = asyncio.run(embedder.embed("مرحبا"))
+
+    assert vector.shape == (256,)
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert client.embeddings.requests[0]["dimensions"] == 256
+
+
+def test_dimension_mismatch_is_reported_not_broadcast():
+    client = client_returning(1536)
+    embedder = OpenAIEmbedder(client, model="text-embedding-ada-002", dim=3072)
+
+    with pytest.raises(ValueError, match="SEMANTIC_CACHE_EMBEDDING_DIM=1536"):
+        asyncio.run(embedder.embed("hello"))
+    assert "dimensions" not in client.embeddings.requests[0]
+
+    cache = SemanticCache(embedder, max_entries=4)
+    assert asyncio.run(cache.embed("hello")) is None
+    assert cache.get_stats()["embed_errors"] == 1
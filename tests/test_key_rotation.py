@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from jose import jwt
+
+from app.auth import security
+from app.auth.keys import KeyRing, load_or_create_secret
+from app.auth.security import create_access_token, decode_token
+from app.core.config import settings
+
+
+def ring(monkeypatch, kid, secret, previous=""):
+    monkeypatch.setattr(settings, "JWT_ALGORITHM", "HS256")
+    monkeypatch.setattr(settings, "JWT_KEY_ID", kid)
+    monkeypatch.setattr(settings, "JWT_SECRET_KEY", secret)
+    monkeypatch.setattr(settings, "JWT_PREVIOUS_KEYS", previous)
+    return KeyRing.from_settings()
+
+
+def issue(monkeypatch, key_ring):
+    monkeypatch.setattr(security, "key_ring", key_ring)
+    return create_access_token({"sub": "7", "email": "a@example.com"})
+
+
+def test_tokens_of_the_previous_key_stay_valid_after_rotation(monkeypatch):
+    old_token = issue(monkeypatch, ring(monkeypatch, "k1", "old-secret-" + "x" * 32))
+
+    rotated = ring(monkeypatch, "k2", "new-secret-" + "y" * 32, previous="k1:HS256:old-secret-" + "x" * 32)
+    new_token = issue(monkeypatch, rotated)
+
+    assert jwt.get_unverified_header(new_token)["kid"] == "k2"
+    assert decode_token(old_token).user_id == 7
+    assert decode_token(new_token).user_id == 7
+
+
+def test_tokens_of_a_retired_key_are_rejected(monkeypatch):
+    old_token = issue(monkeypatch, ring(monkeypatch, "k1", "old-secret-" + "x" * 32))
+
+    issue(monkeypatch, ring(monkeypatch, "k2", "new-secret-" + "y" * 32))
+
+    assert decode_token(old_token) is None
+
+
+def test_token_signed_with_another_secret_under_a_known_kid_is_rejected(monkeypatch):
+    forged = issue(monkeypatch, ring(monkeypatch, "k1", "attacker-" + "z" * 32))
+
+    issue(monkeypatch, ring(monkeypatch, "k1", "real-secret-" + "x" * 32))
+
+    assert decode_token(forged) is None
+
+
+def test_symmetric_keys_are_not_published(monkeypatch):
+    key_ring = ring(monkeypatch, "k2", "new-secret-" + "y" * 32, previous="k1:HS256:old-secret-" + "x" * 32)
+
+    assert key_ring.jwks() == {"keys": []}
+
+
+def test_workers_starting_together_share_one_generated_secret(tmp_path):
+    path = tmp_path / "jwt_secret.key"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        secrets = set(pool.map(lambda _: load_or_create_secret(path), range(8)))
+
+    assert len(secrets) == 1
+    assert secrets == {path.read_text(encoding="utf-8").strip()}
+    assert list(tmp_path.iterdir()) == [path]
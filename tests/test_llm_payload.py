@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services.ai_service import AIService, SYSTEM_PROMPT
+from app.services.llm_providers import LLMProvider, estimate_tokens
+from app.services.llm_router import build_router
+
+
+def completion(content):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": settings.OPENAI_MODEL,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    }
+
+
+def service_with_transport(monkeypatch, handler):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "openai")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "OPENAI_FALLBACK_MODEL", None)
+    service = AIService()
+    service.client = AsyncOpenAI(
+        api_key="test-key",
+        base_url="http://llm.test/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    service.router = build_router(service.client)
+    return service
+
+
+def test_get_response_sends_only_standard_message_fields(monkeypatch):
+    sent = []
+
+    def handler(request):
+        sent.append(json.loads(request.content))
+        return httpx.Response(200, json=completion("hi there"))
+
+    service = service_with_transport(monkeypatch, handler)
+
+    async def run():
+        first = await service.get_response("hello", session_id="s1")
+        second = await service.get_response("and again", session_id="s1")
+        return first, second
+
+    assert asyncio.run(run()) == ("hi there", "hi there")
+    assert sent[0]["messages"] == [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "hello"},
+    ]
+    assert sent[1]["messages"] == [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi there"},
+        {"role": "user", "content": "and again"},
+    ]
+
+
+def test_estimate_tokens_does_not_modify_messages():
+    messages = [{"role": "system", "content": "system prompt"}, {"role": "user", "content": "hello"}]
+    assert estimate_tokens(messages, max_tokens=100) > 100
+    assert messages == [{"role": "system", "content": "system prompt"}, {"role": "user", "content": "hello"}]
+
+
+def test_incomplete_provider_fails_at_construction():
+    class NoStream(LLMProvider):
+        async def complete(self, messages, max_tokens, temperature):
+            return None
+
+    with pytest.raises(TypeError):
+        NoStream("incomplete", "model", max_concurrency=1)
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth.security import CurrentUser
+from app.conversations.pagination import decode_cursor, encode_cursor
+from app.conversations.routes import list_conversations, list_messages
+from app.db.database import SessionLocal, close_db, init_db
+from app.db.models import Conversation, Message, User
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 6, 7, 8, 9, 123456)
+
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor(START, 1)[:-3]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+async def seed_user(email):
+    await init_db()
+    async with SessionLocal() as db:
+        user = User(email=email, password_hash="x", created_at=START)
+        db.add(user)
+        await db.commit()
+        return CurrentUser.from_row(user)
+
+
+async def pages(fetch, limit):
+    """Follow next_cursor until the last page; returns the ids of each page"""
+    result, cursor = [], None
+    while True:
+        async with SessionLocal() as db:
+            page = await fetch(limit, cursor, db)
+        result.append([item.id for item in page.items])
+        cursor = page.next_cursor
+        if cursor is None:
+            return result
+
+
+def test_conversations_page_by_update_time_with_ties_broken_by_id():
+    async def scenario():
+        user = await seed_user("pages@pagination.test")
+        async with SessionLocal() as db:
+            # two pairs share an updated_at, so the cursor must also compare ids
+            times = [START, START, START + timedelta(minutes=1), START + timedelta(minutes=1), START + timedelta(minutes=2)]
+            conversations = [
+                Conversation(user_id=user.id, session_id=f"pages-{n}", updated_at=t, created_at=START)
+                for n, t in enumerate(times)
+            ]
+            db.add_all(conversations)
+            await db.commit()
+            ids = [c.id for c in conversations]
+
+        async def fetch(limit, cursor, db):
+            return await list_conversations(limit=limit, cursor=cursor, current_user=user, db=db)
+
+        try:
+            return ids, await pages(fetch, 2)
+        finally:
+            await close_db()
+
+    ids, result = asyncio.run(scenario())
+
+    assert result == [[ids[4], ids[3]], [ids[2], ids[1]], [ids[0]]]
+
+
+def test_messages_page_backwards_in_chronological_order():
+    async def scenario():
+        user = await seed_user("messages@pagination.test")
+        async with SessionLocal() as db:
+            conversation = Conversation(user_id=user.id, session_id="messages-1")
+            db.add(conversation)
+            await db.flush()
+            messages = [
+                Message(conversation_id=conversation.id, role="user", content=str(n),
+                        created_at=START + timedelta(seconds=n))
+                for n in range(5)
+            ]
+            db.add_all(messages)
+            await db.commit()
+            conversation_id, ids = conversation.id, [m.id for m in messages]
+
+        async def fetch(limit, cursor, db):
+            return await list_messages(conversation_id, limit=limit, before=cursor, current_user=user, db=db)
+
+        try:
+            return ids, await pages(fetch, 2)
+        finally:
+            await close_db()
+
+    ids, result = asyncio.run(scenario())
+
+    assert result == [[ids[3], ids[4]], [ids[1], ids[2]], [ids[0]]]
+
+
+def test_other_users_conversation_is_not_found():
+    async def scenario():
+        owner = await seed_user("owner@pagination.test")
+        stranger = await seed_user("stranger@pagination.test")
+        async with SessionLocal() as db:
+            conversation = Conversation(user_id=owner.id, session_id="private-1")
+            db.add(conversation)
+            await db.commit()
+            try:
+                await list_messages(conversation.id, limit=10, before=None, current_user=stranger, db=db)
+            finally:
+                await close_db()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+
+    assert error.value.status_code == 404
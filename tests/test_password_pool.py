@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.auth import security
+from app.core.config import settings
+
+
+def jobs_gauge():
+    return REGISTRY.get_sample_value("password_jobs_in_flight")
+
+
+def test_hash_and_verify_run_on_the_worker_pool(monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    threads = []
+    hash_password = security.hash_password
+
+    def recording_hash(password):
+        threads.append(threading.current_thread().name)
+        return hash_password(password)
+
+    monkeypatch.setattr(security, "hash_password", recording_hash)
+
+    async def scenario():
+        hashed = await security.hash_password_async("secret")
+        return (
+            hashed,
+            await security.verify_password_async("secret", hashed),
+            await security.verify_password_async("wrong", hashed),
+        )
+
+    hashed, right, wrong = asyncio.run(scenario())
+
+    assert hashed.startswith("$2b$04$")
+    assert right is True
+    assert wrong is False
+    assert threads and threads[0].startswith("bcrypt")
+    assert security._password_jobs == 0
+    assert jobs_gauge() == 0
+
+
+def test_jobs_are_counted_while_queued_and_shed_when_full(monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_WORKERS", 1)
+    monkeypatch.setattr(settings, "BCRYPT_MAX_QUEUE", 1)
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bcrypt")
+    monkeypatch.setattr(security, "_password_executor", executor)
+    release = asyncio.Event()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+
+        def blocking_job():
+            loop.call_soon_threadsafe(started.set)
+            asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+            return "done"
+
+        first = asyncio.create_task(security._run_password_job(blocking_job))
+        second = asyncio.create_task(security._run_password_job(lambda: "queued"))
+        await started.wait()
+        # one job holds the thread, the other waits for it: both are counted
+        in_flight = (security._password_jobs, jobs_gauge())
+        with pytest.raises(security.PasswordHasherOverloaded):
+            await security._run_password_job(lambda: "shed")
+        release.set()
+        return in_flight, await first, await second
+
+    in_flight, first, second = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert in_flight == (2, 2)
+    assert (first, second) == ("done", "queued")
+    assert security._password_jobs == 0
+    assert jobs_gauge() == 0
@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import RateLimiter, RateLimitRule, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=100.0)
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_bucket_allows_a_burst_then_refills_evenly(clock):
+    bucket = TokenBucket.per_minute(6)  # one token every 10 seconds
+
+    assert all(bucket.try_acquire() for _ in range(6))
+    assert not bucket.try_acquire()
+    assert bucket.time_until() == pytest.approx(10)
+
+    clock.value += 10
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_bucket_never_refills_past_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    bucket.try_acquire(3)
+
+    clock.value += 60
+
+    assert bucket.available() == 3
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("20/minute", RateLimitRule(20, 60)),
+    ("5/s", RateLimitRule(5, 1)),
+    ("100/hours", RateLimitRule(100, 3600)),
+    ("30", RateLimitRule(30, 60)),
+    ("0", None),
+    ("", None),
+    ("off", None),
+])
+def test_rule_parsing(value, expected):
+    assert RateLimitRule.parse(value) == expected
+
+
+def test_invalid_rule_is_rejected():
+    with pytest.raises(ValueError):
+        RateLimitRule.parse("10/fortnight")
+
+
+def limiter_with_rule(monkeypatch, rule):
+    limiter = RateLimiter()
+    monkeypatch.setattr(limiter, "enabled", True)
+    monkeypatch.setattr(limiter, "use_redis", False)
+    limiter._rules["test"] = RateLimitRule.parse(rule)
+    return limiter
+
+
+def test_limiter_throttles_each_identity_separately(clock, monkeypatch):
+    limiter = limiter_with_rule(monkeypatch, "2/minute")
+
+    async def scenario():
+        return [await limiter.hit("test", identity) for identity in ("ip:a", "ip:a", "ip:a", "ip:b")]
+
+    first, second, third, other = asyncio.run(scenario())
+
+    assert first.allowed and second.allowed and other.allowed
+    assert not third.allowed
+    assert third.retry_after == pytest.approx(30)
+    assert third.headers()["Retry-After"] == "30"
+    assert limiter.get_stats()["throttled"] == 1
+
+
+def test_limiter_falls_back_to_memory_when_redis_fails(clock, monkeypatch):
+    limiter = limiter_with_rule(monkeypatch, "1/minute")
+    monkeypatch.setattr(limiter, "use_redis", True)
+
+    async def redis_down(*args):
+        return None
+
+    monkeypatch.setattr(rate_limit.RedisClient, "token_bucket", staticmethod(redis_down))
+
+    async def scenario():
+        return [await limiter.hit("test", "user:1") for _ in range(2)]
+
+    first, second = asyncio.run(scenario())
+
+    assert first.allowed
+    assert not second.allowed
+    assert limiter.redis_errors == 2
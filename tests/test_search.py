@@ -0,0 +1,66 @@
+import asyncio
+
+from app.conversations.search import index_messages, init_search_index, search_messages
+from app.core.config import settings
+from app.db.database import SessionLocal, close_db, init_db
+from app.db.models import Conversation, Message, User
+
+
+async def seed(email, contents):
+    """One user with one conversation holding `contents`, indexed like the chat log writer does"""
+    await init_db()
+    await init_search_index()
+    async with SessionLocal() as db:
+        user = User(email=email, password_hash="x")
+        db.add(user)
+        await db.flush()
+        conversation = Conversation(user_id=user.id, session_id=f"search-{email}")
+        db.add(conversation)
+        await db.flush()
+        messages = [Message(conversation_id=conversation.id, role="user", content=c) for c in contents]
+        db.add_all(messages)
+        await db.flush()
+        await index_messages(db, [(m.id, user.id, m.content) for m in messages])
+        await db.commit()
+        return user.id
+
+
+async def search(query, user_id, limit=20):
+    async with SessionLocal() as db:
+        rows = await search_messages(db, query, user_id, limit)
+    return [message.content for message, _, _ in rows]
+
+
+def test_arabic_spelling_variants_match_and_results_stay_with_their_owner():
+    async def scenario():
+        owner = await seed("owner@search.test", ["أين المَكتَبةُ العامة", "موعد الاجتماع"])
+        other = await seed("other@search.test", ["المكتبه مغلقة اليوم"])
+        try:
+            return (
+                await search("المكتبة", owner),
+                await search("الاجتم", owner),
+                sorted(await search("المكتبه", None)),
+                await search("المكتبه", other),
+            )
+        finally:
+            await close_db()
+
+    spelling, prefix, everyone, other = asyncio.run(scenario())
+
+    assert spelling == ["أين المَكتَبةُ العامة"]
+    assert prefix == ["موعد الاجتماع"]
+    assert everyone == ["أين المَكتَبةُ العامة", "المكتبه مغلقة اليوم"]
+    assert other == ["المكتبه مغلقة اليوم"]
+
+
+def test_only_the_newest_candidates_are_ranked(monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_MAX_CANDIDATES", 2)
+
+    async def scenario():
+        user_id = await seed("capped@search.test", [f"تقرير رقم {n}" for n in range(5)])
+        try:
+            return await search("تقرير", user_id)
+        finally:
+            await close_db()
+
+    assert sorted(asyncio.run(scenario())) == ["تقرير رقم 3", "تقرير رقم 4"]
@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+
+from app import main
+from app.realtime.connections import manager
+
+
+def test_same_client_session_id_is_not_shared_between_connections(monkeypatch):
+    forwarded = []
+
+    def enqueue(user_message, session_id, user_id=None, metadata=None):
+        forwarded.append(session_id)
+
+    async def no_reply(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(main.webhook_service, "enqueue_message_to_n8n", enqueue)
+    monkeypatch.setattr(main, "run_chat_turn", no_reply)
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws/chat") as owner, client.websocket_connect("/ws/chat") as intruder:
+        for websocket in (owner, intruder):
+            websocket.send_json({"message": "hi", "session_id": "shared"})
+            assert websocket.receive_json()["type"] == "user_message"
+        sessions = {key: len(sockets) for key, sockets in manager._by_session.items()}
+
+    # n8n callbacks for one connection's key cannot reach the other
+    owner_key, intruder_key = forwarded
+    assert owner_key != intruder_key
+    assert owner_key.endswith(":shared") and intruder_key.endswith(":shared")
+    assert "shared" not in sessions
+    assert sessions[owner_key] == sessions[intruder_key] == 1
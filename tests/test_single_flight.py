@@ -0,0 +1,206 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_providers import CompletionStream
+from app.services.single_flight import SingleFlight
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class SlowCall:
+    """Upstream call that blocks until released and records how it ended"""
+
+    def __init__(self, result="answer"):
+        self.result = result
+        self.calls = 0
+        self.cancelled = False
+        self.gate = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+
+def test_identical_calls_share_one_upstream_call():
+    async def scenario():
+        flights = SingleFlight()
+        call = SlowCall()
+        tasks = [asyncio.create_task(flights.run("key", call)) for _ in range(3)]
+        await settle()
+        call.gate.set()
+        return await asyncio.gather(*tasks), call, flights.get_stats()
+
+    results, call, stats = asyncio.run(scenario())
+
+    assert results == ["answer"] * 3
+    assert call.calls == 1
+    assert stats["coalesced"] == 2
+    assert stats["in_flight"] == 0
+
+
+def test_leaving_waiter_does_not_cancel_the_others():
+    async def scenario():
+        flights = SingleFlight()
+        call = SlowCall()
+        leaving = asyncio.create_task(flights.run("key", call))
+        staying = asyncio.create_task(flights.run("key", call))
+        await settle()
+        leaving.cancel()
+        await settle()
+        cancelled_early = call.cancelled
+        call.gate.set()
+        return await staying, cancelled_early, leaving.cancelled()
+
+    result, cancelled_early, left = asyncio.run(scenario())
+
+    assert result == "answer"
+    assert left
+    assert not cancelled_early
+
+
+def test_upstream_call_is_cancelled_when_every_waiter_leaves():
+    async def scenario():
+        flights = SingleFlight()
+        call = SlowCall()
+        tasks = [asyncio.create_task(flights.run("key", call)) for _ in range(2)]
+        await settle()
+        for task in tasks:
+            task.cancel()
+        await settle()
+        in_flight = flights.get_stats()["in_flight"]
+
+        # the next caller starts a fresh upstream call
+        fresh = SlowCall("fresh")
+        fresh.gate.set()
+        return call.cancelled, in_flight, await flights.run("key", fresh)
+
+    cancelled, in_flight, result = asyncio.run(scenario())
+
+    assert cancelled
+    assert in_flight == 0
+    assert result == "fresh"
+
+
+def test_stream_chunks_reach_late_subscribers_and_survive_one_leaving():
+    async def scenario():
+        flights = SingleFlight()
+        chunks: asyncio.Queue = asyncio.Queue()
+        closed = []
+
+        async def deltas():
+            try:
+                while True:
+                    chunk = await chunks.get()
+                    if chunk is None:
+                        return
+                    yield chunk
+            finally:
+                closed.append(True)
+
+        async def start():
+            return CompletionStream(deltas(), "fake-model")
+
+        first = await flights.stream("key", start)
+        chunks.put_nowait("a")
+        await settle()
+        second = await flights.stream("key", start)
+        leaving = await flights.stream("key", start)
+
+        received = {"first": [], "second": []}
+
+        async def read(name, stream):
+            async for delta in stream:
+                received[name].append(delta)
+
+        readers = [
+            asyncio.create_task(read("first", first)),
+            asyncio.create_task(read("second", second)),
+        ]
+        await settle()
+        await leaving.aclose()
+        chunks.put_nowait("b")
+        chunks.put_nowait(None)
+        await asyncio.gather(*readers)
+        return received, closed
+
+    received, closed = asyncio.run(scenario())
+
+    assert received == {"first": ["a", "b"], "second": ["a", "b"]}
+    assert closed == [True]
+
+
+def test_stream_start_error_reaches_every_subscriber():
+    async def scenario():
+        flights = SingleFlight()
+        gate = asyncio.Event()
+
+        async def start():
+            await gate.wait()
+            raise RuntimeError("provider down")
+
+        tasks = [asyncio.create_task(flights.stream("key", start)) for _ in range(2)]
+        await settle()
+        gate.set()
+        return await asyncio.gather(*tasks, return_exceptions=True), flights.get_stats()
+
+    results, stats = asyncio.run(scenario())
+
+    assert [str(r) for r in results] == ["provider down", "provider down"]
+    assert stats["upstream_calls"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_stream_is_stopped_when_every_subscriber_leaves():
+    async def scenario():
+        flights = SingleFlight()
+        stopped = asyncio.Event()
+
+        async def deltas():
+            try:
+                yield "a"
+                await asyncio.Event().wait()
+                yield "never"
+            finally:
+                stopped.set()
+
+        async def start():
+            return CompletionStream(deltas(), "fake-model")
+
+        streams = [await flights.stream("key", start) for _ in range(2)]
+        await settle()
+        for stream in streams:
+            await stream.aclose()
+        await asyncio.wait_for(stopped.wait(), 1)
+        return flights.get_stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["in_flight"] == 0
+
+
+def test_run_error_reaches_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+        gate = asyncio.Event()
+
+        async def failing():
+            await gate.wait()
+            raise ValueError("bad request")
+
+        tasks = [asyncio.create_task(flights.run("key", failing)) for _ in range(2)]
+        await settle()
+        gate.set()
+        for task in tasks:
+            with pytest.raises(ValueError):
+                await task
+
+    asyncio.run(scenario())
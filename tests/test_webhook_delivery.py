@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import httpx
+
+from app.core.config import settings
+from app.services.webhook_service import WebhookService
+
+STATUS_BY_TYPE = {"ok": 200, "bad": 400, "flaky": 500}
+
+
+def service_with_transport(monkeypatch, tmp_path, handler):
+    monkeypatch.setattr(settings, "N8N_WEBHOOK_ENABLED", True)
+    monkeypatch.setattr(settings, "N8N_WEBHOOK_URL", "http://n8n.test/webhook")
+    monkeypatch.setattr(settings, "N8N_WEBHOOK_MAX_RETRIES", 0)
+    monkeypatch.setattr(settings, "N8N_WEBHOOK_FLUSH_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "N8N_WEBHOOK_DRAIN_TIMEOUT", 0.1)
+    # one transient failure opens the circuit, so the worker pauses instead of redelivering at once
+    monkeypatch.setattr(settings, "N8N_CIRCUIT_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(settings, "N8N_OUTBOX_ENABLED", True)
+    monkeypatch.setattr(settings, "N8N_OUTBOX_PATH", tmp_path / "outbox.jsonl")
+    monkeypatch.setattr(settings, "N8N_DEAD_LETTER_PATH", tmp_path / "dead_letter.jsonl")
+    service = WebhookService()
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+def test_rejected_event_is_dead_lettered_and_transient_failure_stays_pending(monkeypatch, tmp_path):
+    posted = []
+
+    def handler(request):
+        kind = json.loads(request.content)["type"]
+        posted.append(kind)
+        return httpx.Response(STATUS_BY_TYPE[kind])
+
+    service = service_with_transport(monkeypatch, tmp_path, handler)
+
+    async def scenario():
+        service.start()
+        for kind in ("ok", "bad", "flaky"):
+            assert service.enqueue({"type": kind})
+        await asyncio.wait_for(service.queue.join(), 5)
+        pending = [payload["type"] for _, payload in service.outbox.items()]
+        await service.close()
+        return pending
+
+    pending = asyncio.run(scenario())
+
+    assert sorted(posted) == ["bad", "flaky", "ok"]  # the rejected event was not retried
+    assert pending == ["flaky"]
+    dead = [json.loads(line) for line in (tmp_path / "dead_letter.jsonl").read_text().splitlines()]
+    assert [record["payload"] for record in dead] == [{"type": "bad"}]
+    assert service.sent_count == 1
+    assert service.rejected_count == 1
+    assert service.failed_count == 1
+
+
+def test_rejected_event_is_not_replayed_after_restart(monkeypatch, tmp_path):
+    posted = []
+
+    def handler(request):
+        posted.append(json.loads(request.content)["type"])
+        return httpx.Response(422)
+
+    service = service_with_transport(monkeypatch, tmp_path, handler)
+
+    async def first_run():
+        service.start()
+        service.enqueue({"type": "bad"})
+        await asyncio.wait_for(service.queue.join(), 5)
+        await service.close()
+
+    asyncio.run(first_run())
+
+    restarted = service_with_transport(monkeypatch, tmp_path, handler)
+    restarted.outbox.open()
+    assert list(restarted.outbox.items()) == []
+    restarted.outbox.close()
+    assert posted == ["bad"]
+
+
+def test_worker_keeps_delivering_after_an_outbox_error(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "N8N_OUTBOX_REDELIVER_INTERVAL", 0.01)
+    posted = []
+
+    def handler(request):
+        posted.append(json.loads(request.content)["n"])
+        return httpx.Response(200)
+
+    service = service_with_transport(monkeypatch, tmp_path, handler)
+
+    async def scenario():
+        service.start()
+        ack = service.outbox.ack
+        failures = []
+
+        def ack_once_failing(event_id):
+            if not failures:
+                failures.append(event_id)
+                raise OSError(28, "No space left on device")
+            ack(event_id)
+
+        service.outbox.ack = ack_once_failing
+        service.enqueue({"type": "ok", "n": 1})
+        await asyncio.wait_for(service.queue.join(), 5)
+        service.enqueue({"type": "ok", "n": 2})
+        await asyncio.wait_for(service.queue.join(), 5)
+        alive = not service._worker.done()
+        await service.close()
+        return alive
+
+    alive = asyncio.run(scenario())
+
+    assert alive
+    assert 2 in posted
+    # the event whose ack failed is still pending in memory, so it may be posted again (at-least-once)
+    assert set(posted) == {1, 2}
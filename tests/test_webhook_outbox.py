@@ -0,0 +1,120 @@
+import json
+
+from app.services.webhook_outbox import WebhookOutbox
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def test_replays_unacked_events_after_restart(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    # what a crashed process leaves behind, including a half-written last line
+    write_lines(path, [
+        json.dumps({"id": 1, "payload": {"n": 1}}),
+        json.dumps({"id": 2, "payload": {"n": 2}}),
+        json.dumps({"ack": 1}),
+        json.dumps({"id": 3, "payload": {"n": 3}}),
+        '{"id": 4, "payl',
+    ])
+
+    outbox = WebhookOutbox(path)
+    outbox.open()
+    replayed = list(outbox.items())
+    next_id = outbox.append({"n": 5})
+    outbox.close()
+
+    assert replayed == [(2, {"n": 2}), (3, {"n": 3})]
+    assert next_id == 4
+    # the acked event was compacted away on open
+    assert [r.get("id") for r in read_records(path)] == [2, 3, 4]
+
+
+def test_close_keeps_pending_events_for_the_next_run(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    outbox = WebhookOutbox(path)
+    outbox.open()
+    first = outbox.append({"n": 1})
+    outbox.append({"n": 2})
+    outbox.ack(first)
+    outbox.close()
+
+    reopened = WebhookOutbox(path)
+    reopened.open()
+    pending = list(reopened.items())
+    reopened.close()
+
+    assert pending == [(2, {"n": 2})]
+
+
+def test_compaction_after_threshold_drops_acked_events(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    outbox = WebhookOutbox(path, compact_threshold=3)
+    outbox.open()
+    ids = [outbox.append({"n": n}) for n in range(5)]
+    outbox.ack(ids[0])
+    outbox.ack(ids[1])
+    before = len(read_records(path))
+    outbox.ack(ids[2])
+    after = read_records(path)
+    outbox.close()
+
+    assert before == 7  # 5 events + 2 acks, not compacted yet
+    assert after == [{"id": 4, "payload": {"n": 3}}, {"id": 5, "payload": {"n": 4}}]
+
+
+def test_workers_claim_separate_files(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    first = WebhookOutbox(path, compact_threshold=1)
+    second = WebhookOutbox(path, compact_threshold=1)
+    first.open()
+    second.open()
+
+    event = first.append({"worker": 1})
+    second.append({"worker": 2})
+    first.ack(event)  # compacts the first worker's file only
+
+    assert first.path == path
+    assert second.path == tmp_path / "outbox.1.jsonl"
+    assert read_records(path) == []
+    assert read_records(second.path) == [{"id": 1, "payload": {"worker": 2}}]
+    first.close()
+    second.close()
+
+
+def test_pending_events_of_a_gone_worker_are_adopted(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    write_lines(path, [json.dumps({"id": 1, "payload": {"n": "own"}})])
+    write_lines(tmp_path / "outbox.2.jsonl", [
+        json.dumps({"id": 1, "payload": {"n": "orphan"}}),
+        json.dumps({"id": 2, "payload": {"n": "sent"}}),
+        json.dumps({"ack": 2}),
+    ])
+
+    outbox = WebhookOutbox(path)
+    outbox.open()
+    pending = [payload["n"] for _, payload in outbox.items()]
+    outbox.close()
+
+    assert pending == ["own", "orphan"]
+    assert not (tmp_path / "outbox.2.jsonl").exists()
+    assert [r["payload"]["n"] for r in read_records(path)] == ["own", "orphan"]
+
+
+def test_dead_letter_moves_event_out_of_the_outbox(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    dead_letter = tmp_path / "dead_letter.jsonl"
+    outbox = WebhookOutbox(path, dead_letter_path=dead_letter)
+    outbox.open()
+    rejected = outbox.append({"n": "rejected"})
+    outbox.append({"n": "kept"})
+    outbox.dead_letter(rejected)
+    pending = [payload["n"] for _, payload in outbox.items()]
+    outbox.close()
+
+    assert pending == ["kept"]
+    assert [r["payload"] for r in read_records(dead_letter)] == [{"n": "rejected"}]
@@ -0,0 +1,39 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.rate_limit import MemoryRateLimitBackend, RateLimitRule, rate_limiter
+from app.main import app
+
+
+@pytest.fixture
+def client():
+    # no lifespan: the handshake path needs neither Redis nor the database
+    return TestClient(app)
+
+
+def close_of(client, url):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(url) as websocket:
+            websocket.receive_text()
+    return closed.value
+
+
+def test_invalid_token_is_closed_with_policy_violation(client):
+    closed = close_of(client, "/ws/chat?token=not-a-jwt")
+
+    assert closed.code == 1008
+    assert closed.reason == "invalid or expired token"
+
+
+def test_connection_flood_is_closed_with_try_again_later(client, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(rate_limiter, "memory", MemoryRateLimitBackend(100))
+    monkeypatch.setitem(rate_limiter._rules, "ws_connect", RateLimitRule(1, 60))
+
+    with client.websocket_connect("/ws/chat"):
+        pass
+    closed = close_of(client, "/ws/chat")
+
+    assert closed.code == 1013
+    assert closed.reason.startswith("too many connections")